@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+# auth.User no es un modelo propio: los índices para buscar trabajadores por nombre se crean aquí
+INDICES = [
+    models.Index(fields=["first_name"], name="auth_user_first_name_idx"),
+    models.Index(fields=["last_name"], name="auth_user_last_name_idx"),
+]
+
+
+def crear_indices(apps, schema_editor):
+    User = apps.get_model("auth", "User")
+    for indice in INDICES:
+        schema_editor.add_index(User, indice)
+
+
+def eliminar_indices(apps, schema_editor):
+    User = apps.get_model("auth", "User")
+    for indice in INDICES:
+        schema_editor.remove_index(User, indice)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_profile_image'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
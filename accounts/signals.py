@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from core.storage import liberar_archivo
+from .models import Profile
+
+
+@receiver(post_delete, sender=Profile)
+def profile_liberar(sender, instance, **kwargs):
+    # También cubre el borrado en cascada al eliminar el usuario
+    liberar_archivo(instance.image)
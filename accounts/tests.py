@@ -1,3 +1,45 @@
-from django.test import TestCase
+import os
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import Profile
+from core.models import ArchivoContenido
+from core.storage import media_storage
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImagenPerfilTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("ana", password="x", first_name="Ana")
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def editar(self, **datos):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("edit_profile"), {"first_name": "Ana", "last_name": "", "phone": "", **datos})
+        return Profile.objects.get(user=self.usuario).image
+
+    def existe(self, nombre):
+        return os.path.exists(media_storage().path(nombre))
+
+    def test_reemplazar_y_quitar_libera_la_imagen_anterior(self):
+        primera = self.editar(image=SimpleUploadedFile("a.txt", b"primera")).name
+        segunda = self.editar(image=SimpleUploadedFile("b.txt", b"segunda")).name
+        self.assertFalse(self.existe(primera))
+        self.assertTrue(self.existe(segunda))
+
+        self.assertFalse(self.editar(remove_image="1"))
+        self.assertFalse(self.existe(segunda))
+        self.assertFalse(ArchivoContenido.objects.exists())
+
+    def test_eliminar_usuario_libera_su_imagen(self):
+        nombre = self.editar(image=SimpleUploadedFile("a.txt", b"imagen")).name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.delete()
+        self.assertFalse(self.existe(nombre))
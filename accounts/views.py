@@ -12,7 +12,11 @@ from django.core.exceptions import ValidationError
 from django.contrib.auth.password_validation import validate_password
 from django.db.models import Q, ProtectedError
 from django.utils import timezone
+from asgiref.sync import sync_to_async
 from accounts.models import Profile
+from core.asincrono import formulario, login_requerido
+from core.storage import liberar_archivo
+from obras.resumen import tablero
 import datetime
 
 def _ensure_roles_exist():
@@ -24,7 +28,8 @@ def _ensure_roles_exist():
 @login_required(login_url='signin')
 def home_view(request):
     """Vista principal dashboard."""
-    return render(request, 'dashboard/index.html')
+    obras, totales = tablero()
+    return render(request, 'dashboard/index.html', {'obras_resumen': obras, 'totales': totales})
 
 # AUTENTICACIÓN
 def signin_view(request):
@@ -184,16 +189,18 @@ def profile_view(request):
     profile, _ = Profile.objects.get_or_create(user=request.user)
     return render(request, "accounts/profile/perfil.html", {"user": request.user, "profile": profile})
 
-@login_required(login_url="signin")
-def edit_profile_view(request):
+@login_requerido
+async def edit_profile_view(request):
+    # Async: bajo ASGI la foto ya llegó completa; el parseo y el guardado de archivos van en un hilo
     user = request.user
-    profile, _ = Profile.objects.get_or_create(user=user)
+    profile, _ = await Profile.objects.aget_or_create(user=user)
     if request.method == "POST":
-        first_name = request.POST.get("first_name", "").strip()
-        last_name = request.POST.get("last_name", "").strip()
-        phone = request.POST.get("phone", "").strip()
-        image = request.FILES.get("image")
-        remove_image = request.POST.get("remove_image") == "1"
+        datos, archivos = await formulario(request)
+        first_name = datos.get("first_name", "").strip()
+        last_name = datos.get("last_name", "").strip()
+        phone = datos.get("phone", "").strip()
+        image = archivos.get("image")
+        remove_image = datos.get("remove_image") == "1"
 
         has_name_change = first_name != (user.first_name or "")
         has_lastname_change = last_name != (user.last_name or "")
@@ -205,12 +212,11 @@ def edit_profile_view(request):
 
         user.first_name = first_name
         user.last_name = last_name
-        user.save()
+        await user.asave()
 
         profile.phone = phone
+        imagen_anterior = profile.image
         if remove_image:
-            if profile.image:
-                profile.image.delete(save=False)
             profile.image = None
             messages.success(request, "Foto de perfil eliminada.")
         elif image:
@@ -218,12 +224,14 @@ def edit_profile_view(request):
             messages.success(request, "Perfil actualizado correctamente.")
         else:
             messages.success(request, "Perfil actualizado correctamente.")
-        profile.save()
+        await profile.asave()
+        if imagen_anterior.name != profile.image.name:
+            await sync_to_async(liberar_archivo)(imagen_anterior)
 
         if request.headers.get("x-requested-with") == "XMLHttpRequest":
             return JsonResponse({"success": True})
         return redirect("profile")
-    return render(request, "accounts/profile/editar_perfil.html", {"profile": profile})
+    return await sync_to_async(render)(request, "accounts/profile/editar_perfil.html", {"profile": profile})
 
 def _setup_password_change_form(form):
     field_config = {
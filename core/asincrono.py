@@ -0,0 +1,164 @@
+"""
+Soporte para servir urbix bajo ASGI (``deploy/gunicorn-asgi.sh``).
+
+Bajo ASGI Django recibe el cuerpo completo de la solicitud en el event
+loop antes de llamar a la vista, y envía la respuesta también desde el
+event loop: un cliente lento ya no retiene un worker ni un hilo. Este
+módulo reúne lo que Django 4.2 todavía no trae para vistas ``async def``
+y para el servidor ASGI:
+
+- ``login_requerido`` y ``solo_metodos``: equivalentes de ``login_required``
+  y ``require_http_methods``, que en 4.2 solo envuelven vistas sync.
+- ``usuario()``, ``formulario()`` y ``obtener_o_404()``: cargan el usuario,
+  parsean el cuerpo y leen un objeto sin bloquear el event loop.
+- ``StreamingAsincronoMiddleware``: bajo ASGI, Django 4.2 junta en una
+  lista todo iterador sync de una respuesta streaming antes de enviarla
+  (un video de 500MB quedaría entero en memoria); el middleware lo
+  cambia por uno async que lee por bloques.
+- ``limitar_cuerpo()``: el servidor responde 413 a un cuerpo de más de
+  ``ASGI_MAX_CUERPO`` bytes antes de que Django lo guarde, como hacía
+  ``LimiteSubidaHandler`` con los workers sync.
+"""
+import functools
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseNotAllowed
+
+BLOQUE = 256 * 1024
+MENSAJE_413 = "La solicitud excede el tamaño máximo permitido.".encode()
+
+
+def _cargar_usuario(request):
+    request.user.is_authenticated  # evalúa el SimpleLazyObject: sesión y usuario
+    return request.user
+
+
+async def usuario(request):
+    """``request.user`` ya cargado: después se puede leer desde el event loop."""
+    return await sync_to_async(_cargar_usuario)(request)
+
+
+def _parsear(request):
+    return request.POST, request.FILES
+
+
+async def formulario(request):
+    """(POST, FILES) parseados en un hilo: el multipart escribe los archivos a disco."""
+    return await sync_to_async(_parsear)(request)
+
+
+async def obtener_o_404(modelo_o_queryset, **filtros):
+    queryset = getattr(modelo_o_queryset, "_default_manager", modelo_o_queryset)
+    try:
+        return await queryset.aget(**filtros)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No existe {queryset.model._meta.object_name} con {filtros}.")
+
+
+def login_requerido(vista):
+    """``login_required`` para vistas async (redirige a ``LOGIN_URL``)."""
+    @functools.wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        if not (await usuario(request)).is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await vista(request, *args, **kwargs)
+
+    return envoltura
+
+
+def solo_metodos(*metodos):
+    """``require_http_methods`` para vistas async."""
+    def decorador(vista):
+        @functools.wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            if request.method not in metodos:
+                return HttpResponseNotAllowed(metodos)
+            return await vista(request, *args, **kwargs)
+
+        return envoltura
+
+    return decorador
+
+
+def _lote(iterador):
+    """Partes de ``iterador`` hasta juntar ``BLOQUE`` bytes (b"" al agotarse)."""
+    partes, tamano = [], 0
+    for parte in iterador:
+        partes.append(parte)
+        tamano += len(parte)
+        if tamano >= BLOQUE:
+            break
+    return b"".join(partes)
+
+
+def _lector(response):
+    archivo = getattr(response, "file_to_stream", None)
+    if archivo is not None:
+        return functools.partial(archivo.read, BLOQUE)
+    return functools.partial(_lote, iter(response.streaming_content))
+
+
+async def _por_bloques(leer):
+    # En el hilo de la solicitud: un iterador sobre un cursor sigue en su conexión
+    leer = sync_to_async(leer)
+    while True:
+        bloque = await leer()
+        if not bloque:
+            return
+        yield bloque
+
+
+class StreamingAsincronoMiddleware:
+    """Bajo ASGI, envía las respuestas streaming sync por bloques; con WSGI no hace nada."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self._acall(request)
+        return self.get_response(request)
+
+    async def _acall(self, request):
+        response = await self.get_response(request)
+        if response.streaming and not response.is_async:
+            # El lector se arma antes: asignar el contenido borra file_to_stream
+            response.streaming_content = _por_bloques(_lector(response))
+        return response
+
+
+def limitar_cuerpo(aplicacion, maximo):
+    """Aplicación ASGI que corta los cuerpos de más de ``maximo`` bytes (0: sin límite)."""
+    async def limitada(scope, receive, send):
+        if scope["type"] != "http" or not maximo:
+            return await aplicacion(scope, receive, send)
+        declarado = dict(scope["headers"]).get(b"content-length", b"")
+        if declarado.isdigit() and int(declarado) > maximo:
+            await send({
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"connection", b"close")],
+            })
+            await send({"type": "http.response.body", "body": MENSAJE_413})
+            return
+        recibidos = 0
+
+        async def recibir():
+            nonlocal recibidos
+            mensaje = await receive()
+            recibidos += len(mensaje.get("body", b""))
+            if recibidos > maximo:
+                # Sin Content-Length (chunked): Django descarta la solicitud
+                return {"type": "http.disconnect"}
+            return mensaje
+
+        return await aplicacion(scope, recibir, send)
+
+    return limitada
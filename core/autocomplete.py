@@ -0,0 +1,58 @@
+"""
+Respuestas de autocompletado para selects con muchas opciones.
+
+Los endpoints filtran por prefijo (``istartswith``), que la base resuelve
+con el índice de la columna, y devuelven una página corta de resultados
+en el formato ``{"results": [{"id", "text", ...}], "more": bool}`` que
+consume ``assets/js/autocomplete.js``; los campos extra de cada resultado
+quedan como ``customProperties`` de la opción en Choices.js. La respuesta se puede guardar unos segundos
+en el navegador: escribir y borrar una letra no vuelve a consultar.
+"""
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+
+POR_PAGINA = 20
+MAX_AGE = 30
+
+
+def termino(request):
+    return (request.GET.get("q") or "").strip()[:100]
+
+
+def ids_excluidos(request):
+    return [int(pk) for pk in request.GET.get("excluir", "").split(",") if pk.strip().isdigit()]
+
+
+def _pagina(request):
+    try:
+        return max(1, int(request.GET.get("page", 1)))
+    except ValueError:
+        return 1
+
+
+def _respuesta(filas, etiqueta, extra=None):
+    respuesta = JsonResponse({
+        "results": [
+            {"id": fila["id"], "text": etiqueta(fila), **(extra(fila) if extra else {})}
+            for fila in filas[:POR_PAGINA]
+        ],
+        "more": len(filas) > POR_PAGINA,
+    })
+    patch_cache_control(respuesta, private=True, max_age=MAX_AGE)
+    return respuesta
+
+
+def responder(request, queryset, etiqueta, extra=None):
+    """
+    Página ``?page`` de ``queryset`` (ya filtrado y ordenado); ``etiqueta(fila)``
+    arma el texto y ``extra(fila)``, si se pasa, agrega campos al resultado.
+    """
+    inicio = (_pagina(request) - 1) * POR_PAGINA
+    # Una fila extra indica si hay más resultados, sin COUNT
+    return _respuesta(list(queryset[inicio:inicio + POR_PAGINA + 1]), etiqueta, extra)
+
+
+async def aresponder(request, queryset, etiqueta, extra=None):
+    """``responder`` para vistas async: la página se lee con el ORM async."""
+    inicio = (_pagina(request) - 1) * POR_PAGINA
+    return _respuesta([fila async for fila in queryset[inicio:inicio + POR_PAGINA + 1]], etiqueta, extra)
@@ -0,0 +1,96 @@
+"""
+Catálogos de País, Ciudad y Estado en memoria del proceso.
+
+Cambian muy poco y se muestran en cada formulario de obras, así que se
+guardan como tuplas ``(id, etiqueta)`` listas para usar como ``choices``.
+La etiqueta de la ciudad ya incluye el país: renderizar el select no
+consulta ``Ciudad.pais`` opción por opción.
+
+Cada proceso conserva su copia mientras la versión guardada en el caché
+de Django no cambie. Las vistas de ``core`` llaman a ``invalidar()`` al
+crear, editar, eliminar o activar/desactivar un registro. El caché
+``default`` es de archivos (``CACHES`` en settings), compartido por todos
+los workers del servidor: el cambio les llega en la siguiente solicitud.
+Con un caché por proceso (LocMemCache) solo lo vería el worker que hizo el
+cambio y el resto serviría datos viejos hasta ``CATALOGOS_TTL``. La copia
+también vence tras ``CATALOGOS_TTL`` segundos por si la base se modificó
+por otra vía.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .choices import ESTADO_ACTIVO
+from .models import Ciudad, Estado, Pais
+
+CLAVE_VERSION = "core:catalogos:version"
+
+_lock = threading.Lock()
+_copia = {"version": None, "vence": 0.0, "datos": None}
+
+
+def version():
+    actual = cache.get(CLAVE_VERSION)
+    if actual is None:
+        cache.add(CLAVE_VERSION, uuid.uuid4().hex, None)
+        actual = cache.get(CLAVE_VERSION)
+    return actual
+
+
+def invalidar():
+    """Publica una versión nueva al confirmarse la transacción: todos los procesos recargan."""
+    transaction.on_commit(lambda: cache.set(CLAVE_VERSION, uuid.uuid4().hex, None))
+
+
+def _cargar():
+    return {
+        "paises": tuple(
+            Pais.objects.filter(estado=ESTADO_ACTIVO).order_by("nombre").values_list("id", "nombre")
+        ),
+        "ciudades": tuple(
+            (id_, f"{nombre} ({pais})")
+            for id_, nombre, pais in Ciudad.objects.filter(estado=ESTADO_ACTIVO)
+            .order_by("nombre", "pais__nombre")
+            .values_list("id", "nombre", "pais__nombre")
+        ),
+        "estados": tuple(
+            Estado.objects.filter(estado=ESTADO_ACTIVO).order_by("nombre").values_list("id", "nombre")
+        ),
+    }
+
+
+def _datos():
+    actual = version()
+    if _copia["version"] == actual and _copia["vence"] > time.monotonic():
+        return _copia["datos"]
+    with _lock:
+        if _copia["version"] != actual or _copia["vence"] <= time.monotonic():
+            _copia.update(
+                datos=_cargar(), version=actual,
+                vence=time.monotonic() + getattr(settings, "CATALOGOS_TTL", 300),
+            )
+        return _copia["datos"]
+
+
+def paises():
+    """Países activos: ((id, nombre), ...)."""
+    return _datos()["paises"]
+
+
+def ciudades():
+    """Ciudades activas: ((id, "Ciudad (País)"), ...)."""
+    return _datos()["ciudades"]
+
+
+def estados():
+    """Estados de obra activos: ((id, nombre), ...)."""
+    return _datos()["estados"]
+
+
+def opciones(catalogo, vacio="Seleccione..."):
+    """Choices para un select, con la opción vacía al inicio."""
+    return [("", vacio), *catalogo]
@@ -23,3 +23,25 @@ TIPO_ARCHIVO_CHOICES = (
     (TIPO_ARCHIVO_IMAGEN, "Imagen"),
     (TIPO_ARCHIVO_VIDEO, "Video")
 )
+
+ESTADO_SUBIDA_PENDIENTE = "pendiente"
+ESTADO_SUBIDA_COMPLETA = "completa"
+ESTADO_SUBIDA_ADJUNTA = "adjunta"
+
+ESTADO_SUBIDA_CHOICES = (
+    (ESTADO_SUBIDA_PENDIENTE, "Pendiente"),
+    (ESTADO_SUBIDA_COMPLETA, "Completa"),
+    (ESTADO_SUBIDA_ADJUNTA, "Adjunta")
+)
+
+ESTADO_LIBRO_PENDIENTE = "pendiente"
+ESTADO_LIBRO_PROCESANDO = "procesando"
+ESTADO_LIBRO_COMPLETO = "completo"
+ESTADO_LIBRO_ERROR = "error"
+
+ESTADO_LIBRO_CHOICES = (
+    (ESTADO_LIBRO_PENDIENTE, "Pendiente"),
+    (ESTADO_LIBRO_PROCESANDO, "Procesando"),
+    (ESTADO_LIBRO_COMPLETO, "Completo"),
+    (ESTADO_LIBRO_ERROR, "Error")
+)
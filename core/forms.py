@@ -1,5 +1,6 @@
 from django import forms
 from .models import Pais, Ciudad, Estado
+from . import catalogs
 
 class PaisForm(forms.ModelForm):
     class Meta:
@@ -26,6 +27,10 @@ class CiudadForm(forms.ModelForm):
             "fecha_creacion": forms.DateInput(format='%Y-%m-%d', attrs={'type': 'date', 'class': 'form-control form-control-sm', 'readonly': 'readonly'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['pais'].choices = catalogs.opciones(catalogs.paises(), '---------')
+
     def clean_nombre(self):
         nombre = self.cleaned_data.get('nombre')
         if len(nombre) < 2:
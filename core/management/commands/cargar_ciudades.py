@@ -0,0 +1,149 @@
+import csv
+import json
+import os
+import unicodedata
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core import catalogs
+from core.choices import ESTADO_ACTIVO, ESTADO_INACTIVO
+from core.models import Ciudad, Pais
+
+LOTE = 2000
+# Encabezados aceptados (sin tildes, en minúsculas) para cada columna
+COLUMNAS = {
+    "pais": {"pais", "country"},
+    "ciudad": {"ciudad", "comuna", "nombre", "city"},
+}
+
+
+def _clave(texto):
+    texto = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode("ascii")
+    return texto.strip().lower()
+
+
+def _nombre(texto):
+    # Mismo formato que CiudadForm/PaisForm: espacios simples y mayúscula inicial por palabra
+    return " ".join(str(texto or "").split()).title()
+
+
+def _leer_csv(ruta):
+    with open(ruta, newline="", encoding="utf-8-sig") as fh:
+        muestra = fh.read(4096)
+        fh.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        yield from csv.DictReader(fh, dialect=dialecto)
+
+
+def _leer_json(ruta):
+    with open(ruta, encoding="utf-8-sig") as fh:
+        datos = json.load(fh)
+    if isinstance(datos, dict):
+        # {"Chile": ["Santiago", ...]} o {"Chile": {"Región": ["Santiago", ...]}}
+        for pais, contenido in datos.items():
+            regiones = contenido.items() if isinstance(contenido, dict) else [("", contenido)]
+            for _region, ciudades in regiones:
+                for ciudad in ciudades:
+                    yield {"pais": pais, "ciudad": ciudad}
+    elif isinstance(datos, list):
+        yield from datos
+    else:
+        raise CommandError("El JSON debe ser una lista de objetos o un objeto {país: [ciudades]}.")
+
+
+def _columnas(fila):
+    columnas = {}
+    for original in fila:
+        clave = _clave(original)
+        for destino, alias in COLUMNAS.items():
+            if clave in alias:
+                columnas.setdefault(destino, original)
+    return columnas
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga países y ciudades desde un CSV o JSON (columnas país y ciudad; otras, como la región, "
+        "se ignoran). Inserta por lotes y omite las ciudades que ya existen para ese país."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta al .csv o .json.")
+        parser.add_argument("--pais", help="País por defecto cuando el archivo no trae esa columna.")
+        parser.add_argument("--activas", action="store_true", help="Deja activas las ciudades cargadas (y las existentes del archivo).")
+        parser.add_argument("--lote", type=int, default=LOTE, help="Filas por INSERT.")
+
+    def handle(self, *args, **options):
+        ruta = options["archivo"]
+        if not os.path.isfile(ruta):
+            raise CommandError(f"No existe el archivo {ruta}.")
+        extension = os.path.splitext(ruta)[1].lower()
+        if extension not in (".csv", ".json"):
+            raise CommandError("Formato no soportado: use .csv o .json.")
+        filas = _leer_csv(ruta) if extension == ".csv" else _leer_json(ruta)
+
+        self.estado = ESTADO_ACTIVO if options["activas"] else ESTADO_INACTIVO
+        self.lote = max(1, options["lote"])
+        pais_defecto = _nombre(options.get("pais"))
+        self.paises = {_clave(nombre): id_ for id_, nombre in Pais.objects.values_list("id", "nombre")}
+        antes = Ciudad.objects.count()
+
+        pendientes, columnas, leidas, omitidas = {}, None, 0, 0
+        for fila in filas:
+            if not isinstance(fila, dict):
+                raise CommandError("Cada registro debe ser un objeto con país y ciudad.")
+            if columnas is None:
+                columnas = _columnas(fila)
+                if "ciudad" not in columnas or ("pais" not in columnas and not pais_defecto):
+                    raise CommandError("Faltan columnas: se requiere ciudad y país (o --pais).")
+            leidas += 1
+            nombre = _nombre(fila.get(columnas["ciudad"]))
+            pais = _nombre(fila.get(columnas["pais"])) if "pais" in columnas else ""
+            pais = pais or pais_defecto
+            if not nombre or not pais:
+                omitidas += 1
+                continue
+            # Sin repetir dentro del lote: un INSERT ... ON CONFLICT no acepta dos veces la misma clave
+            pendientes[(_clave(nombre), _clave(pais))] = (nombre, pais)
+            if len(pendientes) >= self.lote:
+                self._guardar(pendientes.values())
+                pendientes = {}
+        if pendientes:
+            self._guardar(pendientes.values())
+
+        catalogs.invalidar()
+        creadas = Ciudad.objects.count() - antes
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo. {leidas} filas leídas, {creadas} ciudades nuevas, {omitidas} filas sin ciudad o país."
+        ))
+
+    def _pais_ids(self, nombres):
+        nuevos = {_clave(n): n for n in nombres if _clave(n) not in self.paises}
+        if nuevos:
+            Pais.objects.bulk_create(
+                [Pais(nombre=n, estado=self.estado) for n in nuevos.values()], ignore_conflicts=True
+            )
+            for id_, nombre in Pais.objects.filter(nombre__in=nuevos.values()).values_list("id", "nombre"):
+                self.paises[_clave(nombre)] = id_
+
+    def _guardar(self, filas):
+        filas = list(filas)
+        self._pais_ids({pais for _, pais in filas})
+        ciudades = [
+            Ciudad(nombre=nombre, pais_id=self.paises[_clave(pais)], estado=self.estado)
+            for nombre, pais in filas
+        ]
+        with transaction.atomic():
+            if self.estado == ESTADO_ACTIVO:
+                # Upsert sobre unique_together (nombre, pais): las que ya existían quedan activas
+                extra = {"unique_fields": ["nombre", "pais"]} if connection.features.supports_update_conflicts_with_target else {}
+                Ciudad.objects.bulk_create(
+                    ciudades, batch_size=self.lote, update_conflicts=True,
+                    update_fields=["estado", "fecha_modificacion"], **extra,
+                )
+            else:
+                Ciudad.objects.bulk_create(ciudades, batch_size=self.lote, ignore_conflicts=True)
@@ -0,0 +1,103 @@
+import hashlib
+import os
+
+from django.core.files.move import file_move_safe
+from django.core.management.base import BaseCommand
+
+from accounts.models import Profile
+from core.storage import CAS_DIR, nombre_cas, sumar_referencia
+from gastos.models import Gasto
+from obras.models import FotografiaRegistro, RegistroLibroObra, SubidaFragmentada
+
+# (modelo, campo) cuyos archivos pasan al storage por contenido
+CAMPOS_MEDIA = [
+    (FotografiaRegistro, "archivo"),
+    (RegistroLibroObra, "fotografia"),
+    (SubidaFragmentada, "archivo"),
+    (Gasto, "foto"),
+    (Profile, "image"),
+]
+LOTE = 500
+BLOQUE = 1024 * 1024
+
+
+def _sha256_archivo(ruta):
+    digest = hashlib.sha256()
+    with open(ruta, "rb") as fh:
+        for bloque in iter(lambda: fh.read(BLOQUE), b""):
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve los medios existentes al storage direccionado por contenido, "
+        "eliminando duplicados. Recorre las tablas por lotes sin cargarlas en memoria."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Solo informa lo que haría.")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        # nombre antiguo -> nombre cas; un archivo compartido por varias filas se hashea una vez
+        movidos = {}
+        originales = set()
+        liberados = 0
+        for model, campo in CAMPOS_MEDIA:
+            storage = model._meta.get_field(campo).storage
+            filas = (
+                model.objects.exclude(**{campo: ""}).exclude(**{f"{campo}__isnull": True})
+                .exclude(**{f"{campo}__startswith": f"{CAS_DIR}/"})
+                .values_list("pk", campo).iterator(chunk_size=2000)
+            )
+            lote, actualizadas, faltantes = [], 0, 0
+            for pk, nombre in filas:
+                nuevo = movidos.get(nombre)
+                if nuevo is None:
+                    ruta = storage.path(nombre)
+                    if not os.path.exists(ruta):
+                        faltantes += 1
+                        continue
+                    sha256 = _sha256_archivo(ruta)
+                    nuevo = nombre_cas(sha256, nombre)
+                    destino = storage.path(nuevo)
+                    if not dry_run:
+                        if os.path.exists(destino):
+                            originales.add(ruta)
+                            liberados += os.path.getsize(ruta)
+                        else:
+                            os.makedirs(os.path.dirname(destino), exist_ok=True)
+                            file_move_safe(ruta, destino)
+                    movidos[nombre] = nuevo
+                lote.append((pk, nuevo))
+                if len(lote) >= LOTE:
+                    actualizadas += self._aplicar(model, campo, lote, storage, dry_run)
+                    lote = []
+            actualizadas += self._aplicar(model, campo, lote, storage, dry_run)
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: {actualizadas} filas migradas, {faltantes} archivos no encontrados."
+            )
+
+        if not dry_run:
+            # Los duplicados se borran recién después de actualizar todas las filas
+            for ruta in originales:
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo. {len(originales)} duplicados eliminados ({liberados // (1024 * 1024)} MB liberados). "
+            "Ejecuta generar_derivados para crear los derivados con las rutas nuevas."
+        ))
+
+    def _aplicar(self, model, campo, lote, storage, dry_run):
+        if not lote or dry_run:
+            return len(lote)
+        filas = [model(pk=pk, **{campo: nuevo}) for pk, nuevo in lote]
+        model.objects.bulk_update(filas, [campo])
+        conteo = {}
+        for _, nuevo in lote:
+            conteo[nuevo] = conteo.get(nuevo, 0) + 1
+        for nuevo, cantidad in conteo.items():
+            sha256 = os.path.splitext(os.path.basename(nuevo))[0]
+            sumar_referencia(sha256, nuevo, os.path.getsize(storage.path(nuevo)), cantidad)
+        return len(lote)
@@ -0,0 +1,351 @@
+import datetime
+import hashlib
+import io
+import random
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import catalogs
+from core.choices import ESTADO_ACTIVO, ESTADO_INACTIVO, TIPO_ARCHIVO_IMAGEN
+from core.models import Ciudad, Estado, Pais
+from core.storage import media_storage, sumar_referencia
+from core.thumbnails import generate_derivatives
+from gastos import rollups as gastos_rollups
+from gastos.models import Categoria, Gasto, Proveedor, TipoDocumento, normalizar_rut
+from obras import busqueda, resumen
+from obras import rollups as obras_rollups
+from obras.models import FotografiaRegistro, Obra, RegistroLibroObra, TareaRealizada, TrabajadorRegistro
+from obras.services import MAX_HORAS_TOTAL
+
+LOTE = 2000
+DESDE = datetime.date(2025, 1, 1)
+IMAGENES = 8
+
+NOMBRES = [
+    "Ana", "Bruno", "Camila", "Diego", "Elena", "Felipe", "Gabriela", "Héctor", "Isabel", "Javier",
+    "Karina", "Luis", "María", "Nicolás", "Olga", "Pablo", "Rosa", "Sergio", "Teresa", "Víctor",
+]
+APELLIDOS = [
+    "Rojas", "Muñoz", "Soto", "Contreras", "Silva", "Martínez", "Sepúlveda", "Morales", "Rodríguez",
+    "López", "Fuentes", "Hernández", "Torres", "Araya", "Flores", "Espinoza", "Valenzuela", "Castillo",
+]
+ESTADOS = ["Planificación", "En ejecución", "Detenida", "Recepción", "Terminada"]
+TIPOS_DOCUMENTO = ["Factura", "Boleta", "Guía de despacho", "Nota de crédito"]
+CATEGORIAS = [
+    "Materiales", "Herramientas", "Arriendo de maquinaria", "Combustible", "Fletes", "Alimentación",
+    "Seguridad", "Subcontratos", "Permisos", "Áridos", "Eléctricos", "Sanitarios",
+]
+TAREAS = [
+    "Excavación de zanjas", "Moldaje de muros", "Hormigonado de losa", "Enfierradura de pilares",
+    "Instalación eléctrica", "Instalación sanitaria", "Tabiquería", "Estucado de fachada",
+    "Colocación de cerámica", "Pintura interior", "Montaje de techumbre", "Limpieza de terreno",
+    "Retiro de escombros", "Impermeabilización", "Instalación de ventanas", "Nivelación de radier",
+]
+OBSERVACIONES = [
+    "Avance según programa.", "Lluvia detuvo los trabajos por la tarde.", "Llegaron materiales pendientes.",
+    "Visita de inspección técnica sin observaciones.", "Falta personal de terminaciones.",
+    "Se reprograma hormigonado por falta de bomba.", "Trabajos de seguridad en altura revisados.",
+]
+CALLES = ["Los Aromos", "Av. Principal", "San Martín", "Las Acacias", "O'Higgins", "Los Carrera", "El Roble"]
+
+
+def _lotes(filas, tamano):
+    for inicio in range(0, len(filas), tamano):
+        yield filas[inicio:inicio + tamano]
+
+
+def _digito_rut(numero):
+    suma, factor = 0, 2
+    for digito in reversed(str(numero)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - suma % 11
+    return {11: "0", 10: "K"}.get(resto, str(resto))
+
+
+def _horas(rng):
+    """(horas, extras) en medias horas, con la suma dentro de MAX_HORAS_TOTAL."""
+    base = Decimal(rng.randint(2, 18)) / 2
+    extras = Decimal(0)
+    if rng.random() < 0.3:
+        extras = Decimal(rng.randint(1, int((MAX_HORAS_TOTAL - base) * 2))) / 2
+    return base, extras
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos con volumen de producción: usuarios por grupo, catálogos, obras con "
+        "registros (tareas y horas), gastos y, opcionalmente, imágenes de relleno. Inserta por lotes y, "
+        "con la misma semilla, produce siempre los mismos datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=1, help="Semilla del generador.")
+        parser.add_argument("--prefijo", default="demo", help="Prefijo de códigos, usuarios y nombres generados.")
+        parser.add_argument("--usuarios", type=int, default=60, help="Usuarios (1 de cada 20 administrador, 1 de cada 5 supervisor).")
+        parser.add_argument("--paises", type=int, default=5)
+        parser.add_argument("--ciudades", type=int, default=100)
+        parser.add_argument("--proveedores", type=int, default=200)
+        parser.add_argument("--categorias", type=int, default=len(CATEGORIAS))
+        parser.add_argument("--obras", type=int, default=100)
+        parser.add_argument("--registros", type=int, default=100, help="Registros del libro por obra.")
+        parser.add_argument("--gastos", type=int, default=50, help="Gastos por obra.")
+        parser.add_argument("--imagenes", action="store_true", help="Adjunta imágenes de relleno a registros y gastos.")
+        parser.add_argument("--desde", type=datetime.date.fromisoformat, default=DESDE, help="Fecha del último registro (AAAA-MM-DD).")
+        parser.add_argument("--clave", default="urbix1234", help="Contraseña de todos los usuarios generados.")
+        parser.add_argument("--lote", type=int, default=LOTE, help="Filas por INSERT.")
+        parser.add_argument("--forzar", action="store_true", help="Permite ejecutarlo con DEBUG=False.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["forzar"]:
+            raise CommandError("DEBUG=False: use --forzar para generar datos en este entorno.")
+        self.prefijo = options["prefijo"].strip().upper()
+        if not self.prefijo:
+            raise CommandError("El prefijo no puede estar vacío.")
+        if Obra.objects.filter(codigo__startswith=f"{self.prefijo}-").exists():
+            raise CommandError(f"Ya hay obras con el prefijo {self.prefijo}: use otro --prefijo.")
+        if options["usuarios"] < 2 or min(options["paises"], options["ciudades"], options["proveedores"], options["categorias"]) < 1:
+            raise CommandError("Se requieren al menos 2 usuarios y un país, ciudad, proveedor y categoría.")
+
+        self.rng = random.Random(options["seed"])
+        self.lote = max(1, options["lote"])
+        self.desde = options["desde"]
+        self.totales = Counter()
+        self.imagenes = self._imagenes() if options["imagenes"] else []
+        self.usos = Counter()
+
+        self._usuarios(options["usuarios"], options["clave"])
+        self._catalogos(options["paises"], options["ciudades"])
+        self._maestros_gastos(options["proveedores"], options["categorias"])
+        obras = self._obras(options["obras"], options["registros"])
+        # Obras por transacción: las suficientes para que cada una inserte unos ``lote`` registros
+        hechas = 0
+        for bloque in _lotes(obras, max(1, self.lote // max(1, options["registros"]))):
+            with transaction.atomic():
+                self._registros(bloque, options["registros"])
+                self._gastos(bloque, options["gastos"])
+            hechas += len(bloque)
+            self.stdout.write(f"{hechas} de {len(obras)} obras...")
+        self._ajustar_referencias()
+
+        # bulk_create no emite señales: los resúmenes, el índice de búsqueda y los catálogos se rehacen aquí
+        resumen.conciliar(corregir=True)
+        obras_rollups.reconstruir()
+        gastos_rollups.reconstruir()
+        busqueda.reindexar_todo()
+        catalogs.invalidar()
+
+        detalle = ", ".join(f"{cantidad} {nombre}" for nombre, cantidad in self.totales.items())
+        self.stdout.write(self.style.SUCCESS(f"Listo. {sum(self.totales.values())} filas: {detalle}."))
+
+    def _insertar(self, modelo, filas, nombre, **kwargs):
+        modelo.objects.bulk_create(filas, batch_size=self.lote, **kwargs)
+        self.totales[nombre] += len(filas)
+
+    def _usuarios(self, cantidad, clave):
+        clave = make_password(clave)  # Un solo hash: el hasher es deliberadamente lento
+        ahora = datetime.datetime.combine(self.desde, datetime.time(8), tzinfo=datetime.timezone.utc)
+        nombre = self.prefijo.lower()
+        usuarios = [
+            User(
+                username=f"{nombre}_{i:05d}", password=clave, is_active=True, date_joined=ahora,
+                first_name=self.rng.choice(NOMBRES), last_name=self.rng.choice(APELLIDOS),
+                email=f"{nombre}_{i:05d}@example.com",
+            )
+            for i in range(cantidad)
+        ]
+        self._insertar(User, usuarios, "usuarios")
+        ids = dict(User.objects.filter(username__in=[u.username for u in usuarios]).values_list("username", "id"))
+        ids = [ids[u.username] for u in usuarios]
+
+        grupos = {n: Group.objects.get_or_create(name=n)[0].id for n in ("Administrador", "Supervisor", "Trabajador")}
+        self.administradores = ids[::20]
+        self.supervisores = [i for n, i in enumerate(ids) if n % 20 and n % 5 == 1] or ids[1:2]
+        otros = set(self.administradores) | set(self.supervisores)
+        self.trabajadores = [i for i in ids if i not in otros] or ids[:1]
+        Miembro = User.groups.through
+        miembros = [Miembro(user_id=i, group_id=grupos["Administrador"]) for i in self.administradores]
+        miembros += [Miembro(user_id=i, group_id=grupos["Supervisor"]) for i in self.supervisores]
+        miembros += [Miembro(user_id=i, group_id=grupos["Trabajador"]) for i in self.trabajadores]
+        self._insertar(Miembro, miembros, "grupos de usuario")
+
+    def _catalogos(self, cantidad_paises, cantidad_ciudades):
+        paises = [Pais(nombre=f"País {self.prefijo}-{i + 1}", estado=ESTADO_ACTIVO) for i in range(cantidad_paises)]
+        self._insertar(Pais, paises, "países")
+        pais_ids = list(
+            Pais.objects.filter(nombre__in=[p.nombre for p in paises]).order_by("nombre").values_list("id", flat=True)
+        )
+        ciudades = [
+            Ciudad(
+                nombre=f"Ciudad {self.prefijo}-{i + 1}", pais_id=pais_ids[i % len(pais_ids)],
+                estado=ESTADO_ACTIVO if self.rng.random() < 0.9 else ESTADO_INACTIVO,
+            )
+            for i in range(cantidad_ciudades)
+        ]
+        self._insertar(Ciudad, ciudades, "ciudades")
+        self.ciudades = list(
+            Ciudad.objects.filter(pais_id__in=pais_ids, estado=ESTADO_ACTIVO).order_by("id").values_list("id", flat=True)
+        )
+        if not self.ciudades:
+            Ciudad.objects.filter(pais_id__in=pais_ids).update(estado=ESTADO_ACTIVO)
+            self.ciudades = list(Ciudad.objects.filter(pais_id__in=pais_ids).order_by("id").values_list("id", flat=True))
+
+        estados = [Estado(nombre=f"{n} {self.prefijo}", estado=ESTADO_ACTIVO) for n in ESTADOS]
+        self._insertar(Estado, estados, "estados")
+        self.estados = list(
+            Estado.objects.filter(nombre__in=[e.nombre for e in estados]).order_by("id").values_list("id", flat=True)
+        )
+
+    def _maestros_gastos(self, cantidad_proveedores, cantidad_categorias):
+        hoy = self.desde
+        numeros = self.rng.sample(range(50_000_000, 99_999_999), cantidad_proveedores)
+        ruts = [f"{n}-{_digito_rut(n)}" for n in numeros]
+        ocupados = set(Proveedor.objects.filter(rut__in=ruts).values_list("rut", flat=True))
+        proveedores = [
+            # rut_normalizado se calcula en save(), que bulk_create no llama
+            Proveedor(
+                nombre=f"Proveedor {self.prefijo}-{i + 1}", rut=rut, rut_normalizado=normalizar_rut(rut),
+                direccion=f"{self.rng.choice(CALLES)} {self.rng.randint(1, 3000)}",
+                telefono=f"+569{self.rng.randint(10_000_000, 99_999_999)}", fecha_creacion=hoy,
+            )
+            for i, rut in enumerate(ruts)
+            if rut not in ocupados
+        ]
+        self._insertar(Proveedor, proveedores, "proveedores")
+        self.proveedores = list(
+            Proveedor.objects.filter(nombre__in=[p.nombre for p in proveedores]).order_by("id").values_list("id", flat=True)
+        )
+        if not self.proveedores:
+            raise CommandError("No se pudo crear ningún proveedor: los RUT generados ya existen.")
+
+        nombres = [
+            f"{CATEGORIAS[i % len(CATEGORIAS)]} {self.prefijo}" + (f"-{i // len(CATEGORIAS) + 1}" if i >= len(CATEGORIAS) else "")
+            for i in range(cantidad_categorias)
+        ]
+        self._insertar(Categoria, [Categoria(nombre=n, fecha_creacion=hoy) for n in nombres], "categorías")
+        self.categorias = list(Categoria.objects.filter(nombre__in=nombres).order_by("id").values_list("id", flat=True))
+        tipos = [f"{n} {self.prefijo}" for n in TIPOS_DOCUMENTO]
+        self._insertar(TipoDocumento, [TipoDocumento(nombre=n, fecha_creacion=hoy) for n in tipos], "tipos de documento")
+        self.tipos = list(TipoDocumento.objects.filter(nombre__in=tipos).order_by("id").values_list("id", flat=True))
+
+    def _obras(self, cantidad, registros):
+        obras = []
+        for i in range(cantidad):
+            # Cada registro de una obra cae en un día distinto: la obra dura al menos ``registros`` días
+            dias = registros + self.rng.randint(30, 720)
+            inicio = self.desde - datetime.timedelta(days=dias - 1)
+            obras.append(Obra(
+                nombre=f"{self.rng.choice(['Edificio', 'Condominio', 'Bodega', 'Colegio', 'Casa'])} {self.rng.choice(CALLES)} {i + 1}",
+                codigo=f"{self.prefijo}-{i + 1:06d}",
+                descripcion=self.rng.choice(OBSERVACIONES),
+                direccion=f"{self.rng.choice(CALLES)} {self.rng.randint(1, 3000)}",
+                ciudad_id=self.rng.choice(self.ciudades),
+                fecha_inicio=inicio,
+                fecha_fin_estimada=self.desde + datetime.timedelta(days=self.rng.randint(30, 365)),
+                estado_obra_id=self.rng.choice(self.estados),
+                estado=self.rng.random() < 0.85,
+                creado_por_id=self.rng.choice(self.administradores),
+            ))
+        self._insertar(Obra, obras, "obras")
+        ids = dict(Obra.objects.filter(codigo__startswith=f"{self.prefijo}-").values_list("codigo", "id"))
+        for obra in obras:
+            obra.id = ids[obra.codigo]
+        return obras
+
+    def _imagen(self):
+        if not self.imagenes:
+            return None
+        nombre = self.rng.choice(self.imagenes)
+        self.usos[nombre] += 1
+        return nombre
+
+    def _registros(self, obras, por_obra):
+        registros = []
+        for obra in obras:
+            dias = (self.desde - obra.fecha_inicio).days + 1
+            for desplazamiento in sorted(self.rng.sample(range(dias), min(por_obra, dias))):
+                supervisor = self.rng.choice(self.supervisores)
+                registros.append(RegistroLibroObra(
+                    obra_id=obra.id, fecha=obra.fecha_inicio + datetime.timedelta(days=desplazamiento),
+                    supervisor_id=supervisor, creado_por_id=supervisor,
+                    observaciones=self.rng.choice(OBSERVACIONES) if self.rng.random() < 0.7 else None,
+                ))
+        self._insertar(RegistroLibroObra, registros, "registros")
+        ids = {
+            (obra_id, fecha): id_
+            for id_, obra_id, fecha in RegistroLibroObra.objects.filter(obra_id__in=[o.id for o in obras])
+            .values_list("id", "obra_id", "fecha")
+        }
+
+        tareas, trabajadores, fotos = [], [], []
+        for registro in registros:
+            registro_id = ids[(registro.obra_id, registro.fecha)]
+            for orden, descripcion in enumerate(self.rng.sample(TAREAS, self.rng.randint(1, 4))):
+                tareas.append(TareaRealizada(registro_id=registro_id, descripcion=descripcion, orden=orden))
+            cuadrilla = self.rng.sample(self.trabajadores, min(len(self.trabajadores), self.rng.randint(1, 6)))
+            for trabajador_id in cuadrilla:
+                horas, extras = _horas(self.rng)
+                trabajadores.append(TrabajadorRegistro(
+                    registro_id=registro_id, trabajador_id=trabajador_id, horas_trabajadas=horas, horas_extras=extras,
+                ))
+            if self.imagenes:
+                for orden in range(self.rng.randint(0, 2)):
+                    fotos.append(FotografiaRegistro(
+                        registro_id=registro_id, archivo=self._imagen(), tipo=TIPO_ARCHIVO_IMAGEN, orden=orden,
+                    ))
+        self._insertar(TareaRealizada, tareas, "tareas")
+        self._insertar(TrabajadorRegistro, trabajadores, "horas de trabajadores")
+        if fotos:
+            self._insertar(FotografiaRegistro, fotos, "fotografías")
+
+    def _gastos(self, obras, por_obra):
+        gastos = []
+        for obra in obras:
+            dias = (self.desde - obra.fecha_inicio).days
+            for _ in range(por_obra):
+                fecha = obra.fecha_inicio + datetime.timedelta(days=self.rng.randint(0, dias))
+                foto = self._imagen() if self.rng.random() < 0.8 else None
+                gastos.append(Gasto(
+                    obra_id=obra.id, categoria_id=self.rng.choice(self.categorias),
+                    proveedor_id=self.rng.choice(self.proveedores), tipo_documento_id=self.rng.choice(self.tipos),
+                    monto=Decimal(self.rng.randint(5_000, 2_000_000)), fecha=fecha, fecha_creacion=fecha,
+                    creado_por_id=self.rng.choice(self.supervisores), estado=self.rng.random() < 0.95,
+                    foto=foto, sin_foto=bool(self.imagenes) and foto is None,
+                ))
+        self._insertar(Gasto, gastos, "gastos")
+
+    def _imagenes(self):
+        """Guarda unas pocas imágenes de relleno en el storage de medios y devuelve sus nombres."""
+        from PIL import Image, ImageDraw
+
+        storage = media_storage()
+        nombres = []
+        for i in range(IMAGENES):
+            color = tuple(self.rng.randint(40, 220) for _ in range(3))
+            imagen = Image.new("RGB", (1280, 960), color)
+            ImageDraw.Draw(imagen).text((40, 40), f"{self.prefijo} {i + 1}", fill=(255, 255, 255))
+            buffer = io.BytesIO()
+            imagen.save(buffer, format="JPEG", quality=80)
+            nombre = storage.save(f"libro_obras/{self.prefijo.lower()}_{i + 1}.jpg", ContentFile(buffer.getvalue()))
+            generate_derivatives(nombre, storage)
+            nombres.append(nombre)
+        return nombres
+
+    def _ajustar_referencias(self):
+        # storage.save() contó una referencia por imagen; cada fila que la usa es una más
+        storage = media_storage()
+        for nombre in self.imagenes:
+            usos = self.usos[nombre]
+            if usos == 0:
+                storage.delete(nombre)
+            elif usos > 1:
+                with storage.open(nombre) as fh:
+                    contenido = fh.read()
+                sumar_referencia(hashlib.sha256(contenido).hexdigest(), nombre, len(contenido), cantidad=usos - 1)
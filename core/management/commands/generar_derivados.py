@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import Profile
+from core.thumbnails import generate_derivatives, is_image_name
+from gastos.models import Gasto
+from obras.models import FotografiaRegistro, RegistroLibroObra
+
+# (modelo, campo) con imágenes subidas por usuarios
+CAMPOS_IMAGEN = [
+    (FotografiaRegistro, "archivo"),
+    (RegistroLibroObra, "fotografia"),
+    (Gasto, "foto"),
+    (Profile, "image"),
+]
+LOTE = 200
+
+
+class Command(BaseCommand):
+    help = "Genera miniaturas, vistas previas y WebP para las imágenes ya subidas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Regenera aunque el derivado exista.")
+        parser.add_argument("--workers", type=int, default=4, help="Hilos de generación en paralelo.")
+
+    def handle(self, *args, **options):
+        force = options["force"]
+        total = 0
+        with ThreadPoolExecutor(max_workers=max(1, options["workers"])) as pool:
+            for model, campo in CAMPOS_IMAGEN:
+                storage = model._meta.get_field(campo).storage
+                nombres = (
+                    model.objects.exclude(**{campo: ""}).exclude(**{f"{campo}__isnull": True})
+                    .values_list(campo, flat=True).distinct().iterator(chunk_size=2000)
+                )
+                creados = 0
+                lote = []
+                for nombre in nombres:
+                    if is_image_name(nombre):
+                        lote.append(pool.submit(generate_derivatives, nombre, storage, force))
+                    if len(lote) >= LOTE:
+                        creados += sum(futuro.result() for futuro in lote)
+                        lote = []
+                creados += sum(futuro.result() for futuro in lote)
+                total += creados
+                self.stdout.write(f"{model._meta.verbose_name_plural}: {creados} derivados generados.")
+        self.stdout.write(self.style.SUCCESS(f"Listo. {total} derivados generados."))
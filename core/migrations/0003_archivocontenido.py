@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_ciudad_estado_alter_estado_estado_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoContenido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('nombre', models.CharField(max_length=255, verbose_name='Ruta en storage')),
+                ('tamano', models.BigIntegerField(default=0, verbose_name='Tamaño (bytes)')),
+                ('referencias', models.PositiveIntegerField(default=0, verbose_name='Referencias')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+            ],
+            options={
+                'verbose_name': 'Archivo de contenido',
+                'verbose_name_plural': 'Archivos de contenido',
+                'db_table': 'core_archivo_contenido',
+            },
+        ),
+    ]
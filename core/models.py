@@ -90,3 +90,20 @@ class Estado(models.Model):
 
     def __str__(self):
         return self.nombre
+
+class ArchivoContenido(models.Model):
+    """Archivo de medios almacenado una sola vez por su hash, con conteo de referencias."""
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="SHA-256")
+    nombre = models.CharField(max_length=255, verbose_name="Ruta en storage")
+    tamano = models.BigIntegerField(default=0, verbose_name="Tamaño (bytes)")
+    referencias = models.PositiveIntegerField(default=0, verbose_name="Referencias")
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+
+    class Meta:
+
+        db_table = "core_archivo_contenido"
+        verbose_name = "Archivo de contenido"
+        verbose_name_plural = "Archivos de contenido"
+
+    def __str__(self):
+        return f"{self.nombre} ({self.referencias} ref.)"
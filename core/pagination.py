@@ -0,0 +1,88 @@
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no se puede decodificar."""
+
+
+def encode_cursor(values):
+    """Serializa los valores de la última fila en un token opaco para la URL."""
+    payload = json.dumps([
+        v.isoformat() if hasattr(v, "isoformat") else str(v) if isinstance(v, Decimal) else v
+        for v in values
+    ])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, model, keys):
+    """Convierte el token en valores tipados usando los campos del modelo."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeError) as exc:
+        raise CursorInvalido("Cursor inválido.") from exc
+    if not isinstance(raw, list) or len(raw) != len(keys):
+        raise CursorInvalido("Cursor inválido.")
+    try:
+        return [model._meta.get_field(key).to_python(value) for key, value in zip(keys, raw)]
+    except ValidationError as exc:
+        raise CursorInvalido("Cursor inválido.") from exc
+
+
+def keyset_filter(keys, values, descending=True):
+    """
+    Condición "fila posterior al cursor" para un orden compuesto.
+
+    Para (a, b, c) descendente genera:
+    a < va OR (a = va AND b < vb) OR (a = va AND b = vb AND c < vc)
+    """
+    lookup = "lt" if descending else "gt"
+    condicion = Q()
+    iguales = {}
+    for key, value in zip(keys, values):
+        condicion |= Q(**iguales, **{f"{key}__{lookup}": value})
+        iguales[key] = value
+    return condicion
+
+
+class KeysetPaginator:
+    """
+    Paginación por cursor (keyset) sobre un orden compuesto y estable.
+
+    A diferencia de OFFSET, el costo de cada página no crece con la
+    profundidad: la base de datos salta directo al cursor usando el índice.
+    """
+
+    def __init__(self, queryset, keys, per_page, descending=True):
+        self.queryset = queryset
+        self.keys = tuple(keys)
+        self.per_page = per_page
+        self.descending = descending
+
+    def ordering(self):
+        prefix = "-" if self.descending else ""
+        return [f"{prefix}{key}" for key in self.keys]
+
+    def page(self, cursor=None, fields=None):
+        """Devuelve (filas, siguiente_cursor). Con ``fields`` las filas son dicts."""
+        qs = self.queryset.order_by(*self.ordering())
+        if cursor:
+            values = decode_cursor(cursor, self.queryset.model, self.keys)
+            qs = qs.filter(keyset_filter(self.keys, values, self.descending))
+        if fields is not None:
+            qs = qs.values(*dict.fromkeys(list(fields) + list(self.keys)))
+        # Se pide una fila extra para saber si existe una página siguiente
+        rows = list(qs[: self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        next_cursor = None
+        if has_next and rows:
+            last = rows[-1]
+            getter = last.get if isinstance(last, dict) else lambda key: getattr(last, key)
+            next_cursor = encode_cursor([getter(key) for key in self.keys])
+        return rows, next_cursor
@@ -0,0 +1,27 @@
+"""Datos mínimos que comparten los tests de las apps: obras con su ciudad y estado."""
+import datetime
+
+from .models import Ciudad, Estado, Pais
+
+
+def ubicacion():
+    """(ciudad, estado de obra) activos; se crean la primera vez."""
+    pais, _ = Pais.objects.get_or_create(nombre="Chile", defaults={"estado": 1})
+    ciudad, _ = Ciudad.objects.get_or_create(nombre="Santiago", pais=pais, defaults={"estado": 1})
+    estado, _ = Estado.objects.get_or_create(nombre="En curso", defaults={"estado": 1})
+    return ciudad, estado
+
+
+def crear_obra(codigo="OB-1", nombre="Edificio Norte", **campos):
+    from obras.models import Obra
+
+    ciudad, estado = ubicacion()
+    datos = {
+        "direccion": "Calle 1",
+        "ciudad": ciudad,
+        "estado_obra": estado,
+        "fecha_inicio": datetime.date(2025, 1, 1),
+        "fecha_fin_estimada": datetime.date(2026, 1, 1),
+        **campos,
+    }
+    return Obra.objects.create(codigo=codigo, nombre=nombre, **datos)
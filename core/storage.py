@@ -0,0 +1,119 @@
+"""
+Storage direccionado por contenido para los medios subidos por usuarios.
+
+Cada archivo se guarda en ``cas/ab/cd/<sha256><ext>``: si el mismo
+contenido se sube otra vez solo se calcula el hash y se suma una referencia
+en ``ArchivoContenido``, sin escribir nada en disco. Como la ruta depende
+del contenido, la URL de un archivo nunca cambia y puede cachearse sin
+expiración.
+"""
+import hashlib
+import os
+import uuid
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+CAS_DIR = "cas"
+
+
+def hash_contenido(content):
+    """SHA-256 del archivo leyendo por bloques; deja el puntero al inicio."""
+    digest = hashlib.sha256()
+    if hasattr(content, "seek"):
+        content.seek(0)
+    for bloque in content.chunks():
+        digest.update(bloque)
+    if hasattr(content, "seek"):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def nombre_cas(sha256, nombre_original):
+    extension = os.path.splitext(nombre_original)[1].lower()
+    return f"{CAS_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+def sumar_referencia(sha256, nombre, tamano, cantidad=1):
+    from core.models import ArchivoContenido
+
+    actualizados = ArchivoContenido.objects.filter(sha256=sha256).update(referencias=F("referencias") + cantidad)
+    if not actualizados:
+        try:
+            with transaction.atomic():
+                ArchivoContenido.objects.create(sha256=sha256, nombre=nombre, tamano=tamano, referencias=cantidad)
+        except IntegrityError:
+            # Otro proceso registró el mismo contenido al mismo tiempo
+            ArchivoContenido.objects.filter(sha256=sha256).update(referencias=F("referencias") + cantidad)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre definitivo se decide en _save a partir del contenido
+        return name
+
+    def _save(self, name, content):
+        sha256 = getattr(content, "sha256", None) or hash_contenido(content)
+        destino = nombre_cas(sha256, name)
+        ruta = self.path(destino)
+        with transaction.atomic():
+            # La referencia va antes de mirar el disco: con la fila bloqueada, un delete()
+            # concurrente del mismo contenido no puede borrar el archivo que se va a reutilizar
+            sumar_referencia(sha256, destino, content.size)
+            if not os.path.exists(ruta):
+                os.makedirs(os.path.dirname(ruta), exist_ok=True)
+                if hasattr(content, "temporary_file_path"):
+                    file_move_safe(content.temporary_file_path(), ruta, allow_overwrite=True)
+                else:
+                    # Se escribe a un temporal y se renombra: el reemplazo es atómico
+                    temporal = f"{ruta}.{uuid.uuid4().hex}.tmp"
+                    with open(temporal, "wb") as fh:
+                        for bloque in content.chunks():
+                            fh.write(bloque)
+                    os.replace(temporal, ruta)
+                if self.file_permissions_mode is not None:
+                    os.chmod(ruta, self.file_permissions_mode)
+        return destino
+
+    def delete(self, name):
+        """Resta una referencia; el archivo se borra cuando nadie más lo usa."""
+        from core.models import ArchivoContenido
+        from core.thumbnails import delete_derivatives
+
+        if not name or not name.startswith(f"{CAS_DIR}/"):
+            return super().delete(name)
+        sha256 = os.path.splitext(os.path.basename(name))[0]
+        with transaction.atomic():
+            registro = ArchivoContenido.objects.select_for_update().filter(sha256=sha256).first()
+            if registro and registro.referencias > 1:
+                registro.referencias = F("referencias") - 1
+                registro.save(update_fields=["referencias"])
+                return
+            if registro:
+                registro.delete()
+            # Todavía con la fila bloqueada: un _save() del mismo contenido espera y vuelve a escribirlo
+            super().delete(name)
+            delete_derivatives(name)
+
+
+def liberar_archivo(field_file):
+    """Resta la referencia del archivo cuando la transacción en curso se confirma."""
+    if not field_file or not field_file.name:
+        return
+    name, storage = field_file.name, field_file.storage
+    if isinstance(storage, ContentAddressedStorage):
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+_media_storage = None
+
+
+def media_storage():
+    """Callable para ``storage=`` en los FileField/ImageField de medios."""
+    global _media_storage
+    if _media_storage is None:
+        _media_storage = ContentAddressedStorage()
+    return _media_storage
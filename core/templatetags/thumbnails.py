@@ -0,0 +1,13 @@
+from django import template
+
+from core.thumbnails import derivative_url
+
+register = template.Library()
+
+
+@register.filter
+def derivado(field_file, variante="thumb"):
+    """``{{ gasto.foto|derivado:"thumb" }}`` -> URL del derivado o del original."""
+    if not field_file:
+        return ""
+    return derivative_url(field_file.name, variante, field_file.storage)
@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from obras.forms import ObraForm
+from . import catalogs
+from .choices import ESTADO_ACTIVO, ESTADO_INACTIVO
+from .forms import CiudadForm
+from .models import Ciudad, Pais
+from .pruebas import ubicacion
+
+
+class CargarCiudadesTest(TestCase):
+    def setUp(self):
+        self.directorio = self.enterContext(tempfile.TemporaryDirectory())
+
+    def archivo(self, nombre, contenido):
+        ruta = os.path.join(self.directorio, nombre)
+        with open(ruta, "w", encoding="utf-8") as fh:
+            fh.write(contenido)
+        return ruta
+
+    def cargar(self, ruta, *opciones):
+        call_command("cargar_ciudades", ruta, *opciones, stdout=open(os.devnull, "w"))
+
+    def ciudades(self):
+        return set(Ciudad.objects.values_list("nombre", "pais__nombre", "estado"))
+
+    def test_cargar_dos_veces_no_duplica(self):
+        ruta = self.archivo("ciudades.csv", "País;Región;Ciudad\nChile;RM;Santiago\nChile;Valparaíso;Viña del Mar\n")
+        self.cargar(ruta)
+        self.cargar(ruta)
+        self.assertEqual(self.ciudades(), {
+            ("Santiago", "Chile", ESTADO_INACTIVO), ("Viña Del Mar", "Chile", ESTADO_INACTIVO),
+        })
+        self.assertEqual(Pais.objects.count(), 1)
+
+    def test_variantes_de_tildes_y_mayusculas_en_un_lote_se_unen(self):
+        ruta = self.archivo("ciudades.csv", "pais,ciudad\nChile,Viña del Mar\nchile,VINA  DEL MAR\nCHILE,santiago\n")
+        self.cargar(ruta)
+        self.assertEqual(Ciudad.objects.count(), 2)
+        self.assertEqual(list(Pais.objects.values_list("nombre", flat=True)), ["Chile"])
+
+    def test_activas_reactiva_las_existentes(self):
+        ruta = self.archivo("ciudades.csv", "pais;ciudad\nChile;Santiago\n")
+        self.cargar(ruta)
+        self.cargar(ruta, "--activas")
+        self.assertEqual(self.ciudades(), {("Santiago", "Chile", ESTADO_ACTIVO)})
+
+    def test_json_por_pais_y_region(self):
+        ruta = self.archivo("ciudades.json", json.dumps({"Perú": {"Lima": ["Lima", "Callao"], "Cusco": ["Cusco"]}}))
+        self.cargar(ruta)
+        self.assertEqual(
+            set(Ciudad.objects.values_list("nombre", "pais__nombre")),
+            {("Lima", "Perú"), ("Callao", "Perú"), ("Cusco", "Perú")},
+        )
+
+
+class CiudadesDataTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("admin", password="x")
+        chile = Pais.objects.create(nombre="Chile")
+        for nombre in ("Arica", "Temuco", "Osorno"):
+            Ciudad.objects.create(nombre=nombre, pais=chile)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def test_pagina_por_cursor(self):
+        url = reverse("core:ciudades_data")
+        primera = self.client.get(url, {"length": 2}).json()
+        self.assertEqual(primera["recordsTotal"], 3)
+        self.assertEqual([c["nombre"] for c in primera["data"]], ["Arica", "Osorno"])
+
+        segunda = self.client.get(url, {"length": 2, "cursor": primera["next_cursor"]}).json()
+        self.assertEqual([c["nombre"] for c in segunda["data"]], ["Temuco"])
+        self.assertIsNone(segunda["recordsTotal"])
+        self.assertIsNone(segunda["next_cursor"])
+        self.assertEqual(self.client.get(url, {"cursor": "roto"}).status_code, 400)
+
+
+class CatalogosTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("admin", password="x")
+        cls.ciudad, cls.estado = ubicacion()
+        cls.peru = Pais.objects.create(nombre="Perú", estado=ESTADO_INACTIVO)
+        cls.lima = Ciudad.objects.create(nombre="Lima", pais=cls.peru, estado=ESTADO_INACTIVO)
+
+    def setUp(self):
+        # La copia del proceso sobrevive entre tests: una versión nueva obliga a releer
+        cache.delete(catalogs.CLAVE_VERSION)
+        self.client.force_login(self.usuario)
+
+    def opciones_ciudad(self):
+        return [nombre for _, nombre in ObraForm().fields["ciudad"].choices]
+
+    def test_activar_publica_una_version_nueva_al_confirmar(self):
+        self.assertNotIn("Lima (Perú)", self.opciones_ciudad())
+        antes = catalogs.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("core:ciudad_toggle_estado", args=[self.lima.pk]))
+            self.client.post(reverse("core:pais_toggle_estado", args=[self.peru.pk]))
+            # Hasta el commit nadie ve el cambio
+            self.assertEqual(catalogs.version(), antes)
+        self.assertNotEqual(catalogs.version(), antes)
+        self.assertIn("Lima (Perú)", self.opciones_ciudad())
+        self.assertIn((self.peru.pk, "Perú"), CiudadForm().fields["pais"].choices)
+
+    def test_copia_desactualizada_igual_valida_contra_la_base(self):
+        self.assertIn("Santiago (Chile)", self.opciones_ciudad())
+        # Cambio por fuera de las vistas: no se invalida y la copia queda vieja
+        Ciudad.objects.filter(pk=self.ciudad.pk).update(estado=ESTADO_INACTIVO)
+        self.assertIn("Santiago (Chile)", self.opciones_ciudad())
+
+        form = ObraForm(data={
+            "nombre": "Edificio Norte", "codigo": "OB-1", "direccion": "Calle 1", "ciudad": self.ciudad.pk,
+            "fecha_inicio": "2025-01-01", "fecha_fin_estimada": "2026-01-01", "estado_obra": self.estado.pk,
+        })
+        self.assertFalse(form.is_valid())
+        self.assertEqual(list(form.errors), ["ciudad"])
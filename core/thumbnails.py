@@ -0,0 +1,177 @@
+"""
+Derivados de imágenes (miniatura, vista previa y WebP) para las fotos subidas.
+
+Los derivados se guardan junto al original bajo ``derivados/`` con un nombre
+deducible del archivo original, así las vistas pueden construir la URL sin
+columnas extra en la base de datos. La generación corre en un pool de hilos
+después del commit, fuera del ciclo de la petición.
+
+Qué variantes existen de cada archivo queda anotado en la caché ``derivados`` al
+generarlas o borrarlas: los listados leen esa anotación en una sola consulta a
+la caché en vez de consultar el storage por cada fila.
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DERIVADOS_DIR = "derivados"
+EXTENSIONES_IMAGEN = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+# variante -> (tamaño máximo, formato PIL, extensión, opciones de guardado)
+VARIANTES = {
+    "thumb": ((160, 120), "JPEG", ".jpg", {"quality": 75, "optimize": True}),
+    "medium": ((1024, 1024), "JPEG", ".jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    "webp": ((1920, 1920), "WEBP", ".webp", {"quality": 80, "method": 4}),
+}
+
+# Alias propio en CACHES: las anotaciones crecen con las fotos y no deben desplazar otras claves
+CACHE = "derivados"
+
+# Un archivo sin derivados puede estar esperando su generación: se vuelve a mirar pronto
+SIN_DERIVADOS_TTL = 300
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "THUMBNAIL_WORKERS", 2),
+            thread_name_prefix="derivados",
+        )
+    return _executor
+
+
+def is_image_name(name):
+    return bool(name) and os.path.splitext(name)[1].lower() in EXTENSIONES_IMAGEN
+
+
+def derivative_name(name, variante):
+    """``libro_obras/a.png`` -> ``derivados/libro_obras/a_thumb.jpg``."""
+    base, _ = os.path.splitext(name)
+    extension = VARIANTES[variante][2]
+    return f"{DERIVADOS_DIR}/{base}_{variante}{extension}"
+
+
+def _clave(name):
+    return "derivados:" + hashlib.sha1(name.encode()).hexdigest()
+
+
+def _anotar(name, variantes):
+    caches[CACHE].set(_clave(name), sorted(variantes), None if variantes else SIN_DERIVADOS_TTL)
+
+
+def existing_derivatives(names):
+    """``{nombre: set(variantes)}`` de las imágenes indicadas, desde la caché.
+
+    Los nombres que la caché no conoce (p. ej. derivados generados antes de
+    anotarlos) se consultan una vez en el storage y quedan anotados.
+    """
+    nombres = {name for name in names if is_image_name(name)}
+    claves = {_clave(name): name for name in nombres}
+    anotados = caches[CACHE].get_many(claves)
+    existentes = {claves[clave]: set(variantes) for clave, variantes in anotados.items()}
+    for name in nombres - existentes.keys():
+        existentes[name] = {
+            variante for variante in VARIANTES if default_storage.exists(derivative_name(name, variante))
+        }
+        _anotar(name, existentes[name])
+    return existentes
+
+
+def accepts_webp(request):
+    """True si el cliente declara soporte WebP en ``Accept``."""
+    return "image/webp" in request.headers.get("Accept", "")
+
+
+def derivative_url(name, variante, storage=None, existentes=None):
+    """URL del derivado si ya existe; si no, la del original.
+
+    ``existentes`` es el resultado de ``existing_derivatives`` para no volver a
+    consultar la caché por cada fila de un listado.
+    """
+    if not name:
+        return ""
+    storage = storage or default_storage
+    if is_image_name(name):
+        if existentes is None:
+            existentes = existing_derivatives([name])
+        if variante in existentes.get(name, ()):
+            return default_storage.url(derivative_name(name, variante))
+    return storage.url(name)
+
+
+def generate_derivatives(name, storage=None, overwrite=False):
+    """Genera las variantes que falten para ``name``. Devuelve cuántas creó."""
+    if not is_image_name(name):
+        return 0
+    storage = storage or default_storage
+    pendientes = [
+        variante for variante in VARIANTES
+        if overwrite or not default_storage.exists(derivative_name(name, variante))
+    ]
+    if not pendientes:
+        _anotar(name, VARIANTES)
+        return 0
+
+    try:
+        with storage.open(name, "rb") as fh:
+            imagen = Image.open(fh)
+            imagen = ImageOps.exif_transpose(imagen)
+            if imagen.mode not in ("RGB", "L"):
+                imagen = imagen.convert("RGB")
+            creadas = 0
+            for variante in pendientes:
+                tamano, formato, _, opciones = VARIANTES[variante]
+                copia = imagen.copy()
+                copia.thumbnail(tamano, Image.LANCZOS)
+                buffer = BytesIO()
+                copia.save(buffer, formato, **opciones)
+                destino = derivative_name(name, variante)
+                if default_storage.exists(destino):
+                    default_storage.delete(destino)
+                default_storage.save(destino, ContentFile(buffer.getvalue()))
+                creadas += 1
+            _anotar(name, VARIANTES)
+            return creadas
+    except (FileNotFoundError, UnidentifiedImageError, OSError) as exc:
+        logger.warning("No se pudieron generar derivados de %s: %s", name, exc)
+        return 0
+
+
+def delete_derivatives(name):
+    for variante in VARIANTES:
+        derivado = derivative_name(name, variante)
+        if default_storage.exists(derivado):
+            default_storage.delete(derivado)
+    caches[CACHE].delete(_clave(name))
+
+
+def _generate_safe(name, storage):
+    try:
+        generate_derivatives(name, storage)
+    except Exception:
+        logger.exception("Error generando derivados de %s", name)
+
+
+def schedule_derivatives(field_file):
+    """Encola la generación de derivados una vez confirmada la transacción."""
+    if not field_file or not is_image_name(field_file.name):
+        return
+    name, storage = field_file.name, field_file.storage
+    if getattr(settings, "THUMBNAIL_SYNC", False):
+        transaction.on_commit(lambda: _generate_safe(name, storage))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_generate_safe, name, storage))
@@ -0,0 +1,153 @@
+"""
+Handler de subida que aplica límites mientras el archivo llega.
+
+Reemplaza a los handlers por defecto de Django en las vistas que reciben
+archivos: corta la lectura del cuerpo apenas un archivo supera el tamaño,
+la cantidad de archivos excede el máximo o los primeros bytes no
+corresponden a un formato permitido. El tipo de contenido del archivo
+resultante es el detectado, no el que declaró el navegador.
+"""
+import os
+from functools import wraps
+
+from django.contrib import messages
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.http import JsonResponse, QueryDict
+from django.shortcuts import redirect
+from django.utils.datastructures import MultiValueDict
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+# extensión -> tipos detectables por firma que se aceptan para ella
+TIPOS_POR_EXTENSION = {
+    ".jpg": {"image/jpeg"},
+    ".jpeg": {"image/jpeg"},
+    ".png": {"image/png"},
+    ".gif": {"image/gif"},
+    ".webp": {"image/webp"},
+    ".mp4": {"video/mp4", "video/quicktime"},
+    ".mov": {"video/quicktime", "video/mp4"},
+    ".avi": {"video/x-msvideo"},
+    ".mkv": {"video/x-matroska"},
+    ".xlsx": {"application/zip"},
+    ".csv": {"text/plain"},
+}
+BYTES_FIRMA = 16
+
+
+def detectar_tipo(cabecera):
+    """Tipo MIME según los primeros bytes del archivo, o None si no se reconoce."""
+    if cabecera.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if cabecera.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if cabecera[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if cabecera[:4] == b"RIFF" and cabecera[8:12] == b"WEBP":
+        return "image/webp"
+    if cabecera[:4] == b"RIFF" and cabecera[8:12] == b"AVI ":
+        return "video/x-msvideo"
+    if cabecera[4:8] == b"ftyp":
+        return "video/quicktime" if cabecera[8:12] == b"qt  " else "video/mp4"
+    if cabecera.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/x-matroska"
+    if cabecera.startswith(b"PK\x03\x04"):
+        return "application/zip"
+    # Texto: sin bytes de control fuera de tabulación y saltos de línea
+    if cabecera and all(b >= 0x20 or b in b"\t\r\n" for b in cabecera):
+        return "text/plain"
+    return None
+
+
+class LimiteSubidaHandler(TemporaryFileUploadHandler):
+    """Escribe a disco como TemporaryFileUploadHandler, validando cada bloque."""
+
+    def __init__(self, request, max_archivos, max_tamano, extensiones):
+        super().__init__(request)
+        self.max_archivos = max_archivos
+        self.max_tamano = max_tamano
+        self.extensiones = {ext.lower() for ext in extensiones}
+        self.cantidad = 0
+        self.recibidos = 0
+        self.cabecera = b""
+        self.tipo_detectado = None
+
+    def _rechazar(self, mensaje, status):
+        self.request.subida_rechazada = (mensaje, status)
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Un cuerpo que ya declara más de lo posible se rechaza sin leerlo
+        if content_length and content_length > self.max_archivos * self.max_tamano + 1024 * 1024:
+            self.request.subida_rechazada = ("La solicitud excede el tamaño máximo permitido.", 413)
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return super().handle_raw_input(input_data, META, content_length, boundary, encoding)
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        self.cantidad += 1
+        if self.cantidad > self.max_archivos:
+            self._rechazar(f"Solo se permiten {self.max_archivos} archivo(s) por envío.", 400)
+        extension = os.path.splitext(file_name or "")[1].lower()
+        if extension not in self.extensiones:
+            self._rechazar(f'El archivo "{file_name}" no tiene un formato permitido.', 400)
+        self.extension = extension
+        self.recibidos = 0
+        self.cabecera = b""
+        self.tipo_detectado = None
+        super().new_file(field_name, file_name, *args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.recibidos += len(raw_data)
+        if self.recibidos > self.max_tamano:
+            limite = self.max_tamano // (1024 * 1024)
+            self._rechazar(f'El archivo "{self.file_name}" excede {limite}MB.', 413)
+        if self.tipo_detectado is None:
+            self.cabecera += raw_data[: BYTES_FIRMA - len(self.cabecera)]
+            if len(self.cabecera) >= BYTES_FIRMA or len(raw_data) < self.chunk_size:
+                tipo = detectar_tipo(self.cabecera)
+                if tipo not in TIPOS_POR_EXTENSION.get(self.extension, set()):
+                    self._rechazar(f'El contenido de "{self.file_name}" no corresponde a su formato.', 400)
+                self.tipo_detectado = tipo
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.tipo_detectado is None:
+            # Archivo más corto que la firma
+            tipo = detectar_tipo(self.cabecera)
+            if tipo not in TIPOS_POR_EXTENSION.get(self.extension, set()):
+                self._rechazar(f'El contenido de "{self.file_name}" no corresponde a su formato.', 400)
+            self.tipo_detectado = tipo
+        archivo = super().file_complete(file_size)
+        archivo.content_type = self.tipo_detectado
+        return archivo
+
+
+def limitar_subidas(max_archivos, max_tamano, extensiones):
+    """
+    Decorador para vistas con archivos: instala LimiteSubidaHandler.
+
+    Los handlers deben fijarse antes de que se lea request.POST, por eso la
+    vista se marca csrf_exempt y la verificación CSRF se hace adentro, ya
+    con el cuerpo parseado por el handler.
+    """
+    def decorator(view):
+        protegida = csrf_protect(view)
+
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method == "POST":
+                request.upload_handlers = [LimiteSubidaHandler(request, max_archivos, max_tamano, extensiones)]
+                request.POST  # fuerza el parseo con el handler instalado
+                rechazo = getattr(request, "subida_rechazada", None)
+                if rechazo:
+                    # No se ejecuta la vista: basta con informar el rechazo
+                    mensaje, status = rechazo
+                    if request.headers.get("x-requested-with") == "XMLHttpRequest":
+                        return JsonResponse({"success": False, "message": mensaje}, status=status)
+                    messages.error(request, mensaje)
+                    return redirect(request.get_full_path())
+            return protegida(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -12,6 +12,7 @@ urlpatterns = [
     path('paises/<int:pk>/toggle-estado/', views.pais_toggle_estado, name='pais_toggle_estado'),
     #CIUDADES
     path('ciudades/', views.ciudades_list, name='ciudades_list'),
+    path('ciudades/data/', views.ciudades_data, name='ciudades_data'),
     path('ciudades/crear/', views.ciudad_create, name='ciudad_create'),
     path('ciudades/<int:pk>/editar/', views.ciudad_update, name='ciudad_update'),
     path('ciudades/<int:pk>/eliminar/', views.ciudad_delete, name='ciudad_delete'),
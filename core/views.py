@@ -3,9 +3,16 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.db.models import ProtectedError, Q
+from django.urls import reverse
+from django.views.decorators.http import require_GET
 from .models import Pais, Ciudad, Estado
 from .forms import PaisForm, CiudadForm, EstadoForm
+from . import catalogs
 from core.choices import ESTADO_ACTIVO, ESTADO_INACTIVO
+from core.pagination import CursorInvalido, KeysetPaginator
+
+CIUDADES_POR_PAGINA = 25
+CIUDADES_MAX_POR_PAGINA = 100
 
 #PAIS
 @login_required
@@ -22,6 +29,7 @@ def pais_create(request):
             pais.creado_por = request.user
             pais.estado = ESTADO_INACTIVO
             pais.save()
+            catalogs.invalidar()
             messages.success(request, 'País creado exitosamente.')
             return redirect('core:paises_list')
     else:
@@ -38,6 +46,7 @@ def pais_update(request, pk):
             pais = form.save(commit=False)
             pais.creado_por = request.user
             pais.save()
+            catalogs.invalidar()
             messages.success(request, 'País actualizado exitosamente.')
             return redirect('core:paises_list')
     else:
@@ -50,6 +59,7 @@ def pais_delete(request, pk):
     pais = get_object_or_404(Pais, pk=pk)
     try:
         pais.delete()
+        catalogs.invalidar()
         messages.success(request, 'País eliminado exitosamente.')
     except ProtectedError:
         messages.error(request, 'No se puede eliminar el país porque tiene registros relacionados.')
@@ -63,14 +73,70 @@ def pais_toggle_estado(request, pk):
         nuevo_estado = ESTADO_INACTIVO if pais.estado == ESTADO_ACTIVO else ESTADO_ACTIVO
         pais.estado = nuevo_estado
         pais.save()
+        catalogs.invalidar()
         return JsonResponse({'success': True, 'estado': pais.estado})
     return JsonResponse({'success': False}, status=400)
 
 #CIUDAD
 @login_required
 def ciudades_list(request):
-    ciudades = Ciudad.objects.select_related('pais').all().order_by('nombre')
-    return render(request, 'core/ciudad/ciudades_list.html', {'ciudades': ciudades})
+    # Las filas llegan desde ciudades_data: la tabla puede tener decenas de miles de ciudades
+    return render(request, 'core/ciudad/ciudades_list.html', {'paises': catalogs.paises()})
+
+@login_required
+@require_GET
+def ciudades_data(request):
+    """Feed JSON para DataTables server-side: búsqueda por prefijo y paginación por cursor (nombre, id)."""
+    try:
+        length = int(request.GET.get('length', CIUDADES_POR_PAGINA))
+    except (TypeError, ValueError):
+        length = CIUDADES_POR_PAGINA
+    length = max(1, min(length, CIUDADES_MAX_POR_PAGINA))
+
+    ciudades = Ciudad.objects.all()
+    q = (request.GET.get('q') or '').strip()
+    if q:
+        ciudades = ciudades.filter(Q(nombre__istartswith=q) | Q(pais__nombre__istartswith=q))
+    pais = request.GET.get('pais')
+    if pais and pais.isdigit():
+        ciudades = ciudades.filter(pais_id=pais)
+    estado = request.GET.get('estado')
+    if estado in (str(ESTADO_ACTIVO), str(ESTADO_INACTIVO)):
+        ciudades = ciudades.filter(estado=estado)
+
+    cursor = request.GET.get('cursor') or None
+    # El total solo se calcula en la primera página; el cliente lo conserva
+    total = None if cursor else ciudades.count()
+    paginator = KeysetPaginator(ciudades, ('nombre', 'id'), length, descending=False)
+    try:
+        filas, next_cursor = paginator.page(cursor, fields=(
+            'id', 'nombre', 'estado', 'fecha_creacion', 'pais__nombre',
+            'creado_por__first_name', 'creado_por__last_name', 'creado_por__username',
+        ))
+    except CursorInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    data = []
+    for fila in filas:
+        creador = f"{fila['creado_por__first_name'] or ''} {fila['creado_por__last_name'] or ''}".strip()
+        data.append({
+            'id': fila['id'],
+            'nombre': fila['nombre'],
+            'pais': fila['pais__nombre'],
+            'creador': creador or fila['creado_por__username'] or '-',
+            'estado': fila['estado'],
+            'fecha_creacion': fila['fecha_creacion'].strftime('%d/%m/%Y'),
+            'editar_url': reverse('core:ciudad_update', args=[fila['id']]),
+            'toggle_url': reverse('core:ciudad_toggle_estado', args=[fila['id']]),
+        })
+
+    return JsonResponse({
+        'draw': request.GET.get('draw'),
+        'recordsTotal': total,
+        'recordsFiltered': total,
+        'next_cursor': next_cursor,
+        'data': data,
+    })
 
 @login_required
 def ciudad_create(request):
@@ -81,6 +147,7 @@ def ciudad_create(request):
             ciudad.creado_por = request.user
             ciudad.estado = ESTADO_INACTIVO
             ciudad.save()
+            catalogs.invalidar()
             messages.success(request, 'Ciudad creada exitosamente.')
             return redirect('core:ciudades_list')
     else:
@@ -97,6 +164,7 @@ def ciudad_update(request, pk):
             ciudad = form.save(commit=False)
             ciudad.creado_por = request.user
             ciudad.save()
+            catalogs.invalidar()
             messages.success(request, 'Ciudad actualizada exitosamente.')
             return redirect('core:ciudades_list')
     else:
@@ -109,6 +177,7 @@ def ciudad_delete(request, pk):
     ciudad = get_object_or_404(Ciudad, pk=pk)
     try:
         ciudad.delete()
+        catalogs.invalidar()
         messages.success(request, 'Ciudad eliminada exitosamente.')
     except ProtectedError:
         messages.error(request, 'No se puede eliminar la ciudad porque tiene registros relacionados.')
@@ -121,13 +190,14 @@ def ciudad_toggle_estado(request, pk):
         nuevo_estado = ESTADO_INACTIVO if ciudad.estado == ESTADO_ACTIVO else ESTADO_ACTIVO
         ciudad.estado = nuevo_estado
         ciudad.save()
+        catalogs.invalidar()
         return JsonResponse({'success': True, 'estado': ciudad.estado})
     return JsonResponse({'success': False}, status=400)
 
 #ESTADO
 @login_required
 def estados_list(request):
-    estados = Estado.objects.all().order_by('nombre')
+    estados = Estado.objects.select_related('creado_por').order_by('nombre')
     return render(request, 'core/estado/estados_list.html', {'estados': estados})
 
 @login_required
@@ -139,6 +209,7 @@ def estado_create(request):
             estado.creado_por = request.user
             estado.estado = ESTADO_INACTIVO
             estado.save()
+            catalogs.invalidar()
             messages.success(request, 'Estado creado exitosamente.')
             return redirect('core:estados_list')
     else:
@@ -158,6 +229,7 @@ def estado_update(request, pk):
             estado = form.save(commit=False)
             estado.creado_por = request.user
             estado.save()
+            catalogs.invalidar()
             messages.success(request, 'Estado actualizado exitosamente.')
             return redirect('core:estados_list')
     else:
@@ -170,6 +242,7 @@ def estado_delete(request, pk):
     estado = get_object_or_404(Estado, pk=pk)
     try:
         estado.delete()
+        catalogs.invalidar()
         messages.success(request, 'Estado eliminado exitosamente.')
     except ProtectedError:
         messages.error(request, 'No se puede eliminar el estado porque está en uso.')
@@ -182,5 +255,6 @@ def estado_toggle_estado(request, pk):
         nuevo_estado = ESTADO_INACTIVO if estado.estado == ESTADO_ACTIVO else ESTADO_ACTIVO
         estado.estado = nuevo_estado
         estado.save()
+        catalogs.invalidar()
         return JsonResponse({'success': True, 'estado': estado.estado})
     return JsonResponse({'success': False}, status=400)
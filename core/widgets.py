@@ -0,0 +1,41 @@
+from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+
+
+class AutocompleteSelect(forms.Select):
+    """
+    Select que solo renderiza la opción elegida; el resto llega por AJAX.
+
+    Con un ModelChoiceField el Select normal recorre el queryset completo
+    para armar las opciones. Este widget consulta únicamente el valor
+    seleccionado y deja la URL del endpoint en ``data-autocomplete-url``
+    para que ``assets/js/autocomplete.js`` busque al escribir.
+    """
+
+    def __init__(self, url_name, attrs=None, placeholder="Escribe para buscar..."):
+        super().__init__(attrs)
+        self.url_name = url_name
+        self.placeholder = placeholder
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs["data-autocomplete-url"] = reverse(self.url_name)
+        attrs["data-placeholder"] = self.placeholder
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        valores = [str(v) for v in value if v not in (None, "")]
+        opciones = [self.create_option(name, "", "", not valores, 0)]
+        queryset = getattr(self.choices, "queryset", None)
+        if valores and queryset is not None:
+            campo = self.choices.field
+            try:
+                seleccionados = list(queryset.filter(pk__in=valores))
+            except (ValueError, ValidationError):
+                seleccionados = []  # valor enviado inválido: el campo ya informa el error
+            for indice, objeto in enumerate(seleccionados, start=1):
+                opciones.append(self.create_option(
+                    name, campo.prepare_value(objeto), campo.label_from_instance(objeto), True, indice
+                ))
+        return [(None, opciones, 0)]
@@ -0,0 +1,35 @@
+#!/bin/bash
+# Perfil ASGI: workers de uvicorn bajo gunicorn (reemplaza a deploy/gunicorn.sh).
+# Cada worker atiende muchas conexiones en su event loop: una subida o descarga
+# lenta no retiene un worker. Las vistas sync corren en un hilo por solicitud.
+
+NAME="urbix"
+DJANGODIR=$(dirname $(cd `dirname $0` && pwd))
+DJANGODIR2=$(dirname $(dirname $(cd `dirname $0` && pwd)))
+SOCKFILE=/tmp/gunicorn-urbix.sock
+# Acumulados de métricas de cada worker (urbix.metricas); se suman en /metrics/
+METRICAS_DIR=/tmp/urbix-metricas
+LOGDIR=${DJANGODIR}/logs/gunicorn.log
+USER=root
+GROUP=root
+# Un worker por núcleo: la concurrencia la da el event loop, no la cantidad de procesos
+NUM_WORKERS=4
+DJANGO_ASGI_MODULE=urbix.asgi
+
+rm -frv $SOCKFILE
+rm -frv $METRICAS_DIR
+
+cd $DJANGODIR
+
+exec ${DJANGODIR2}/.venv/bin/gunicorn ${DJANGO_ASGI_MODULE}:application \
+  --worker-class uvicorn_worker.UvicornWorker \
+  --env DJANGO_SETTINGS_MODULE=urbix.production \
+  --env METRICAS_DIR=$METRICAS_DIR \
+  --name $NAME \
+  --workers $NUM_WORKERS \
+  --timeout 120 \
+  --graceful-timeout 30 \
+  --user=$USER --group=$GROUP \
+  --bind=unix:$SOCKFILE \
+  --log-level=debug \
+  --log-file=$LOGDIR
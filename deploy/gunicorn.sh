@@ -4,6 +4,8 @@ NAME="urbix"
 DJANGODIR=$(dirname $(cd `dirname $0` && pwd))
 DJANGODIR2=$(dirname $(dirname $(cd `dirname $0` && pwd)))
 SOCKFILE=/tmp/gunicorn-urbix.sock
+# Acumulados de métricas de cada worker (urbix.metricas); se suman en /metrics/
+METRICAS_DIR=/tmp/urbix-metricas
 LOGDIR=${DJANGODIR}/logs/gunicorn.log
 USER=root
 GROUP=root
@@ -11,11 +13,13 @@ NUM_WORKERS=8
 DJANGO_WSGI_MODULE=urbix.wsgi
 
 rm -frv $SOCKFILE
+rm -frv $METRICAS_DIR
 
 cd $DJANGODIR
 
 exec ${DJANGODIR2}/.venv/bin/gunicorn ${DJANGO_WSGI_MODULE}:application \
   --env DJANGO_SETTINGS_MODULE=urbix.production \
+  --env METRICAS_DIR=$METRICAS_DIR \
   --name $NAME \
   --workers $NUM_WORKERS \
   --user=$USER --group=$GROUP \
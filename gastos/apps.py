@@ -5,3 +5,6 @@ class GastosConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "gastos"
     verbose_name = "Gastos"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -2,6 +2,7 @@ from django import forms
 import datetime
 from .models import Proveedor, Categoria, TipoDocumento, Gasto
 from obras.models import Obra
+from core.widgets import AutocompleteSelect
 class ProveedorForm(forms.ModelForm):
     class Meta:
         model = Proveedor
@@ -115,8 +116,12 @@ class GastoForm(forms.ModelForm):
             empty_label="Selecciona una obra",
             required=True,
             label="Obra",
-            widget=forms.Select(attrs={"class": "form-select form-select-sm"}),
+            widget=AutocompleteSelect("obra_autocompletar", attrs={"class": "form-select form-select-sm"}),
         )
+        # Proveedores pueden ser miles: se buscan por nombre o RUT en vez de listarlos todos
+        if "proveedor" in self.fields:
+            self.fields["proveedor"].widget = AutocompleteSelect("admin_proveedores_autocompletar")
+            self.fields["proveedor"].widget.choices = self.fields["proveedor"].choices
 
         # Etiquetas vac?as m?s claras
         if hasattr(self.fields.get("categoria"), "empty_label"):
@@ -0,0 +1,284 @@
+"""
+Importación masiva de gastos desde planillas XLSX o CSV.
+
+El archivo se recorre fila a fila (openpyxl en modo read-only, o el lector
+csv sobre el archivo subido) sin cargarlo completo. Obra, proveedor,
+categoría y tipo de documento se resuelven contra diccionarios armados una
+sola vez al comenzar, así que validar una fila no consulta la base. Las
+filas válidas se insertan con ``bulk_create`` por lotes; las inválidas se
+escriben a un reporte CSV con el número de fila y el motivo.
+"""
+import csv
+import datetime
+import functools
+import io
+import os
+import re
+import unicodedata
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from obras import resumen
+from obras.models import Obra
+from . import rollups
+from .models import Categoria, Gasto, Proveedor, TipoDocumento, normalizar_rut
+
+LOTE = 1000
+COLUMNAS = ["obra", "categoria", "proveedor", "tipo_documento", "monto", "fecha", "nota"]
+OBLIGATORIAS = ["obra", "categoria", "proveedor", "tipo_documento", "monto", "fecha"]
+# Encabezados alternativos que se aceptan para cada columna
+ALIAS = {
+    "codigo_obra": "obra",
+    "categoria_gasto": "categoria",
+    "rut": "proveedor",
+    "rut_proveedor": "proveedor",
+    "tipo_doc": "tipo_documento",
+    "tipo": "tipo_documento",
+    "documento": "tipo_documento",
+    "monto_clp": "monto",
+    "observacion": "nota",
+    "observaciones": "nota",
+}
+FORMATOS_FECHA = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y")
+MONTO_MAXIMO = Decimal("9999999999.99")  # max_digits=12, decimal_places=2
+
+
+class ArchivoInvalido(ValueError):
+    """El archivo no se puede leer o no tiene las columnas necesarias."""
+
+
+class _PuntoYComa(csv.excel):
+    delimiter = ";"
+
+
+# Los mismos nombres se repiten en miles de filas
+@functools.lru_cache(maxsize=4096)
+def _clave(valor):
+    """Texto en minúsculas, sin tildes ni espacios repetidos, para comparar nombres."""
+    texto = unicodedata.normalize("NFKD", str(valor or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join(texto.lower().split())
+
+
+def _encabezado(valor):
+    nombre = _clave(valor).replace(" ", "_")
+    return ALIAS.get(nombre, nombre)
+
+
+def leer_filas(archivo, nombre):
+    """Genera listas de valores por fila, encabezado incluido, para un XLSX o un CSV."""
+    extension = os.path.splitext(nombre or "")[1].lower()
+    if extension == ".xlsx":
+        try:
+            libro = load_workbook(archivo, read_only=True, data_only=True)
+        except Exception as exc:
+            raise ArchivoInvalido("No se pudo leer la planilla Excel.") from exc
+        try:
+            for fila in libro.worksheets[0].iter_rows(values_only=True):
+                yield list(fila)
+        finally:
+            libro.close()
+        return
+    if extension == ".csv":
+        texto = io.TextIOWrapper(getattr(archivo, "file", archivo), encoding="utf-8-sig", errors="replace", newline="")
+        try:
+            muestra = texto.read(4096)
+            texto.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=";,\t")
+            except csv.Error:
+                dialecto = _PuntoYComa
+            yield from csv.reader(texto, dialecto)
+        finally:
+            texto.detach()
+        return
+    raise ArchivoInvalido("El archivo debe ser .xlsx o .csv.")
+
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def parsear_monto(valor):
+    if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+        monto = Decimal(str(valor))
+    else:
+        texto = re.sub(r"[\s$]", "", _texto(valor))
+        if "," in texto:
+            # 1.234,50 -> coma decimal, puntos de miles
+            texto = texto.replace(".", "").replace(",", ".")
+        elif re.fullmatch(r"-?\d{1,3}(\.\d{3})+", texto):
+            texto = texto.replace(".", "")
+        try:
+            monto = Decimal(texto)
+        except InvalidOperation:
+            raise ValueError("Monto inválido.")
+    if not monto.is_finite():
+        raise ValueError("Monto inválido.")
+    if monto <= 0:
+        raise ValueError("No se pueden ingresar montos iguales o menores a 0.")
+    monto = monto.quantize(Decimal("0.01"))
+    if monto > MONTO_MAXIMO:
+        raise ValueError("El monto excede el máximo permitido.")
+    return monto
+
+
+def parsear_fecha(valor):
+    if isinstance(valor, datetime.datetime):
+        return valor.date()
+    if isinstance(valor, datetime.date):
+        return valor
+    texto = _texto(valor)[:10]
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError("Fecha inválida (usa AAAA-MM-DD o DD-MM-AAAA).")
+
+
+class Catalogos:
+    """Diccionarios de búsqueda armados una vez por importación (una consulta por tabla)."""
+
+    def __init__(self):
+        self.obras = {}
+        for pk, codigo, nombre in Obra.objects.values_list("id", "codigo", "nombre").iterator():
+            self.obras[_clave(codigo)] = pk
+            # Por nombre solo si no choca con el código de otra obra
+            self.obras.setdefault(_clave(nombre), pk)
+        self.proveedores = {}
+        for pk, rut, nombre in Proveedor.objects.values_list("id", "rut_normalizado", "nombre").iterator():
+            self.proveedores[rut] = pk
+            self.proveedores[_clave(nombre)] = pk
+        self.categorias = {_clave(nombre): pk for pk, nombre in Categoria.objects.values_list("id", "nombre")}
+        self.tipos = {_clave(nombre): pk for pk, nombre in TipoDocumento.objects.values_list("id", "nombre")}
+
+    def proveedor(self, valor):
+        rut = normalizar_rut(valor)
+        if len(rut) >= 7 and rut in self.proveedores:
+            return self.proveedores[rut]
+        return self.proveedores.get(_clave(valor))
+
+
+def _resolver(catalogos, datos):
+    """Gasto sin guardar a partir de los valores de la fila, o ValueError con los problemas."""
+    errores = [f"Falta {campo.replace('_', ' ')}." for campo in OBLIGATORIAS if not _texto(datos.get(campo))]
+    if errores:
+        raise ValueError(" ".join(errores))
+    referencias = {
+        "obra_id": (catalogos.obras.get(_clave(datos["obra"])), "Obra no encontrada."),
+        "categoria_id": (catalogos.categorias.get(_clave(datos["categoria"])), "Categoría no encontrada."),
+        "proveedor_id": (catalogos.proveedor(datos["proveedor"]), "Proveedor no encontrado."),
+        "tipo_documento_id": (catalogos.tipos.get(_clave(datos["tipo_documento"])), "Tipo de documento no encontrado."),
+    }
+    errores = [mensaje for pk, mensaje in referencias.values() if pk is None]
+    valores = {campo: pk for campo, (pk, _) in referencias.items()}
+    for campo, parser in (("monto", parsear_monto), ("fecha", parsear_fecha)):
+        try:
+            valores[campo] = parser(datos[campo])
+        except ValueError as exc:
+            errores.append(str(exc))
+    if errores:
+        raise ValueError(" ".join(errores))
+    return Gasto(nota=_texto(datos.get("nota")), **valores)
+
+
+class _Reporte:
+    """Reporte CSV de filas rechazadas, escrito a disco a medida que aparecen."""
+
+    def __init__(self):
+        self.token = uuid.uuid4().hex
+        self.ruta = ruta_reporte(self.token)
+        self.archivo = None
+        self.escritor = None
+        self.filas = 0
+
+    def agregar(self, numero, datos, mensaje):
+        if self.escritor is None:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            self.archivo = open(self.ruta, "w", encoding="utf-8-sig", newline="")
+            self.escritor = csv.writer(self.archivo, delimiter=";")
+            self.escritor.writerow(["Fila"] + COLUMNAS + ["Error"])
+        self.escritor.writerow([numero] + [_texto(datos.get(c)) for c in COLUMNAS] + [mensaje])
+        self.filas += 1
+
+    def cerrar(self):
+        if self.archivo:
+            self.archivo.close()
+
+
+def ruta_reporte(token):
+    return os.path.join(settings.GASTOS_IMPORT_DIR, f"errores_{token}.csv")
+
+
+def _insertar(lote, usuario):
+    hoy = timezone.localdate()
+    for gasto in lote:
+        gasto.creado_por = usuario
+        gasto.fecha_creacion = hoy
+        gasto.estado = True
+        gasto.sin_foto = True
+    aportes = {}
+    for gasto in lote:
+        cantidad, total = aportes.get(gasto.obra_id, (0, Decimal("0")))
+        aportes[gasto.obra_id] = (cantidad + 1, total + gasto.monto)
+    with transaction.atomic():
+        Gasto.objects.bulk_create(lote, batch_size=LOTE)
+        # bulk_create no emite post_save: los contadores y el resumen mensual se actualizan aquí
+        for obra_id, (cantidad, total) in aportes.items():
+            resumen.ajustar(obra_id, gastos=cantidad, total_gastos=total)
+        for obra_id, mes in {(gasto.obra_id, gasto.fecha.replace(day=1)) for gasto in lote}:
+            rollups.marcar_mes(obra_id, mes)
+
+
+def importar_gastos(archivo, nombre, usuario=None):
+    """
+    Importa los gastos del archivo y devuelve un resumen.
+
+    ``{"filas": n, "creados": n, "errores": n, "reporte": token | None}``;
+    con ``token`` se obtiene el reporte de errores vía ``ruta_reporte``.
+    """
+    filas = leer_filas(archivo, nombre)
+    encabezado = next(filas, None)
+    columnas = [_encabezado(valor) for valor in (encabezado or [])]
+    faltantes = [c for c in OBLIGATORIAS if c not in columnas]
+    if faltantes:
+        raise ArchivoInvalido("Faltan columnas en el encabezado: " + ", ".join(faltantes) + ".")
+
+    catalogos = Catalogos()
+    reporte = _Reporte()
+    lote, total, creados = [], 0, 0
+    try:
+        for numero, valores in enumerate(filas, start=2):
+            if not any(_texto(v) for v in valores):
+                continue
+            total += 1
+            datos = dict(zip(columnas, valores))
+            try:
+                lote.append(_resolver(catalogos, datos))
+            except ValueError as exc:
+                reporte.agregar(numero, datos, str(exc))
+                continue
+            if len(lote) >= LOTE:
+                _insertar(lote, usuario)
+                creados += len(lote)
+                lote = []
+        if lote:
+            _insertar(lote, usuario)
+            creados += len(lote)
+    finally:
+        reporte.cerrar()
+    return {
+        "filas": total,
+        "creados": creados,
+        "errores": reporte.filas,
+        "reporte": reporte.token if reporte.filas else None,
+    }
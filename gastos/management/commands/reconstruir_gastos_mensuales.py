@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from gastos.rollups import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el resumen mensual de gastos por obra, categoría y proveedor desde los gastos activos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--obra", type=int, help="Reconstruye solo la obra indicada (id).")
+
+    def handle(self, *args, **options):
+        filas = reconstruir(options.get("obra"))
+        self.stdout.write(self.style.SUCCESS(f"Listo. {filas} filas mensuales generadas."))
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:33
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gastos', '0004_alter_proveedor_nombre'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gasto',
+            name='foto',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.media_storage, upload_to='gastos/'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gastos', '0005_alter_gasto_foto'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['obra', 'fecha'], name='gastos_gast_obra_id_869978_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['fecha'], name='gastos_gast_fecha_3f4b13_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['estado', 'fecha'], name='gastos_gast_estado_4ed581_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obras', '0008_resumenobra'),
+        ('gastos', '0006_gasto_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GastoMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gastos_mensuales', to='gastos.categoria')),
+                ('obra', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gastos_mensuales', to='obras.obra')),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gastos_mensuales', to='gastos.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Gasto mensual',
+                'verbose_name_plural': 'Gastos mensuales',
+                'ordering': ['obra', 'mes'],
+                'indexes': [models.Index(fields=['mes'], name='gastos_gast_mes_d17456_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='gastomensual',
+            constraint=models.UniqueConstraint(fields=('obra', 'mes', 'categoria', 'proveedor'), name='gasto_mensual_unico'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:54
+
+import re
+
+from django.db import migrations, models
+
+
+def normalizar(apps, schema_editor):
+    Proveedor = apps.get_model("gastos", "Proveedor")
+    proveedores = list(Proveedor.objects.only("id", "rut"))
+    for proveedor in proveedores:
+        proveedor.rut_normalizado = re.sub(r"[^0-9K]", "", (proveedor.rut or "").upper())
+    Proveedor.objects.bulk_update(proveedores, ["rut_normalizado"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gastos', '0007_gastomensual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proveedor',
+            name='rut_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(normalizar, migrations.RunPython.noop),
+    ]
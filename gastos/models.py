@@ -1,13 +1,24 @@
+import re
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from core.choices import ESTADO_GASTO_CHOICES, ESTADO_GASTO_ACTIVO
+from core.storage import media_storage
 from obras.models import Obra
 
 User = get_user_model()
 
+
+def normalizar_rut(rut):
+    """RUT sin puntos, guion ni espacios y con K mayúscula: "76.543.210-k" -> "76543210K"."""
+    return re.sub(r"[^0-9K]", "", str(rut or "").upper())
+
+
 class Proveedor(models.Model):
     nombre = models.CharField(max_length=150, unique=True)
     rut = models.CharField(max_length=20, unique=True)
+    # Para buscar por RUT con o sin formato
+    rut_normalizado = models.CharField(max_length=20, db_index=True, editable=False, default="")
     direccion = models.CharField(max_length=255)
     telefono = models.CharField(max_length=30)
     estado = models.BooleanField(default=True, verbose_name="Activo")
@@ -17,6 +28,13 @@ class Proveedor(models.Model):
     def __str__(self):
         return f"{self.nombre} ({self.rut})"
 
+    def save(self, *args, **kwargs):
+        self.rut_normalizado = normalizar_rut(self.rut)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "rut" in update_fields:
+            kwargs["update_fields"] = set(update_fields) | {"rut_normalizado"}
+        super().save(*args, **kwargs)
+
 class Categoria(models.Model):
     nombre = models.CharField(max_length=120, unique=True)
     estado = models.BooleanField(default=True, verbose_name="Activo")
@@ -46,9 +64,51 @@ class Gasto(models.Model):
     creado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="gastos_creados")
     fecha_creacion = models.DateField()
     estado = models.BooleanField(default=True, verbose_name="Activo")
-    foto = models.ImageField(upload_to="gastos/", null=True, blank=True)
+    foto = models.ImageField(upload_to="gastos/", storage=media_storage, null=True, blank=True)
     sin_foto = models.BooleanField(default=False)
     nota = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["obra", "fecha"]),
+            models.Index(fields=["fecha"]),
+            models.Index(fields=["estado", "fecha"]),
+        ]
+
     def __str__(self):
         return f"Gasto {self.id} - {self.obra}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Aporte al resumen de la obra con que se cargó: (obra, monto, activo)
+        datos = instance.__dict__
+        instance._resumen_original = (datos.get("obra_id"), datos.get("monto"), datos.get("estado"))
+        # Mes del resumen mensual al que pertenecía al cargarse
+        instance._mes_original = (datos.get("obra_id"), datos.get("fecha"))
+        return instance
+
+
+class GastoMensual(models.Model):
+    """Gastos activos por obra, mes, categoría y proveedor, calculados desde Gasto."""
+    obra = models.ForeignKey(Obra, on_delete=models.CASCADE, related_name="gastos_mensuales")
+    mes = models.DateField()  # primer día del mes
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name="gastos_mensuales")
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.CASCADE, related_name="gastos_mensuales")
+    cantidad = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    fecha_modificacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Gasto mensual"
+        verbose_name_plural = "Gastos mensuales"
+        ordering = ["obra", "mes"]
+        constraints = [
+            models.UniqueConstraint(fields=["obra", "mes", "categoria", "proveedor"], name="gasto_mensual_unico"),
+        ]
+        indexes = [
+            models.Index(fields=["mes"]),
+        ]
+
+    def __str__(self):
+        return f"{self.obra_id} {self.mes:%Y-%m} {self.categoria_id}/{self.proveedor_id}: {self.total}"
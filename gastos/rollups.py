@@ -0,0 +1,157 @@
+"""
+Resumen mensual de gastos (``GastoMensual``).
+
+Cada fila suma los gastos activos de una obra en un mes para un par
+categoría/proveedor. Las señales marcan los meses (obra, mes) que tocan
+los cambios —incluido el mes anterior cuando un gasto cambia de fecha u
+obra— y al confirmarse la transacción solo esos meses se recalculan desde
+``Gasto`` con una consulta agrupada que usa el índice (obra, fecha). Un
+gasto desactivado desaparece del resumen en ese recálculo.
+
+``reconstruir()`` vuelve a generar todo desde cero (comando
+``reconstruir_gastos_mensuales``).
+"""
+import datetime
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+
+from .models import Gasto, GastoMensual
+
+LOTE = 1000
+
+_local = threading.local()
+
+
+def _mes(fecha):
+    return fecha.replace(day=1)
+
+
+def _fin_mes(mes):
+    return (mes + datetime.timedelta(days=32)).replace(day=1)
+
+
+def marcar_mes(obra_id, fecha):
+    """Programa el recálculo del mes de ``fecha`` en la obra para cuando se confirme la transacción."""
+    if obra_id is None or fecha is None:
+        return
+    if not hasattr(_local, "meses"):
+        _local.meses = set()
+    _local.meses.add((obra_id, _mes(fecha)))
+    transaction.on_commit(aplicar_pendientes)
+
+
+def aplicar_pendientes():
+    meses = getattr(_local, "meses", None)
+    if not meses:
+        return
+    _local.meses = set()
+    recalcular_meses(meses)
+
+
+def _filtro_meses(meses, campo):
+    por_obra = defaultdict(set)
+    for obra_id, mes in meses:
+        por_obra[obra_id].add(mes)
+    filtro = Q()
+    for obra_id, lista in por_obra.items():
+        if campo == "mes":
+            filtro |= Q(obra_id=obra_id, mes__in=lista)
+        else:
+            for mes in lista:
+                filtro |= Q(obra_id=obra_id, fecha__gte=mes, fecha__lt=_fin_mes(mes))
+    return filtro
+
+
+def _agrupados(gastos):
+    return (
+        gastos.filter(estado=True)
+        .values("obra_id", "fecha", "categoria_id", "proveedor_id")
+        .annotate(n=Count("id"), suma=Sum("monto"))
+        .order_by()
+    )
+
+
+def _acumular(totales, fila):
+    clave = (fila["obra_id"], _mes(fila["fecha"]), fila["categoria_id"], fila["proveedor_id"])
+    total = totales.get(clave)
+    if total is None:
+        total = totales[clave] = GastoMensual(
+            obra_id=clave[0], mes=clave[1], categoria_id=clave[2], proveedor_id=clave[3]
+        )
+    total.cantidad += fila["n"]
+    total.total += fila["suma"] or 0
+
+
+def recalcular_meses(meses):
+    """Recalcula los meses indicados [(obra_id, primer día del mes)] desde Gasto."""
+    meses = sorted(set(meses))
+    for i in range(0, len(meses), 100):
+        parte = meses[i:i + 100]
+        totales = {}
+        # Se agrupa por fecha y se acumula por mes en Python: no depende de funciones de fecha del motor
+        for fila in _agrupados(Gasto.objects.filter(_filtro_meses(parte, "fecha"))):
+            _acumular(totales, fila)
+        with transaction.atomic():
+            GastoMensual.objects.filter(_filtro_meses(parte, "mes")).delete()
+            GastoMensual.objects.bulk_create(totales.values(), batch_size=LOTE)
+
+
+def reconstruir(obra_id=None):
+    """Regenera el resumen completo (o el de una obra) desde Gasto. Devuelve las filas creadas."""
+    with transaction.atomic():
+        existentes = GastoMensual.objects.all()
+        gastos = Gasto.objects.all()
+        if obra_id is not None:
+            existentes = existentes.filter(obra_id=obra_id)
+            gastos = gastos.filter(obra_id=obra_id)
+        existentes.delete()
+
+        totales, creadas, actual = {}, 0, None
+        # Ordenado por obra y fecha: al cambiar de mes, lo acumulado ya está completo
+        for fila in _agrupados(gastos).order_by("obra_id", "fecha").iterator(chunk_size=LOTE):
+            mes = (fila["obra_id"], _mes(fila["fecha"]))
+            if mes != actual and len(totales) >= LOTE:
+                GastoMensual.objects.bulk_create(totales.values())
+                creadas += len(totales)
+                totales = {}
+            actual = mes
+            _acumular(totales, fila)
+        GastoMensual.objects.bulk_create(totales.values())
+        creadas += len(totales)
+    return creadas
+
+
+def filas_periodo(desde, hasta, obra_id=None):
+    """Resumen entre los meses ``desde`` y ``hasta`` (inclusive), opcionalmente de una obra."""
+    qs = GastoMensual.objects.filter(mes__gte=_mes(desde), mes__lte=_mes(hasta))
+    if obra_id:
+        qs = qs.filter(obra_id=obra_id)
+    return qs
+
+
+def version_periodo(desde, hasta, obra_id=None):
+    """(filas, última modificación) del período: cambia cada vez que se recalcula un mes incluido."""
+    datos = filas_periodo(desde, hasta, obra_id).aggregate(filas=Count("id"), modificado=Max("fecha_modificacion"))
+    return datos["filas"], datos["modificado"]
+
+
+def costos_por_mes(desde, hasta, obra_id=None):
+    """Total por obra, mes y categoría."""
+    return (
+        filas_periodo(desde, hasta, obra_id)
+        .values("obra_id", "obra__codigo", "obra__nombre", "mes", "categoria_id", "categoria__nombre")
+        .annotate(cantidad=Sum("cantidad"), total=Sum("total"))
+        .order_by("obra__codigo", "mes", "categoria__nombre")
+    )
+
+
+def top_proveedores(desde, hasta, obra_id=None, limite=10):
+    return (
+        filas_periodo(desde, hasta, obra_id)
+        .values("proveedor_id", "proveedor__nombre", "proveedor__rut")
+        .annotate(cantidad=Sum("cantidad"), total=Sum("total"))
+        .order_by("-total", "proveedor__nombre")[:limite]
+    )
@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.storage import liberar_archivo
+from core.thumbnails import schedule_derivatives
+from obras import resumen
+from . import rollups
+from .models import Gasto
+
+
+@receiver(post_save, sender=Gasto)
+def gasto_derivados(sender, instance, **kwargs):
+    schedule_derivatives(instance.foto)
+
+
+@receiver(post_delete, sender=Gasto)
+def gasto_liberar(sender, instance, **kwargs):
+    liberar_archivo(instance.foto)
+
+
+def _aporte(obra_id, monto, activo):
+    if obra_id is None or not activo:
+        return None
+    return obra_id, Decimal(str(monto or 0))
+
+
+@receiver(post_save, sender=Gasto)
+def gasto_resumen(sender, instance, created, **kwargs):
+    anterior = None if created else _aporte(*getattr(instance, "_resumen_original", (None, 0, False)))
+    actual = _aporte(instance.obra_id, instance.monto, instance.estado)
+    if anterior == actual:
+        return
+    if anterior:
+        resumen.ajustar(anterior[0], gastos=-1, total_gastos=-anterior[1])
+    if actual:
+        resumen.ajustar(actual[0], gastos=1, total_gastos=actual[1])
+    instance._resumen_original = (instance.obra_id, instance.monto, instance.estado)
+
+
+@receiver(post_delete, sender=Gasto)
+def gasto_resumen_eliminar(sender, instance, **kwargs):
+    aporte = _aporte(instance.obra_id, instance.monto, instance.estado)
+    if aporte:
+        resumen.ajustar(aporte[0], gastos=-1, total_gastos=-aporte[1])
+
+
+@receiver(post_save, sender=Gasto)
+def gasto_mensual(sender, instance, created, **kwargs):
+    # Se marcan el mes actual y, si cambió de obra o fecha, el que tenía al cargarse
+    rollups.marcar_mes(instance.obra_id, instance.fecha)
+    if not created:
+        rollups.marcar_mes(*getattr(instance, "_mes_original", (None, None)))
+    instance._mes_original = (instance.obra_id, instance.fecha)
+
+
+@receiver(post_delete, sender=Gasto)
+def gasto_mensual_eliminar(sender, instance, **kwargs):
+    rollups.marcar_mes(instance.obra_id, instance.fecha)
@@ -1,6 +1,342 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from openpyxl import Workbook
+from PIL import Image
+
+from core.models import ArchivoContenido
+from core.pruebas import crear_obra
+from core.storage import media_storage
+from .forms import GastoForm
+from .models import Categoria, Gasto, GastoMensual, Proveedor, TipoDocumento
+from .rollups import reconstruir
 
 
 class GastosPlaceholderTest(TestCase):
     def test_placeholder(self):
         self.assertTrue(True)
+
+
+class GastoListaDataTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("admin", password="x")
+        cls.obras = [crear_obra(f"OB-{i}", f"Obra {i}") for i in range(3)]
+        hoy = datetime.date(2025, 6, 1)
+        cls.categoria = Categoria.objects.create(nombre="Materiales", fecha_creacion=hoy)
+        cls.proveedor = Proveedor.objects.create(
+            nombre="Ferretería", rut="11.111.111-1", direccion="x", telefono="1", fecha_creacion=hoy
+        )
+        cls.tipo = TipoDocumento.objects.create(nombre="Factura", fecha_creacion=hoy)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def crear_gastos(self, cantidad, inicio=0):
+        Gasto.objects.bulk_create([
+            Gasto(
+                obra=self.obras[i % len(self.obras)], categoria=self.categoria, proveedor=self.proveedor,
+                tipo_documento=self.tipo, monto=Decimal(1000 + i * 10), fecha=datetime.date(2025, 1, 1) + datetime.timedelta(days=i),
+                fecha_creacion=datetime.date(2025, 1, 1), estado=i % 4 != 0,
+            )
+            for i in range(inicio, inicio + cantidad)
+        ])
+
+    def consultas(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            respuesta = self.client.get(reverse("admin_gasto_lista_data"), {"length": 100, **params})
+        self.assertEqual(respuesta.status_code, 200)
+        return len(ctx.captured_queries), respuesta.json()
+
+    def test_consultas_constantes_al_crecer_la_tabla(self):
+        self.crear_gastos(3)
+        pocas, datos = self.consultas()
+        self.assertEqual(len(datos["data"]), 3)
+
+        self.crear_gastos(150, inicio=3)
+        muchas, datos = self.consultas()
+        self.assertEqual(len(datos["data"]), 100)
+        self.assertEqual(datos["recordsTotal"], 153)
+        self.assertEqual(pocas, muchas)
+
+        siguiente, datos = self.consultas(cursor=datos["next_cursor"])
+        self.assertEqual(len(datos["data"]), 53)
+        # Las páginas siguientes no vuelven a contar el total
+        self.assertEqual(siguiente, muchas - 1)
+
+    def test_filtros_y_orden_por_monto(self):
+        self.crear_gastos(40)
+        _, datos = self.consultas(obra=self.obras[1].pk, estado="1", monto_min="1100", orden="monto", dir="asc", length=5)
+        montos = [Decimal(fila["monto"]) for fila in datos["data"]]
+        self.assertEqual(montos, sorted(montos))
+        self.assertTrue(all(m >= 1100 for m in montos))
+        self.assertTrue(all(fila["obra"].startswith("OB-1") and fila["estado"] for fila in datos["data"]))
+
+        _, pagina2 = self.consultas(
+            obra=self.obras[1].pk, estado="1", monto_min="1100", orden="monto", dir="asc", length=5,
+            cursor=datos["next_cursor"],
+        )
+        self.assertGreater(Decimal(pagina2["data"][0]["monto"]), montos[-1])
+
+    def test_filtro_invalido(self):
+        respuesta = self.client.get(reverse("admin_gasto_lista_data"), {"monto_max": "abc"})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_pagina_no_lista_obras_ni_proveedores(self):
+        html = self.client.get(reverse("admin_gasto_lista")).content.decode()
+        self.assertIn(reverse("obra_autocompletar"), html)
+        self.assertIn(reverse("admin_proveedores_autocompletar"), html)
+        self.assertNotIn("Obra 1", html)
+        self.assertNotIn("Ferretería", html)
+        self.assertIn("Materiales", html)
+
+
+@override_settings(GASTOS_IMPORT_DIR=tempfile.mkdtemp())
+class GastoImportarTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("contador", password="x")
+        cls.obra = crear_obra()
+        hoy = datetime.date(2025, 6, 1)
+        Categoria.objects.create(nombre="Materiales", fecha_creacion=hoy)
+        Proveedor.objects.create(nombre="Ferretería Sur", rut="76.543.210-K", direccion="x", telefono="1", fecha_creacion=hoy)
+        TipoDocumento.objects.create(nombre="Factura", fecha_creacion=hoy)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def importar(self, nombre, contenido):
+        archivo = SimpleUploadedFile(nombre, contenido)
+        return self.client.post(reverse("admin_gasto_importar"), {"archivo": archivo})
+
+    def test_importa_csv_y_reporta_errores(self):
+        filas = ["Obra;Categoría;RUT;Tipo Doc;Monto;Fecha;Nota"]
+        filas += [f"OB-1;materiales;76543210-k;Factura;1.500;0{i}-03-2025;fila {i}" for i in range(1, 6)]
+        filas += ["OB-9;Materiales;76543210K;Factura;1000;2025-03-01;", "OB-1;Materiales;Ferretería Sur;Factura;0;2025-03-01;"]
+        with CaptureQueriesContext(connection) as ctx:
+            respuesta = self.importar("gastos.csv", "\n".join(filas).encode("utf-8"))
+        resultado = respuesta.context["resultado"]
+        self.assertEqual((resultado["filas"], resultado["creados"], resultado["errores"]), (7, 5, 2))
+        self.assertEqual(Gasto.objects.filter(obra=self.obra, monto=Decimal("1500")).count(), 5)
+        self.assertEqual(self.obra.resumen.gastos, 5)
+        self.assertLess(len(ctx.captured_queries), 20)
+
+        reporte = self.client.get(reverse("admin_gasto_importar_errores", args=[resultado["reporte"]]))
+        contenido = b"".join(reporte.streaming_content).decode("utf-8-sig")
+        self.assertIn("Obra no encontrada.", contenido)
+        self.assertIn("montos iguales o menores a 0", contenido)
+
+    def test_importa_xlsx(self):
+        libro = Workbook()
+        hoja = libro.active
+        hoja.append(["obra", "categoria", "proveedor", "tipo_documento", "monto", "fecha"])
+        for i in range(30):
+            hoja.append(["Edificio Norte", "Materiales", "Ferretería Sur", "factura", 1000 + i, datetime.date(2025, 4, 1)])
+        buffer = io.BytesIO()
+        libro.save(buffer)
+        resultado = self.importar("gastos.xlsx", buffer.getvalue()).context["resultado"]
+        self.assertEqual((resultado["creados"], resultado["errores"], resultado["reporte"]), (30, 0, None))
+
+    def test_encabezado_incompleto(self):
+        respuesta = self.importar("gastos.csv", b"obra;monto\nOB-1;1000\n")
+        self.assertRedirects(respuesta, reverse("admin_gasto_importar"), fetch_redirect_response=False)
+        self.assertFalse(Gasto.objects.exists())
+
+
+class GastoMensualTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("finanzas", password="x")
+        cls.obra = crear_obra()
+        hoy = datetime.date(2025, 6, 1)
+        cls.materiales = Categoria.objects.create(nombre="Materiales", fecha_creacion=hoy)
+        cls.fletes = Categoria.objects.create(nombre="Fletes", fecha_creacion=hoy)
+        cls.proveedor = Proveedor.objects.create(nombre="Ferretería", rut="1-9", direccion="x", telefono="1", fecha_creacion=hoy)
+        cls.tipo = TipoDocumento.objects.create(nombre="Factura", fecha_creacion=hoy)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def crear(self, monto, fecha, categoria=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Gasto.objects.create(
+                obra=self.obra, categoria=categoria or self.materiales, proveedor=self.proveedor,
+                tipo_documento=self.tipo, monto=Decimal(monto), fecha=fecha, fecha_creacion=fecha,
+            )
+
+    def totales(self):
+        return {
+            (fila.mes.strftime("%Y-%m"), fila.categoria_id): (fila.cantidad, fila.total)
+            for fila in GastoMensual.objects.all()
+        }
+
+    def test_resumen_sigue_creacion_edicion_y_estado(self):
+        gasto = self.crear(1000, datetime.date(2025, 3, 5))
+        self.crear(500, datetime.date(2025, 3, 20))
+        self.crear(200, datetime.date(2025, 4, 2), self.fletes)
+        self.assertEqual(self.totales(), {
+            ("2025-03", self.materiales.pk): (2, Decimal("1500")),
+            ("2025-04", self.fletes.pk): (1, Decimal("200")),
+        })
+
+        gasto = Gasto.objects.get(pk=gasto.pk)
+        gasto.fecha = datetime.date(2025, 4, 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            gasto.save()
+        self.assertEqual(self.totales()[("2025-03", self.materiales.pk)], (1, Decimal("500")))
+        self.assertEqual(self.totales()[("2025-04", self.materiales.pk)], (1, Decimal("1000")))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("admin_gasto_toggle", args=[gasto.pk]))
+        self.assertNotIn(("2025-04", self.materiales.pk), self.totales())
+
+        antes = self.totales()
+        reconstruir()
+        self.assertEqual(self.totales(), antes)
+
+    def test_reporte_con_cache_http(self):
+        self.crear(1000, datetime.date(2025, 3, 5))
+        self.crear(300, datetime.date(2025, 3, 6), self.fletes)
+        url = reverse("admin_gasto_reporte_costos")
+        params = {"desde": "2025-01", "hasta": "2025-06"}
+        respuesta = self.client.get(url, params)
+        datos = respuesta.json()
+        self.assertEqual(datos["total"], 1300.0)
+        self.assertEqual(len(datos["meses"]), 1)
+        self.assertEqual(len(datos["meses"][0]["categorias"]), 2)
+        self.assertEqual(datos["proveedores"][0]["total"], 1300.0)
+        self.assertIn("private", respuesta["Cache-Control"])
+
+        sin_cambios = self.client.get(url, params, HTTP_IF_NONE_MATCH=respuesta["ETag"])
+        self.assertEqual(sin_cambios.status_code, 304)
+
+        self.crear(50, datetime.date(2025, 3, 7))
+        cambiado = self.client.get(url, params, HTTP_IF_NONE_MATCH=respuesta["ETag"])
+        self.assertEqual(cambiado.status_code, 200)
+        self.assertEqual(cambiado.json()["total"], 1350.0)
+
+        self.assertEqual(self.client.get(url, {"desde": "2025-07", "hasta": "2025-01"}).status_code, 400)
+
+
+class ProveedorAutocompletarTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("compras", password="x")
+        hoy = datetime.date(2025, 6, 1)
+        Proveedor.objects.bulk_create([
+            Proveedor(
+                nombre=f"Proveedor {i:02d}", rut=f"76.{i:03d}.000-{i % 10}", rut_normalizado=f"76{i:03d}000{i % 10}",
+                direccion="x", telefono="1", fecha_creacion=hoy,
+            )
+            for i in range(25)
+        ])
+        cls.ferreteria = Proveedor.objects.create(
+            nombre="Ferretería Sur", rut="12.345.678-k", direccion="x", telefono="1", fecha_creacion=hoy
+        )
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def buscar(self, **params):
+        respuesta = self.client.get(reverse("admin_proveedores_autocompletar"), params)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn("private", respuesta["Cache-Control"])
+        return respuesta.json()
+
+    def test_busca_por_nombre_y_rut_con_o_sin_formato(self):
+        self.assertEqual(self.ferreteria.rut_normalizado, "12345678K")
+        for q in ("ferre", "12.345", "12345678-K", "123456"):
+            datos = self.buscar(q=q)
+            self.assertEqual([r["id"] for r in datos["results"]], [self.ferreteria.pk], q)
+            self.assertEqual(datos["results"][0]["text"], "Ferretería Sur (12.345.678-k)")
+
+    def test_pagina_corta_con_indicador_de_mas(self):
+        primera = self.buscar(q="prov")
+        self.assertEqual(len(primera["results"]), 20)
+        self.assertTrue(primera["more"])
+        segunda = self.buscar(q="prov", page=2)
+        self.assertEqual(len(segunda["results"]), 5)
+        self.assertFalse(segunda["more"])
+
+    def test_formulario_solo_renderiza_la_opcion_elegida(self):
+        html = str(GastoForm(initial={"proveedor": self.ferreteria.pk})["proveedor"])
+        self.assertIn("Ferretería Sur", html)
+        self.assertNotIn("Proveedor 01", html)
+        self.assertIn(reverse("admin_proveedores_autocompletar"), html)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class GastoFotoTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("rendidor", password="x")
+        cls.obra = crear_obra()
+        hoy = datetime.date(2025, 6, 1)
+        cls.categoria = Categoria.objects.create(nombre="Materiales", fecha_creacion=hoy)
+        cls.proveedor = Proveedor.objects.create(nombre="Ferretería", rut="1-9", direccion="x", telefono="1", fecha_creacion=hoy)
+        cls.tipo = TipoDocumento.objects.create(nombre="Factura", fecha_creacion=hoy)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def imagen(self, color):
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8), color).save(buffer, "JPEG")
+        return SimpleUploadedFile("boleta.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+    def editar(self, gasto, **datos):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("admin_gasto_editar", args=[gasto.pk]), {
+                "obra": self.obra.pk, "categoria": self.categoria.pk, "proveedor": self.proveedor.pk,
+                "tipo_documento": self.tipo.pk, "monto": "1000", "fecha": "2025-03-05",
+                "fecha_creacion": "2025-03-05", "estado": "True", **datos,
+            })
+        gasto.refresh_from_db()
+        return gasto.foto.name
+
+    def test_reemplazar_la_foto_libera_la_anterior(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            gasto = Gasto.objects.create(
+                obra=self.obra, categoria=self.categoria, proveedor=self.proveedor, tipo_documento=self.tipo,
+                monto=Decimal("1000"), fecha=datetime.date(2025, 3, 5), fecha_creacion=datetime.date(2025, 3, 5),
+                foto=self.imagen("red"),
+            )
+        anterior = gasto.foto.name
+        nueva = self.editar(gasto, foto=self.imagen("blue"))
+        self.assertNotEqual(nueva, anterior)
+        self.assertFalse(os.path.exists(media_storage().path(anterior)))
+        self.assertEqual(list(ArchivoContenido.objects.values_list("nombre", "referencias")), [(nueva, 1)])
+
+        self.assertFalse(self.editar(gasto, sin_foto="on", nota="sin respaldo"))
+        self.assertFalse(ArchivoContenido.objects.exists())
+
+    @override_settings(THUMBNAIL_SYNC=True)
+    def test_listado_usa_derivados_anotados_y_webp(self):
+        caches["derivados"].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            Gasto.objects.create(
+                obra=self.obra, categoria=self.categoria, proveedor=self.proveedor, tipo_documento=self.tipo,
+                monto=Decimal("1000"), fecha=datetime.date(2025, 3, 5), fecha_creacion=datetime.date(2025, 3, 5),
+                foto=self.imagen("green"),
+            )
+        url = reverse("admin_gasto_lista_data")
+        # Las variantes se leen de la caché: el listado no consulta el storage por fila
+        with mock.patch.object(default_storage, "exists", side_effect=AssertionError("exists() por fila")):
+            foto = self.client.get(url).json()["data"][0]["foto"]
+            respuesta = self.client.get(url, HTTP_ACCEPT="application/json, image/webp")
+        self.assertTrue(foto["url"].endswith("_thumb.jpg"))
+        self.assertTrue(foto["medium_url"].endswith("_medium.jpg"))
+        self.assertTrue(respuesta.json()["data"][0]["foto"]["medium_url"].endswith("_webp.webp"))
+        self.assertIn("Accept", respuesta["Vary"])
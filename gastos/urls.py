@@ -1,9 +1,10 @@
-from django.urls import path
+from django.urls import path, re_path
 from gastos import views as gastos_views
 
 urlpatterns = [
     # Proveedores
     path('administrador/gastos/proveedores/', gastos_views.proveedores_lista, name='admin_proveedores'),
+    path('administrador/gastos/proveedores/autocompletar/', gastos_views.proveedor_autocompletar, name='admin_proveedores_autocompletar'),
     path('administrador/gastos/proveedores/nuevo/', gastos_views.proveedor_crear, name='admin_proveedores_create'),
     path('administrador/gastos/proveedores/<int:pk>/editar/', gastos_views.proveedor_editar, name='admin_proveedores_edit'),
     path('administrador/gastos/proveedores/<int:pk>/toggle/', gastos_views.proveedor_toggle_estado, name='admin_proveedores_toggle'),
@@ -22,7 +23,13 @@ urlpatterns = [
 
     # Rendición de gastos
     path('administrador/gastos/rendicion/', gastos_views.gasto_lista, name='admin_gasto_lista'),
+    path('administrador/gastos/rendicion/data/', gastos_views.gasto_lista_data, name='admin_gasto_lista_data'),
     path('administrador/gastos/rendicion/nuevo/', gastos_views.gasto_crear, name='admin_gasto_ingresar'),
+    path('administrador/gastos/rendicion/importar/', gastos_views.gasto_importar, name='admin_gasto_importar'),
+    re_path(r'^administrador/gastos/rendicion/importar/errores/(?P<token>[0-9a-f]{32})/$', gastos_views.gasto_importar_errores, name='admin_gasto_importar_errores'),
     path('administrador/gastos/rendicion/<int:pk>/editar/', gastos_views.gasto_editar, name='admin_gasto_editar'),
     path('administrador/gastos/rendicion/<int:pk>/toggle/', gastos_views.gasto_toggle_estado, name='admin_gasto_toggle'),
+
+    # Reportes
+    path('administrador/gastos/reporte/costos/', gastos_views.gasto_reporte_costos, name='admin_gasto_reporte_costos'),
 ]
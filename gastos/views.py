@@ -1,16 +1,65 @@
-from datetime import datetime
-import json
+import hashlib
+import os
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
 from django.db import IntegrityError
+from django.db.models import Q
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from .models import Proveedor, Categoria, TipoDocumento, Gasto
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from django.views.decorators.vary import vary_on_headers
+from core.autocomplete import responder, termino
+from core.pagination import CursorInvalido, KeysetPaginator
+from core.storage import liberar_archivo
+from core.thumbnails import accepts_webp, derivative_url, existing_derivatives
+from core.uploadhandlers import limitar_subidas
+from . import rollups
+from .importacion import ArchivoInvalido, COLUMNAS, importar_gastos, ruta_reporte
+from .models import Proveedor, Categoria, TipoDocumento, Gasto, normalizar_rut
 from .forms import ProveedorForm, CategoriaForm, TipoDocumentoForm, GastoForm
 
+MAX_FOTO_GASTO = 10 * 1024 * 1024
+EXTENSIONES_FOTO_GASTO = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+GASTOS_POR_PAGINA = 25
+GASTOS_MAX_POR_PAGINA = 100
+REPORTE_MESES_DEFECTO = 12
+REPORTE_TOP_PROVEEDORES = 10
+# Órdenes permitidos y su clave de cursor; el id desempata filas iguales
+GASTO_ORDENES = {
+    "fecha": ("fecha", "id"),
+    "monto": ("monto", "id"),
+    "id": ("id",),
+}
+
 # Proveedores
 def proveedores_lista(request):
     proveedores = Proveedor.objects.all().order_by("id")
     return render(request, "gastos/proveedores/lista.html", {"proveedores": proveedores})
 
+@login_required
+@require_GET
+def proveedor_autocompletar(request):
+    """Proveedores cuyo nombre o RUT (con o sin puntos y guion) empieza con ?q."""
+    q = termino(request)
+    proveedores = Proveedor.objects.all()
+    if request.GET.get("activos") == "1":
+        proveedores = proveedores.filter(estado=True)
+    if q:
+        filtro = Q(nombre__istartswith=q)
+        rut = normalizar_rut(q)
+        if rut and rut[0].isdigit():
+            filtro |= Q(rut_normalizado__startswith=rut)
+        proveedores = proveedores.filter(filtro)
+    proveedores = proveedores.order_by("nombre").values("id", "nombre", "rut")
+    return responder(request, proveedores, lambda p: f"{p['nombre']} ({p['rut']})")
+
 def proveedor_crear(request):
     if request.method == "POST":
         data = request.POST.copy()
@@ -165,18 +214,128 @@ def tipo_documento_toggle_estado(request, pk=None):
 
 # Gastos / Rendicion
 def gasto_lista(request):
-    gastos = Gasto.objects.select_related("categoria", "proveedor", "tipo_documento", "creado_por").all().order_by("-fecha")
-    for gasto in gastos:
-        fotos = []
-        if getattr(gasto, "foto", None):
-            fotos.append({
-                "url": gasto.foto.url,
-                "name": gasto.foto.name or "",
-            })
-        gasto.photos_data = fotos
-        gasto.photos_data_json = json.dumps(fotos, ensure_ascii=False)
-    return render(request, "gastos/rendicion_gastos/lista.html", {"gastos": gastos})
+    # Obras y proveedores crecen sin límite: sus filtros usan los endpoints de autocompletar
+    contexto = {
+        "categorias": Categoria.objects.order_by("nombre").only("id", "nombre"),
+    }
+    return render(request, "gastos/rendicion_gastos/lista.html", contexto)
+
+def _filtrar_gastos(request, queryset):
+    """Aplica los filtros de obra, categoría, proveedor, fechas, estado, monto y búsqueda."""
+    for param, campo in (("obra", "obra_id"), ("categoria", "categoria_id"), ("proveedor", "proveedor_id")):
+        valor = request.GET.get(param, "").strip()
+        if valor.isdigit():
+            queryset = queryset.filter(**{campo: valor})
+
+    for param, lookup in (("desde", "fecha__gte"), ("hasta", "fecha__lte")):
+        valor = request.GET.get(param, "").strip()
+        if valor:
+            try:
+                queryset = queryset.filter(**{lookup: date.fromisoformat(valor)})
+            except ValueError:
+                raise ValidationError(f'Fecha inválida en "{param}".')
+
+    estado = request.GET.get("estado", "").strip()
+    if estado in ("0", "1"):
+        queryset = queryset.filter(estado=estado == "1")
+
+    for param, lookup in (("monto_min", "monto__gte"), ("monto_max", "monto__lte")):
+        valor = request.GET.get(param, "").strip().replace(",", ".")
+        if valor:
+            try:
+                monto = Decimal(valor)
+            except InvalidOperation:
+                monto = None
+            if monto is None or not monto.is_finite():
+                raise ValidationError(f'Monto inválido en "{param}".')
+            queryset = queryset.filter(**{lookup: monto})
+
+    busqueda = (request.GET.get("q") or request.GET.get("search[value]") or "").strip()
+    if busqueda:
+        queryset = queryset.filter(
+            Q(obra__nombre__icontains=busqueda)
+            | Q(obra__codigo__icontains=busqueda)
+            | Q(proveedor__nombre__icontains=busqueda)
+            | Q(tipo_documento__nombre__icontains=busqueda)
+        )
+    return queryset
+
+@login_required
+@require_GET
+@vary_on_headers("Accept")
+def gasto_lista_data(request):
+    """Feed JSON para DataTables en modo server-side, filtrado, ordenado y paginado por cursor."""
+    try:
+        length = int(request.GET.get("length", GASTOS_POR_PAGINA))
+    except (TypeError, ValueError):
+        length = GASTOS_POR_PAGINA
+    length = max(1, min(length, GASTOS_MAX_POR_PAGINA))
+
+    try:
+        gastos = _filtrar_gastos(request, Gasto.objects.all())
+    except ValidationError as e:
+        return JsonResponse({"error": e.messages[0]}, status=400)
+
+    claves = GASTO_ORDENES.get(request.GET.get("orden"), GASTO_ORDENES["fecha"])
+    descendente = request.GET.get("dir", "desc") != "asc"
+    cursor = request.GET.get("cursor") or None
+    # El total solo se calcula en la primera página; el cliente lo conserva
+    total = None if cursor else gastos.count()
 
+    # Todas las columnas salen en la misma consulta: sin consultas por fila
+    paginator = KeysetPaginator(gastos, claves, length, descending=descendente)
+    try:
+        filas, next_cursor = paginator.page(cursor, fields=(
+            "id",
+            "fecha",
+            "monto",
+            "estado",
+            "foto",
+            "obra__codigo",
+            "obra__nombre",
+            "categoria__nombre",
+            "proveedor__nombre",
+            "tipo_documento__nombre",
+        ))
+    except CursorInvalido as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    storage = Gasto._meta.get_field("foto").storage
+    existentes = existing_derivatives(fila["foto"] for fila in filas)
+    # El visor muestra la variante WebP a los clientes que la aceptan
+    visor = "webp" if accepts_webp(request) else "medium"
+    data = []
+    for fila in filas:
+        foto = None
+        if fila["foto"]:
+            foto = {
+                "url": derivative_url(fila["foto"], "thumb", storage, existentes),
+                "medium_url": derivative_url(fila["foto"], visor, storage, existentes),
+                "original_url": storage.url(fila["foto"]),
+                "name": fila["foto"],
+            }
+        data.append({
+            "id": fila["id"],
+            "obra": f"{fila['obra__codigo']} - {fila['obra__nombre']}",
+            "categoria": fila["categoria__nombre"],
+            "proveedor": fila["proveedor__nombre"],
+            "monto": str(fila["monto"]),
+            "fecha": fila["fecha"].isoformat(),
+            "tipo_documento": fila["tipo_documento__nombre"],
+            "estado": fila["estado"],
+            "foto": foto,
+            "editar_url": reverse("admin_gasto_editar", args=[fila["id"]]),
+        })
+
+    return JsonResponse({
+        "draw": request.GET.get("draw"),
+        "recordsTotal": total,
+        "recordsFiltered": total,
+        "next_cursor": next_cursor,
+        "data": data,
+    })
+
+@limitar_subidas(1, MAX_FOTO_GASTO, EXTENSIONES_FOTO_GASTO)
 def gasto_crear(request):
     if request.method == "POST":
         form = GastoForm(request.POST, request.FILES)
@@ -196,11 +355,14 @@ def gasto_crear(request):
         form = GastoForm(initial={"fecha": datetime.now().date(), "fecha_creacion": datetime.now().date(), "estado": True})
     return render(request, "gastos/rendicion_gastos/crear.html", {"form": form})
 
+@limitar_subidas(1, MAX_FOTO_GASTO, EXTENSIONES_FOTO_GASTO)
 def gasto_editar(request, pk=None):
     if pk is None:
         pk = request.GET.get("id") or request.GET.get("editar")
     gasto = get_object_or_404(Gasto, pk=pk)
     estado_original = getattr(gasto, "estado", True)
+    # El form reemplaza gasto.foto al validar: se guarda la anterior para liberar su referencia
+    foto_anterior = gasto.foto
     if request.method == "POST":
         form = GastoForm(request.POST, request.FILES, instance=gasto)
         if form.is_valid():
@@ -218,6 +380,8 @@ def gasto_editar(request, pk=None):
             g.fecha_creacion = form.cleaned_data.get("fecha_creacion") or g.fecha_creacion or new_fecha
             g.estado = estado_original
             g.save()
+            if foto_anterior.name != g.foto.name:
+                liberar_archivo(foto_anterior)
             messages.success(request, "Gasto actualizado correctamente.")
             return redirect("admin_gasto_lista")
 
@@ -233,6 +397,137 @@ def gasto_editar(request, pk=None):
             form.initial["fecha_creacion"] = gasto.fecha_creacion
     return render(request, "gastos/rendicion_gastos/editar.html", {"form": form, "gasto": gasto})
 
+@login_required
+@limitar_subidas(1, settings.GASTOS_IMPORT_MAX_SIZE, {".xlsx", ".csv"})
+def gasto_importar(request):
+    """Carga masiva de gastos desde una planilla XLSX o CSV."""
+    resultado = None
+    if request.method == "POST":
+        archivo = request.FILES.get("archivo")
+        if not archivo:
+            messages.error(request, "Selecciona una planilla .xlsx o .csv para importar.")
+            return redirect("admin_gasto_importar")
+        try:
+            resultado = importar_gastos(archivo, archivo.name, request.user)
+        except ArchivoInvalido as e:
+            messages.error(request, str(e))
+            return redirect("admin_gasto_importar")
+        if resultado["creados"]:
+            messages.success(request, f"Se importaron {resultado['creados']} gasto(s).")
+        if resultado["errores"]:
+            messages.warning(request, f"{resultado['errores']} fila(s) no se importaron; descarga el reporte para revisarlas.")
+        elif not resultado["creados"]:
+            messages.info(request, "La planilla no tiene filas para importar.")
+    return render(request, "gastos/rendicion_gastos/importar.html", {"resultado": resultado, "columnas": COLUMNAS})
+
+@login_required
+def gasto_importar_errores(request, token):
+    ruta = ruta_reporte(token)
+    if not os.path.exists(ruta):
+        raise Http404("El reporte ya no está disponible.")
+    return FileResponse(open(ruta, "rb"), as_attachment=True, filename="errores_importacion_gastos.csv", content_type="text/csv")
+
+def _parametros_reporte(request):
+    """(desde, hasta, obra_id, top) del reporte de costos; ValidationError si son inválidos."""
+    if not hasattr(request, "_parametros_reporte"):
+        try:
+            hoy = date.today().replace(day=1)
+            hasta = datetime.strptime(request.GET["hasta"], "%Y-%m").date() if request.GET.get("hasta") else hoy
+            if request.GET.get("desde"):
+                desde = datetime.strptime(request.GET["desde"], "%Y-%m").date()
+            else:
+                anio, mes = divmod(hasta.year * 12 + hasta.month - REPORTE_MESES_DEFECTO, 12)
+                desde = date(anio, mes + 1, 1)
+            top = int(request.GET.get("top", REPORTE_TOP_PROVEEDORES))
+        except ValueError:
+            raise ValidationError("Parámetros inválidos (usa meses AAAA-MM).")
+        if desde > hasta:
+            raise ValidationError("El mes desde no puede ser posterior al mes hasta.")
+        obra_id = request.GET.get("obra", "").strip()
+        request._parametros_reporte = (desde, hasta, int(obra_id) if obra_id.isdigit() else None, max(1, min(top, 50)))
+    return request._parametros_reporte
+
+def _version_reporte(request):
+    if not hasattr(request, "_version_reporte"):
+        try:
+            desde, hasta, obra_id, _ = _parametros_reporte(request)
+        except ValidationError:
+            request._version_reporte = None
+        else:
+            request._version_reporte = rollups.version_periodo(desde, hasta, obra_id)
+    return request._version_reporte
+
+def _etag_reporte(request):
+    version = _version_reporte(request)
+    if version is None:
+        return None
+    filas, modificado = version
+    clave = f"{request.GET.urlencode()}|{filas}|{modificado.isoformat() if modificado else ''}"
+    return hashlib.md5(clave.encode("utf-8")).hexdigest()
+
+def _modificado_reporte(request):
+    version = _version_reporte(request)
+    return version[1] if version else None
+
+@login_required
+@require_GET
+@cache_control(private=True, max_age=60)
+@condition(etag_func=_etag_reporte, last_modified_func=_modificado_reporte)
+def gasto_reporte_costos(request):
+    """Costos por obra, mes y categoría y los proveedores con más gasto (?desde, ?hasta=AAAA-MM, ?obra, ?top)."""
+    try:
+        desde, hasta, obra_id, top = _parametros_reporte(request)
+    except ValidationError as e:
+        return JsonResponse({"success": False, "message": e.messages[0]}, status=400)
+
+    meses = {}
+    total, cantidad = Decimal("0"), 0
+    for fila in rollups.costos_por_mes(desde, hasta, obra_id):
+        clave = (fila["obra_id"], fila["mes"])
+        mes = meses.get(clave)
+        if mes is None:
+            mes = meses[clave] = {
+                "mes": fila["mes"].strftime("%Y-%m"),
+                "obra_id": fila["obra_id"],
+                "obra": f"{fila['obra__codigo']} - {fila['obra__nombre']}",
+                "total": Decimal("0"),
+                "cantidad": 0,
+                "categorias": [],
+            }
+        mes["total"] += fila["total"]
+        mes["cantidad"] += fila["cantidad"]
+        mes["categorias"].append({
+            "id": fila["categoria_id"],
+            "nombre": fila["categoria__nombre"],
+            "total": float(fila["total"]),
+            "cantidad": fila["cantidad"],
+        })
+        total += fila["total"]
+        cantidad += fila["cantidad"]
+    for mes in meses.values():
+        mes["total"] = float(mes["total"])
+
+    proveedores = [
+        {
+            "id": fila["proveedor_id"],
+            "nombre": fila["proveedor__nombre"],
+            "rut": fila["proveedor__rut"],
+            "total": float(fila["total"]),
+            "cantidad": fila["cantidad"],
+        }
+        for fila in rollups.top_proveedores(desde, hasta, obra_id, top)
+    ]
+    return JsonResponse({
+        "success": True,
+        "desde": desde.strftime("%Y-%m"),
+        "hasta": hasta.strftime("%Y-%m"),
+        "obra": obra_id,
+        "total": float(total),
+        "cantidad": cantidad,
+        "meses": list(meses.values()),
+        "proveedores": proveedores,
+    })
+
 def gasto_toggle_estado(request, pk=None):
     if pk is None:
         pk = request.GET.get("id")
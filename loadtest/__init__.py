@@ -0,0 +1,26 @@
+"""
+Pruebas de carga HTTP de los recorridos principales de urbix.
+
+Cada usuario virtual es una tarea de asyncio con su propia conexión y
+sesión: inicia sesión en ``signin/`` y repite recorridos reales (listado
+de obras, registro del libro con fotos, rendición de gastos, perfil)
+hasta que termina la prueba. El cliente HTTP es propio y solo usa la
+biblioteca estándar, para no sumar dependencias al despliegue.
+
+    python manage.py generar_datos --obras 200
+    python manage.py runserver                  # o deploy/gunicorn.sh
+    python -m loadtest --usuarios 20 --duracion 120 --salida carga.json
+    python -m loadtest --usuarios 20 --duracion 120 --comparar carga.json
+
+El reporte muestra, por endpoint, solicitudes, tasa de error,
+solicitudes por segundo y latencias p50/p95/p99; ``--salida`` lo guarda
+en JSON para comparar corridas.
+
+``--lentos N`` suma N clientes que suben registros con fotos a
+``--lentos-ritmo`` KB/s y se reportan aparte. Sirve para comparar los
+despliegues: con workers sync cada subida lenta retiene un worker y el
+resto de los usuarios espera; con ``deploy/gunicorn-asgi.sh`` no.
+
+    python -m loadtest --usuarios 10 --lentos 12 --duracion 60 --salida sync.json
+    python -m loadtest --usuarios 10 --lentos 12 --duracion 60 --comparar sync.json   # bajo ASGI
+"""
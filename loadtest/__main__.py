@@ -0,0 +1,149 @@
+"""Línea de comandos: ``python -m loadtest --help``."""
+import argparse
+import asyncio
+import datetime
+import random
+import sys
+import time
+
+from . import metricas as m
+from .cliente import Cliente, FalloSolicitud
+from .escenarios import RECORRIDOS, Sesion, fotos_de_prueba, iniciar_sesion, subir_lento
+
+
+def argumentos(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description="Prueba de carga de los recorridos de urbix.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Servidor a probar.")
+    parser.add_argument("--usuarios", type=int, default=10, help="Usuarios virtuales concurrentes.")
+    parser.add_argument("--duracion", type=float, default=60, help="Segundos de prueba.")
+    parser.add_argument("--rampa", type=float, default=5, help="Segundos para arrancar a todos los usuarios.")
+    parser.add_argument("--pausa", type=float, default=1.0, help="Pausa media entre recorridos (0: sin pausa).")
+    parser.add_argument("--prefijo", default="demo", help="Cuentas de generar_datos: <prefijo>_00000, <prefijo>_00001...")
+    parser.add_argument("--clave", default="urbix1234", help="Contraseña de las cuentas generadas.")
+    parser.add_argument("--cuenta", action="append", default=[], metavar="USUARIO:CLAVE", help="Cuenta a usar (repetible); reemplaza a --prefijo.")
+    parser.add_argument("--recorridos", default=",".join(RECORRIDOS), help="Recorridos a mezclar, separados por coma.")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla de la mezcla de recorridos.")
+    parser.add_argument("--timeout", type=float, default=30, help="Segundos máximos por solicitud.")
+    parser.add_argument("--lentos", type=int, default=0, help="Clientes lentos que suben registros con fotos sin parar.")
+    parser.add_argument("--lentos-ritmo", type=float, default=2, help="KB/s con que suben los clientes lentos.")
+    parser.add_argument("--salida", help="Guarda el resultado en este JSON.")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para comparar.")
+    opciones = parser.parse_args(argv)
+    desconocidos = set(opciones.recorridos.split(",")) - set(RECORRIDOS)
+    if desconocidos:
+        parser.error(f"Recorridos desconocidos: {', '.join(sorted(desconocidos))}.")
+    return opciones
+
+
+def cuentas(opciones):
+    if opciones.cuenta:
+        return [tuple(c.split(":", 1)) for c in opciones.cuenta]
+    total = opciones.usuarios + opciones.lentos
+    return [(f"{opciones.prefijo.lower()}_{i:05d}", opciones.clave) for i in range(total)]
+
+
+async def usuario_virtual(numero, opciones, cuenta, fin, registro, fotos):
+    rng = random.Random(opciones.seed * 1000 + numero)
+    await asyncio.sleep(opciones.rampa * numero / max(1, opciones.usuarios))
+    cliente = Cliente(opciones.url, registro, timeout=opciones.timeout)
+    sesion = Sesion(cliente, *cuenta, rng, fotos)
+    nombres = opciones.recorridos.split(",")
+    pesos = [RECORRIDOS[n][1] for n in nombres]
+    autenticado = False
+    try:
+        while time.monotonic() < fin:
+            try:
+                if not autenticado:
+                    await iniciar_sesion(sesion)
+                    autenticado = True
+                    registro.recorrido("login", True)
+                nombre = rng.choices(nombres, pesos)[0]
+                await RECORRIDOS[nombre][0](sesion)
+                registro.recorrido(nombre, True)
+            except FalloSolicitud as e:
+                registro.recorrido(nombre if autenticado else "login", False)
+                # Tras un fallo se vuelve a iniciar sesión por si la sesión expiró
+                autenticado = autenticado and "HTTP 302" not in str(e)
+            if opciones.pausa:
+                await asyncio.sleep(rng.expovariate(1 / opciones.pausa))
+    finally:
+        await cliente.cerrar()
+
+
+async def cliente_lento(numero, opciones, cuenta, fin, registro, fotos):
+    """Sube registros a ``--lentos-ritmo`` KB/s hasta el final: mide si retienen a los workers."""
+    rng = random.Random(opciones.seed * 1000 + 500 + numero)
+    cliente = Cliente(opciones.url, registro, timeout=opciones.timeout)
+    sesion = Sesion(cliente, *cuenta, rng, fotos)
+    autenticado = False
+    try:
+        while time.monotonic() < fin:
+            try:
+                if not autenticado:
+                    await iniciar_sesion(sesion)
+                    autenticado = True
+                await subir_lento(sesion, opciones.lentos_ritmo * 1024)
+                registro.recorrido("lento", True)
+            except FalloSolicitud as e:
+                registro.recorrido("lento", False)
+                autenticado = autenticado and "HTTP 302" not in str(e)
+                await asyncio.sleep(1)
+    finally:
+        await cliente.cerrar()
+
+
+async def correr(opciones):
+    registro, lentos = m.Metricas(), m.Metricas()
+    lista = cuentas(opciones)
+    fotos = fotos_de_prueba(random.Random(opciones.seed))
+    inicio = time.monotonic()
+    fin = inicio + opciones.duracion
+    # Los lentos arrancan primero, como cuando ya ocupan los workers
+    await asyncio.gather(
+        *(
+            cliente_lento(i, opciones, lista[(opciones.usuarios + i) % len(lista)], fin, lentos, fotos)
+            for i in range(opciones.lentos)
+        ),
+        *(
+            usuario_virtual(i, opciones, lista[i % len(lista)], fin, registro, fotos)
+            for i in range(opciones.usuarios)
+        ),
+    )
+    return registro, lentos, time.monotonic() - inicio
+
+
+def main(argv=None):
+    opciones = argumentos(argv)
+    print(f"{opciones.usuarios} usuarios contra {opciones.url} durante {opciones.duracion:.0f}s...", file=sys.stderr)
+    registro, lentos, duracion = asyncio.run(correr(opciones))
+    resumen = registro.resumen(duracion)
+    resultado = {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "url": opciones.url,
+        "usuarios": opciones.usuarios,
+        "duracion_s": round(duracion, 1),
+        "pausa_s": opciones.pausa,
+        "recorridos_mezcla": opciones.recorridos,
+        "seed": opciones.seed,
+        **resumen,
+    }
+    print(m.tabla(resumen))
+    if opciones.lentos:
+        resultado["lentos"] = {
+            "clientes": opciones.lentos,
+            "ritmo_kbps": opciones.lentos_ritmo,
+            **lentos.resumen(duracion),
+        }
+        print(f"\nClientes lentos ({opciones.lentos} a {opciones.lentos_ritmo:g} KB/s):")
+        print(m.tabla(resultado["lentos"]))
+    if opciones.salida:
+        m.guardar(opciones.salida, resultado)
+        print(f"Resultado guardado en {opciones.salida}.", file=sys.stderr)
+    if opciones.comparar:
+        print(f"\nComparación con {opciones.comparar}:")
+        print(m.comparar(resultado, m.cargar(opciones.comparar)))
+    return 1 if resumen["total"]["solicitudes"] == 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""Cliente HTTP/1.1 mínimo sobre asyncio con cookies, keep-alive y multipart."""
+import asyncio
+import json
+import ssl
+import time
+import uuid
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+LIMITE_ENCABEZADOS = 64 * 1024
+
+
+class FalloSolicitud(Exception):
+    """La solicitud no se completó o respondió con un estado inesperado."""
+
+
+class Respuesta:
+    __slots__ = ("status", "encabezados", "cuerpo")
+
+    def __init__(self, status, encabezados, cuerpo):
+        self.status = status
+        self.encabezados = encabezados
+        self.cuerpo = cuerpo
+
+    @property
+    def texto(self):
+        return self.cuerpo.decode("utf-8", "replace")
+
+    def json(self):
+        return json.loads(self.cuerpo)
+
+    @property
+    def ubicacion(self):
+        return self.encabezados.get("location", "")
+
+
+def multipart(campos, archivos=()):
+    """(cuerpo, content-type) para ``campos`` [(nombre, valor)] y ``archivos`` [(campo, nombre, bytes, tipo)]."""
+    limite = uuid.uuid4().hex
+    partes = []
+    for nombre, valor in campos:
+        partes.append(
+            f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n{valor}\r\n'.encode()
+        )
+    for campo, nombre, contenido, tipo in archivos:
+        partes.append(
+            f'--{limite}\r\nContent-Disposition: form-data; name="{campo}"; filename="{nombre}"\r\n'
+            f"Content-Type: {tipo}\r\n\r\n".encode() + contenido + b"\r\n"
+        )
+    partes.append(f"--{limite}--\r\n".encode())
+    return b"".join(partes), f"multipart/form-data; boundary={limite}"
+
+
+class Cliente:
+    """
+    Una conexión y una sesión (cookies) por usuario virtual.
+
+    Cada solicitud se mide de punta a punta (envío, espera y lectura del
+    cuerpo) y se anota en ``metricas`` con el nombre del endpoint. La
+    conexión se reutiliza mientras el servidor la mantenga abierta; los
+    workers sync de gunicorn la cierran tras cada respuesta.
+    """
+
+    def __init__(self, url_base, metricas, timeout=30.0):
+        partes = urlsplit(url_base)
+        self.https = partes.scheme == "https"
+        self.host = partes.hostname or "127.0.0.1"
+        self.puerto = partes.port or (443 if self.https else 80)
+        self.prefijo = partes.path.rstrip("/")
+        self.metricas = metricas
+        self.timeout = timeout
+        self.cookies = {}
+        self._lector = None
+        self._escritor = None
+
+    async def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            try:
+                await self._escritor.wait_closed()
+            except OSError:
+                pass
+        self._lector = self._escritor = None
+
+    async def get(self, ruta, params=None, **kwargs):
+        if params:
+            ruta = f"{ruta}?{urlencode(params)}"
+        return await self.solicitar("GET", ruta, **kwargs)
+
+    async def post(self, ruta, campos=(), archivos=(), **kwargs):
+        campos = [*campos, ("csrfmiddlewaretoken", self.cookies.get("csrftoken", ""))]
+        if archivos:
+            cuerpo, tipo = multipart(campos, archivos)
+        else:
+            cuerpo, tipo = urlencode(campos).encode(), "application/x-www-form-urlencoded"
+        return await self.solicitar("POST", ruta, cuerpo=cuerpo, tipo=tipo, **kwargs)
+
+    async def solicitar(self, metodo, ruta, cuerpo=b"", tipo=None, nombre=None, esperado=(200,), encabezados=None, ritmo=None):
+        """``ritmo``: bytes por segundo con que se envía el cuerpo (cliente lento); None, de una vez."""
+        nombre = nombre or f"{metodo} {ruta.split('?')[0]}"
+        timeout = self.timeout + (len(cuerpo) / ritmo if ritmo else 0)
+        inicio = time.perf_counter()
+        try:
+            respuesta = await asyncio.wait_for(
+                self._enviar(metodo, ruta, cuerpo, tipo, encabezados or {}, ritmo), timeout
+            )
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            await self.cerrar()
+            self.metricas.registrar(nombre, time.perf_counter() - inicio, type(e).__name__)
+            raise FalloSolicitud(f"{nombre}: {type(e).__name__} {e}") from e
+        duracion = time.perf_counter() - inicio
+        error = None if respuesta.status in esperado else f"HTTP {respuesta.status}"
+        self.metricas.registrar(nombre, duracion, error)
+        if error:
+            raise FalloSolicitud(f"{nombre}: {error}")
+        return respuesta
+
+    async def _conectar(self):
+        contexto = ssl.create_default_context() if self.https else None
+        self._lector, self._escritor = await asyncio.open_connection(
+            self.host, self.puerto, ssl=contexto, limit=LIMITE_ENCABEZADOS
+        )
+
+    async def _enviar(self, metodo, ruta, cuerpo, tipo, extra, ritmo):
+        reutilizada = self._escritor is not None
+        if not reutilizada:
+            await self._conectar()
+        try:
+            return await self._intercambio(metodo, ruta, cuerpo, tipo, extra, ritmo)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if not reutilizada:
+                raise
+            # El servidor cerró la conexión inactiva: se reintenta una vez con una nueva
+            await self.cerrar()
+            await self._conectar()
+            return await self._intercambio(metodo, ruta, cuerpo, tipo, extra, ritmo)
+
+    async def _intercambio(self, metodo, ruta, cuerpo, tipo, extra, ritmo):
+        encabezados = {
+            "Host": self.host if self.puerto in (80, 443) else f"{self.host}:{self.puerto}",
+            "User-Agent": "urbix-loadtest",
+            "Accept": "text/html,application/json",
+            "Content-Length": str(len(cuerpo)),
+        }
+        if tipo:
+            encabezados["Content-Type"] = tipo
+        if self.cookies:
+            encabezados["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if metodo != "GET" and "csrftoken" in self.cookies:
+            encabezados["X-CSRFToken"] = self.cookies["csrftoken"]
+            # CsrfViewMiddleware exige un Referer del mismo origen bajo HTTPS
+            encabezados["Referer"] = f"{'https' if self.https else 'http'}://{encabezados['Host']}{self.prefijo}{ruta}"
+        encabezados.update(extra)
+        cabecera = f"{metodo} {self.prefijo}{ruta} HTTP/1.1\r\n" + "".join(
+            f"{k}: {v}\r\n" for k, v in encabezados.items()
+        )
+        if ritmo:
+            self._escritor.write(cabecera.encode("latin-1") + b"\r\n")
+            await self._enviar_lento(cuerpo, ritmo)
+        else:
+            self._escritor.write(cabecera.encode("latin-1") + b"\r\n" + cuerpo)
+        await self._escritor.drain()
+
+        linea = await self._lector.readuntil(b"\r\n")
+        version, status = linea.decode("latin-1").split(" ", 2)[:2]
+        recibidos = {}
+        while True:
+            linea = await self._lector.readuntil(b"\r\n")
+            if linea == b"\r\n":
+                break
+            clave, _, valor = linea.decode("latin-1").partition(":")
+            clave, valor = clave.strip().lower(), valor.strip()
+            if clave == "set-cookie":
+                self._guardar_cookie(valor)
+            recibidos[clave] = valor
+
+        if metodo == "HEAD" or status in ("204", "304"):
+            contenido = b""
+        elif "chunked" in recibidos.get("transfer-encoding", ""):
+            contenido = await self._leer_fragmentos()
+        elif "content-length" in recibidos:
+            contenido = await self._lector.readexactly(int(recibidos["content-length"]))
+        else:
+            contenido = await self._lector.read()
+            recibidos["connection"] = "close"
+        if recibidos.get("connection", "").lower() == "close" or version == "HTTP/1.0":
+            await self.cerrar()
+        return Respuesta(int(status), recibidos, contenido)
+
+    async def _enviar_lento(self, cuerpo, ritmo):
+        # Diez envíos por segundo, como una red móvil mala en la obra
+        paso = max(1, int(ritmo) // 10)
+        for inicio in range(0, len(cuerpo), paso):
+            self._escritor.write(cuerpo[inicio:inicio + paso])
+            await self._escritor.drain()
+            await asyncio.sleep(0.1)
+
+    async def _leer_fragmentos(self):
+        partes = []
+        while True:
+            tamano = int((await self._lector.readuntil(b"\r\n")).split(b";")[0], 16)
+            if tamano == 0:
+                # Encabezados finales opcionales hasta la línea vacía
+                while await self._lector.readuntil(b"\r\n") != b"\r\n":
+                    pass
+                return b"".join(partes)
+            partes.append(await self._lector.readexactly(tamano))
+            await self._lector.readexactly(2)
+
+    def _guardar_cookie(self, valor):
+        galleta = SimpleCookie()
+        galleta.load(valor)
+        for clave, morsel in galleta.items():
+            if morsel["max-age"] == "0" or not morsel.value:
+                self.cookies.pop(clave, None)
+            else:
+                self.cookies[clave] = morsel.value
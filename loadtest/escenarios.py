@@ -0,0 +1,177 @@
+"""
+Recorridos de usuario contra las vistas reales.
+
+Las rutas se escriben a mano (la prueba corre fuera de Django); cada una
+lleva al lado el nombre de su ``path()``. Un recorrido que recibe un
+estado inesperado se corta con ``FalloSolicitud`` y el usuario virtual
+sigue con el siguiente.
+"""
+import datetime
+import io
+import re
+
+from .cliente import FalloSolicitud
+
+RUTAS = {
+    "signin": "/signin/",                                                   # accounts: signin
+    "profile": "/mi-perfil/",                                               # accounts: profile
+    "obra_list": "/obras/obras/",                                           # obras: obra_list
+    "obra_autocompletar": "/obras/obras/autocompletar/",                    # obras: obra_autocompletar
+    "trabajador_autocompletar": "/obras/libro-obras/trabajadores/autocompletar/",
+    "registro_libro_list": "/obras/libro-obras/",                           # obras: registro_libro_list
+    "registro_libro_data": "/obras/libro-obras/datos/",                     # obras: registro_libro_data
+    "registro_libro_create": "/obras/libro-obras/crear/",                   # obras: registro_libro_create
+    "admin_gasto_lista": "/administrador/gastos/rendicion/",                # gastos: admin_gasto_lista
+    "admin_gasto_lista_data": "/administrador/gastos/rendicion/data/",      # gastos: admin_gasto_lista_data
+    "admin_gasto_ingresar": "/administrador/gastos/rendicion/nuevo/",       # gastos: admin_gasto_ingresar
+    "admin_proveedores_autocompletar": "/administrador/gastos/proveedores/autocompletar/",
+}
+TAREAS = ["Hormigonado de losa", "Moldaje de muros", "Instalación eléctrica", "Retiro de escombros"]
+
+
+def opciones_select(html, nombre):
+    """Valores no vacíos del ``<select name=nombre>`` de una página."""
+    bloque = re.search(rf'<select[^>]*name="{re.escape(nombre)}"[^>]*>(.*?)</select>', html, re.S)
+    return re.findall(r'<option[^>]*value="(\d+)"', bloque.group(1)) if bloque else []
+
+
+def _foto(rng):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    color = tuple(rng.randint(0, 255) for _ in range(3))
+    Image.new("RGB", (1024, 768), color).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class Sesion:
+    """Estado de un usuario virtual: su cliente, credenciales y los ids que ya descubrió."""
+
+    def __init__(self, cliente, usuario, clave, rng, fotos):
+        self.cliente = cliente
+        self.usuario = usuario
+        self.clave = clave
+        self.rng = rng
+        self.fotos = fotos
+        self.ids = {}
+
+    async def ids_de(self, clave, ruta, params=None):
+        """Ids de un autocompletado (primera página), guardados para el resto de la prueba."""
+        if not self.ids.get(clave):
+            datos = (await self.cliente.get(ruta, params=params, nombre=f"GET {ruta}")).json()
+            self.ids[clave] = [str(r["id"]) for r in datos.get("results", [])]
+        if not self.ids[clave]:
+            raise FalloSolicitud(f"Sin datos para {clave}: genere datos con generar_datos.")
+        return self.ids[clave]
+
+
+def fotos_de_prueba(rng, cantidad=4):
+    return [(f"foto_{i}.jpg", _foto(rng)) for i in range(cantidad)]
+
+
+async def iniciar_sesion(sesion):
+    cliente = sesion.cliente
+    await cliente.get(RUTAS["signin"])
+    respuesta = await cliente.post(
+        RUTAS["signin"],
+        [("username", sesion.usuario), ("password", sesion.clave), ("rememberMe", "on")],
+        esperado=(302,),
+    )
+    if respuesta.ubicacion.rstrip("/").endswith("signin"):
+        raise FalloSolicitud(f"No se pudo iniciar sesión como {sesion.usuario}.")
+
+
+async def ver_obras(sesion):
+    await sesion.cliente.get(RUTAS["obra_list"])
+
+
+async def _datos_registro(sesion):
+    """(campos, archivos) de un registro nuevo con tareas, trabajadores y fotos al azar."""
+    rng = sesion.rng
+    obras = await sesion.ids_de("obras", RUTAS["obra_autocompletar"], {"activas": 1})
+    trabajadores = await sesion.ids_de("trabajadores", RUTAS["trabajador_autocompletar"])
+
+    campos = [
+        ("obra", rng.choice(obras)),
+        ("fecha", datetime.date.today().isoformat()),
+        ("observaciones", "Registro de prueba de carga."),
+    ]
+    campos += [("tarea[]", t) for t in rng.sample(TAREAS, rng.randint(1, 3))]
+    for trabajador in rng.sample(trabajadores, min(len(trabajadores), rng.randint(1, 4))):
+        campos += [("trabajador[]", trabajador), ("horas[]", "8"), ("horas_extra[]", rng.choice(["0", "1", "2"]))]
+    archivos = [
+        ("archivos[]", nombre, contenido, "image/jpeg")
+        for nombre, contenido in rng.sample(sesion.fotos, rng.randint(1, 3))
+    ]
+    return campos, archivos
+
+
+async def crear_registro(sesion):
+    cliente = sesion.cliente
+    await cliente.get(RUTAS["registro_libro_create"])
+    campos, archivos = await _datos_registro(sesion)
+    await cliente.post(RUTAS["registro_libro_create"], campos, archivos, esperado=(302,))
+    await cliente.get(RUTAS["registro_libro_list"])
+    await cliente.get(RUTAS["registro_libro_data"], {"length": 25})
+
+
+async def subir_lento(sesion, ritmo):
+    """Un registro con fotos enviado a ``ritmo`` bytes/s: retiene al worker que lo recibe."""
+    cliente = sesion.cliente
+    await cliente.get(RUTAS["registro_libro_create"])
+    campos, archivos = await _datos_registro(sesion)
+    await cliente.post(
+        RUTAS["registro_libro_create"], campos, archivos, esperado=(302,), ritmo=ritmo,
+        nombre=f"POST lento {RUTAS['registro_libro_create']}",
+    )
+
+
+async def ver_gastos(sesion):
+    await sesion.cliente.get(RUTAS["admin_gasto_lista"])
+    await sesion.cliente.get(RUTAS["admin_gasto_lista_data"], {"length": 25})
+
+
+async def crear_gasto(sesion):
+    cliente, rng = sesion.cliente, sesion.rng
+    pagina = (await cliente.get(RUTAS["admin_gasto_ingresar"])).texto
+    categorias = opciones_select(pagina, "categoria")
+    tipos = opciones_select(pagina, "tipo_documento")
+    if not categorias or not tipos:
+        raise FalloSolicitud("El formulario de gasto no trae categorías o tipos de documento.")
+    obras = await sesion.ids_de("obras", RUTAS["obra_autocompletar"], {"activas": 1})
+    proveedores = await sesion.ids_de("proveedores", RUTAS["admin_proveedores_autocompletar"], {"activos": 1})
+
+    hoy = datetime.date.today().isoformat()
+    campos = [
+        ("obra", rng.choice(obras)),
+        ("categoria", rng.choice(categorias)),
+        ("proveedor", rng.choice(proveedores)),
+        ("tipo_documento", rng.choice(tipos)),
+        ("monto", str(rng.randint(5_000, 500_000))),
+        ("fecha", hoy),
+        ("fecha_creacion", hoy),
+        ("estado", "True"),
+        ("nota", "Gasto de prueba de carga."),
+    ]
+    archivos = []
+    if rng.random() < 0.5:
+        nombre, contenido = rng.choice(sesion.fotos)
+        archivos.append(("foto", nombre, contenido, "image/jpeg"))
+    else:
+        campos.append(("sin_foto", "on"))
+    await cliente.post(RUTAS["admin_gasto_ingresar"], campos, archivos, esperado=(302,))
+    await ver_gastos(sesion)
+
+
+async def ver_perfil(sesion):
+    await sesion.cliente.get(RUTAS["profile"])
+
+
+# nombre: (recorrido, peso relativo en la mezcla)
+RECORRIDOS = {
+    "obras": (ver_obras, 30),
+    "registro": (crear_registro, 15),
+    "gastos": (ver_gastos, 25),
+    "gasto_nuevo": (crear_gasto, 10),
+    "perfil": (ver_perfil, 20),
+}
@@ -0,0 +1,109 @@
+"""Latencias por endpoint, percentiles y resultados en JSON."""
+import json
+import math
+from collections import Counter, defaultdict
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentil(ordenados, p):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not ordenados:
+        return None
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class Metricas:
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(Counter)
+        self.recorridos = defaultdict(Counter)
+
+    def registrar(self, nombre, segundos, error=None):
+        self.latencias[nombre].append(segundos)
+        if error:
+            self.errores[nombre][error] += 1
+
+    def recorrido(self, nombre, completo):
+        self.recorridos[nombre]["completos" if completo else "fallidos"] += 1
+
+    def _fila(self, latencias, errores, duracion):
+        ordenadas = sorted(latencias)
+        fallidas = sum(errores.values())
+        fila = {
+            "solicitudes": len(ordenadas),
+            "errores": fallidas,
+            "tasa_error": round(fallidas / len(ordenadas), 4) if ordenadas else 0.0,
+            "rps": round(len(ordenadas) / duracion, 2) if duracion else 0.0,
+            "media_ms": round(1000 * sum(ordenadas) / len(ordenadas), 1) if ordenadas else None,
+            "max_ms": round(1000 * ordenadas[-1], 1) if ordenadas else None,
+        }
+        for p in PERCENTILES:
+            valor = percentil(ordenadas, p)
+            fila[f"p{p}_ms"] = round(1000 * valor, 1) if valor is not None else None
+        if errores:
+            fila["detalle_errores"] = dict(errores)
+        return fila
+
+    def resumen(self, duracion):
+        """{"endpoints": {nombre: fila}, "total": fila, "recorridos": {...}} para ``duracion`` segundos."""
+        endpoints = {
+            nombre: self._fila(self.latencias[nombre], self.errores[nombre], duracion)
+            for nombre in sorted(self.latencias)
+        }
+        todas = [s for lista in self.latencias.values() for s in lista]
+        errores = sum((c for c in self.errores.values()), Counter())
+        return {
+            "endpoints": endpoints,
+            "total": self._fila(todas, errores, duracion),
+            "recorridos": {nombre: dict(conteo) for nombre, conteo in sorted(self.recorridos.items())},
+        }
+
+
+def _ms(valor):
+    return "-" if valor is None else f"{valor:.0f}"
+
+
+def tabla(resumen):
+    """Texto de ancho fijo con una fila por endpoint y el total."""
+    filas = [*resumen["endpoints"].items(), ("TOTAL", resumen["total"])]
+    ancho = max(len(nombre) for nombre, _ in filas)
+    lineas = [f"{'endpoint':<{ancho}}  {'n':>7} {'err%':>6} {'rps':>7} {'p50':>6} {'p95':>6} {'p99':>6} {'max':>6}"]
+    for nombre, fila in filas:
+        lineas.append(
+            f"{nombre:<{ancho}}  {fila['solicitudes']:>7} {100 * fila['tasa_error']:>6.1f} {fila['rps']:>7.1f} "
+            f"{_ms(fila['p50_ms']):>6} {_ms(fila['p95_ms']):>6} {_ms(fila['p99_ms']):>6} {_ms(fila['max_ms']):>6}"
+        )
+    for nombre, conteo in resumen["recorridos"].items():
+        lineas.append(f"recorrido {nombre}: {conteo.get('completos', 0)} completos, {conteo.get('fallidos', 0)} fallidos")
+    return "\n".join(lineas)
+
+
+def comparar(actual, anterior):
+    """Diferencias de rps y p95 por endpoint entre dos resultados guardados."""
+    lineas = []
+    previos = {**anterior["endpoints"], "TOTAL": anterior["total"]}
+    for nombre, fila in [*actual["endpoints"].items(), ("TOTAL", actual["total"])]:
+        previa = previos.get(nombre)
+        if previa is None:
+            lineas.append(f"{nombre}: nuevo")
+            continue
+        partes = []
+        for campo in ("rps", "p95_ms", "tasa_error"):
+            antes, ahora = previa.get(campo), fila.get(campo)
+            if antes is None or ahora is None:
+                continue
+            cambio = f"{100 * (ahora - antes) / antes:+.0f}%" if antes else "n/a"
+            partes.append(f"{campo} {antes} -> {ahora} ({cambio})")
+        lineas.append(f"{nombre}: " + "; ".join(partes))
+    return "\n".join(lineas)
+
+
+def guardar(ruta, resultado):
+    with open(ruta, "w", encoding="utf-8") as fh:
+        json.dump(resultado, fh, ensure_ascii=False, indent=2)
+
+
+def cargar(ruta):
+    with open(ruta, encoding="utf-8") as fh:
+        return json.load(fh)
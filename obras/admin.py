@@ -1,6 +1,17 @@
 from django.contrib import admin
 
-from .models import FotografiaRegistro, Obra, RegistroLibroObra, TareaRealizada, TrabajadorRegistro
+from .models import (
+    FotografiaRegistro,
+    HorasDiariasTrabajador,
+    HorasMensualesObra,
+    LibroObraPdf,
+    Obra,
+    RegistroLibroObra,
+    ResumenObra,
+    SubidaFragmentada,
+    TareaRealizada,
+    TrabajadorRegistro,
+)
 
 
 admin.site.register(Obra)
@@ -8,3 +19,8 @@ admin.site.register(RegistroLibroObra)
 admin.site.register(FotografiaRegistro)
 admin.site.register(TareaRealizada)
 admin.site.register(TrabajadorRegistro)
+admin.site.register(SubidaFragmentada)
+admin.site.register(HorasDiariasTrabajador)
+admin.site.register(HorasMensualesObra)
+admin.site.register(LibroObraPdf)
+admin.site.register(ResumenObra)
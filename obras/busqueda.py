@@ -0,0 +1,167 @@
+"""
+Búsqueda de texto completo en observaciones y tareas del libro de obras.
+
+Cada registro tiene un documento en ``BusquedaRegistro`` con sus
+observaciones y tareas. Las señales marcan los registros que cambian y el
+documento se reescribe al confirmarse la transacción. La consulta usa el
+índice del motor: ``MATCH ... AGAINST`` sobre el índice FULLTEXT en MySQL
+y la tabla FTS5 en SQLite; en otros motores cae a ``icontains``.
+"""
+import re
+import threading
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, F, FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import BusquedaRegistro, RegistroLibroObra, TareaRealizada
+
+LOTE = 500
+LARGO_FRAGMENTO = 160
+MIN_TERMINO_MYSQL = 3  # innodb_ft_min_token_size por defecto
+
+_local = threading.local()
+
+
+def marcar_registro(registro_id):
+    """Programa la reindexación del registro para cuando se confirme la transacción."""
+    if not hasattr(_local, "registros"):
+        _local.registros = set()
+    _local.registros.add(registro_id)
+    transaction.on_commit(aplicar_pendientes)
+
+
+def aplicar_pendientes():
+    registros = getattr(_local, "registros", None)
+    if not registros:
+        return
+    _local.registros = set()
+    indexar(registros)
+
+
+def _contenido(observaciones, tareas):
+    return "\n".join([observaciones or ""] + tareas).strip()
+
+
+def indexar(registro_ids):
+    """Reescribe los documentos de los registros indicados; los que ya no existen se descartan."""
+    registro_ids = list(registro_ids)
+    for i in range(0, len(registro_ids), LOTE):
+        ids = registro_ids[i:i + LOTE]
+        tareas = {}
+        for registro_id, descripcion in (
+            TareaRealizada.objects.filter(registro_id__in=ids)
+            .order_by("registro_id", "orden").values_list("registro_id", "descripcion")
+        ):
+            tareas.setdefault(registro_id, []).append(descripcion)
+        documentos = [
+            BusquedaRegistro(
+                registro_id=registro_id,
+                obra_id=obra_id,
+                fecha=fecha,
+                contenido=_contenido(observaciones, tareas.get(registro_id, [])),
+            )
+            for registro_id, obra_id, fecha, observaciones in (
+                RegistroLibroObra.objects.filter(pk__in=ids).values_list("id", "obra_id", "fecha", "observaciones")
+            )
+        ]
+        # MySQL no acepta columnas de conflicto: ON DUPLICATE KEY usa la clave primaria (registro)
+        extra = {"unique_fields": ["registro"]} if connection.features.supports_update_conflicts_with_target else {}
+        BusquedaRegistro.objects.bulk_create(
+            documentos,
+            update_conflicts=True,
+            update_fields=["obra", "fecha", "contenido"],
+            **extra,
+        )
+
+
+def reindexar_todo():
+    ids = RegistroLibroObra.objects.order_by("id").values_list("id", flat=True).iterator(chunk_size=LOTE * 4)
+    total, lote = 0, []
+    for registro_id in ids:
+        lote.append(registro_id)
+        if len(lote) >= LOTE:
+            indexar(lote)
+            total += len(lote)
+            lote = []
+    indexar(lote)
+    return total + len(lote)
+
+
+def terminos(texto):
+    return [t for t in re.findall(r"\w+", texto or "") if len(t) > 1]
+
+
+def _consulta_indexada(texto):
+    """(condición, relevancia, parámetros) en SQL para el motor actual, o None si no hay índice."""
+    # Columnas sin calificar: las expresiones también se usan dentro de subconsultas con alias
+    palabras = terminos(texto)
+    if connection.vendor == "mysql":
+        palabras = [t for t in palabras if len(t) >= MIN_TERMINO_MYSQL]
+        if not palabras:
+            return None
+        match = "MATCH (contenido) AGAINST (%s IN BOOLEAN MODE)"
+        return match, match, [" ".join(f"+{t}*" for t in palabras)]
+    if connection.vendor == "sqlite":
+        if not palabras:
+            return None
+        return (
+            "registro_id IN (SELECT rowid FROM libro_obras_busqueda_fts WHERE libro_obras_busqueda_fts MATCH %s)",
+            # bm25 es menor mientras más relevante: se invierte para ordenar de mayor a menor
+            "(SELECT -bm25(libro_obras_busqueda_fts) FROM libro_obras_busqueda_fts"
+            " WHERE libro_obras_busqueda_fts MATCH %s AND rowid = registro_id)",
+            [" ".join(f'"{t}"*' for t in palabras)],
+        )
+    return None
+
+
+def documentos_coincidentes(texto, con_relevancia=False):
+    """Queryset de BusquedaRegistro que coincide con ``texto`` (opcionalmente anotado con ``relevancia``)."""
+    qs = BusquedaRegistro.objects.all()
+    consulta = _consulta_indexada(texto)
+    if consulta is None:
+        palabras = terminos(texto)
+        if not palabras or connection.vendor in ("mysql", "sqlite"):
+            return qs.none()
+        for palabra in palabras:
+            qs = qs.filter(contenido__icontains=palabra)
+        if con_relevancia:
+            qs = qs.annotate(relevancia=RawSQL("1", [], output_field=FloatField()))
+        return qs
+    condicion, relevancia, params = consulta
+    qs = qs.filter(RawSQL(condicion, params, output_field=BooleanField()))
+    if con_relevancia:
+        qs = qs.annotate(relevancia=RawSQL(relevancia, params, output_field=FloatField()))
+    return qs
+
+
+def buscar(texto, obra_id=None, desde=None, hasta=None, limite=50):
+    """Registros que coinciden con ``texto``, del más relevante al menos relevante."""
+    qs = documentos_coincidentes(texto, con_relevancia=True)
+    if obra_id:
+        qs = qs.filter(obra_id=obra_id)
+    if desde:
+        qs = qs.filter(fecha__gte=desde)
+    if hasta:
+        qs = qs.filter(fecha__lte=hasta)
+    return (
+        qs.order_by("-relevancia", "-fecha", "-registro_id")
+        .annotate(
+            obra_nombre=F("registro__obra__nombre"),
+            obra_codigo=F("registro__obra__codigo"),
+            supervisor_nombre=F("registro__supervisor__first_name"),
+            supervisor_apellido=F("registro__supervisor__last_name"),
+            supervisor_usuario=F("registro__supervisor__username"),
+        )[:limite]
+    )
+
+
+def fragmento(contenido, texto):
+    """Extracto del contenido alrededor del primer término encontrado."""
+    contenido = " ".join((contenido or "").split())
+    minusculas = contenido.lower()
+    posiciones = [minusculas.find(t.lower()) for t in terminos(texto)]
+    posiciones = [p for p in posiciones if p >= 0]
+    inicio = max(0, min(posiciones) - LARGO_FRAGMENTO // 3) if posiciones else 0
+    extracto = contenido[inicio:inicio + LARGO_FRAGMENTO]
+    return ("…" if inicio else "") + extracto + ("…" if inicio + LARGO_FRAGMENTO < len(contenido) else "")
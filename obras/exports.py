@@ -0,0 +1,115 @@
+"""
+Exportación de horas (planilla por trabajador) en CSV y XLSX.
+
+Las horas se suman en la base de datos agrupadas por trabajador, fecha y
+obra, y las filas se recorren con ``iterator()``: ni el queryset ni el
+archivo se arman completos en memoria. El CSV se envía a medida que se
+genera; el XLSX se escribe con openpyxl en modo write-only a un archivo
+temporal que luego se envía por bloques.
+"""
+import csv
+import tempfile
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+from .models import TrabajadorRegistro
+
+LOTE = 2000
+ENCABEZADO_DETALLE = ["Trabajador", "Usuario", "Fecha", "Obra", "Código obra", "Horas", "Horas extra", "Total"]
+ENCABEZADO_RESUMEN = ["Trabajador", "Usuario", "Días", "Horas", "Horas extra", "Total"]
+
+
+def _nombre(fila):
+    nombre = f"{fila['trabajador__first_name']} {fila['trabajador__last_name']}".strip()
+    return nombre or fila["trabajador__username"]
+
+
+def consultar_horas(desde, hasta, obra_id=None, detalle=True):
+    """Horas agregadas por trabajador (y por fecha/obra si ``detalle``) entre dos fechas."""
+    qs = TrabajadorRegistro.objects.filter(registro__fecha__gte=desde, registro__fecha__lte=hasta)
+    if obra_id:
+        qs = qs.filter(registro__obra_id=obra_id)
+    campos = ["trabajador_id", "trabajador__first_name", "trabajador__last_name", "trabajador__username"]
+    orden = ["trabajador__last_name", "trabajador__first_name", "trabajador_id"]
+    if detalle:
+        campos += ["registro__fecha", "registro__obra__nombre", "registro__obra__codigo"]
+        orden += ["registro__fecha", "registro__obra__codigo"]
+    return (
+        qs.values(*campos)
+        .annotate(horas=Sum("horas_trabajadas"), extras=Sum("horas_extras"), dias=Count("registro__fecha", distinct=True))
+        .order_by(*orden)
+    )
+
+
+def filas_planilla(desde, hasta, obra_id=None, detalle=True):
+    """
+    Genera las filas de la planilla, encabezado incluido.
+
+    En el detalle, al cambiar de trabajador se emite su fila de total; los
+    totales se acumulan al vuelo, sin volver a consultar.
+    """
+    yield ENCABEZADO_DETALLE if detalle else ENCABEZADO_RESUMEN
+    filas = consultar_horas(desde, hasta, obra_id, detalle).iterator(chunk_size=LOTE)
+    if not detalle:
+        for fila in filas:
+            horas, extras = fila["horas"] or Decimal("0"), fila["extras"] or Decimal("0")
+            yield [_nombre(fila), fila["trabajador__username"], fila["dias"], horas, extras, horas + extras]
+        return
+
+    actual, nombre, usuario = None, "", ""
+    total_horas = total_extras = Decimal("0")
+    for fila in filas:
+        if fila["trabajador_id"] != actual:
+            if actual is not None:
+                yield [f"Total {nombre}", usuario, "", "", "", total_horas, total_extras, total_horas + total_extras]
+            actual, nombre, usuario = fila["trabajador_id"], _nombre(fila), fila["trabajador__username"]
+            total_horas = total_extras = Decimal("0")
+        horas, extras = fila["horas"] or Decimal("0"), fila["extras"] or Decimal("0")
+        total_horas += horas
+        total_extras += extras
+        yield [
+            nombre, usuario, fila["registro__fecha"], fila["registro__obra__nombre"],
+            fila["registro__obra__codigo"], horas, extras, horas + extras,
+        ]
+    if actual is not None:
+        yield [f"Total {nombre}", usuario, "", "", "", total_horas, total_extras, total_horas + total_extras]
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: devuelve lo escrito en vez de guardarlo."""
+
+    def write(self, valor):
+        return valor
+
+
+def respuesta_csv(filas, nombre_archivo):
+    escritor = csv.writer(_Eco(), delimiter=";")
+
+    def contenido():
+        yield "\ufeff"  # BOM: Excel abre el archivo como UTF-8
+        for fila in filas:
+            yield escritor.writerow([str(v).replace(".", ",") if isinstance(v, Decimal) else v for v in fila])
+
+    respuesta = StreamingHttpResponse(contenido(), content_type="text/csv; charset=utf-8")
+    respuesta["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
+    return respuesta
+
+
+def respuesta_xlsx(filas, nombre_archivo, titulo="Horas"):
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(title=titulo)
+    for fila in filas:
+        hoja.append(fila)
+    # El temporal se borra solo cuando FileResponse lo cierra al terminar el envío
+    destino = tempfile.TemporaryFile(suffix=".xlsx")
+    libro.save(destino)
+    destino.seek(0)
+    return FileResponse(
+        destino,
+        as_attachment=True,
+        filename=nombre_archivo,
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
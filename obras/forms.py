@@ -1,6 +1,7 @@
 from django import forms
 from .models import Obra, RegistroLibroObra, TareaRealizada, TrabajadorRegistro
 from core.models import Ciudad, Estado
+from core import catalogs
 
 class ObraForm(forms.ModelForm):
     class Meta:
@@ -25,6 +26,9 @@ class ObraForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.fields["ciudad"].queryset = Ciudad.objects.filter(estado=True)
         self.fields["estado_obra"].queryset = Estado.objects.filter(estado=True)
+        # Las opciones salen del catálogo en memoria; el queryset solo valida el valor enviado
+        self.fields["ciudad"].choices = catalogs.opciones(catalogs.ciudades())
+        self.fields["estado_obra"].choices = catalogs.opciones(catalogs.estados())
 
 class RegistroLibroObraForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,198 @@
+"""
+Generación del libro de obra en PDF.
+
+Cada registro se renderiza a su propio PDF y se guarda en caché con una
+ruta que incluye su ``fecha_modificacion``: si el registro no cambió, la
+página ya existe y se reutiliza; si cambió, la ruta es otra y se vuelve a
+renderizar. Armar el libro es entonces renderizar solo los registros
+nuevos o modificados (en un pool de procesos) y unir los PDF con pypdf.
+
+La solicitud se atiende en un hilo fuera de la petición; el renderizado
+pesado corre en procesos aparte para no ocupar el worker web.
+"""
+import glob
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from pypdf import PdfWriter
+
+from core.choices import (
+    ESTADO_LIBRO_COMPLETO,
+    ESTADO_LIBRO_ERROR,
+    ESTADO_LIBRO_PENDIENTE,
+    ESTADO_LIBRO_PROCESANDO,
+)
+from core.thumbnails import is_image_name
+from .models import FotografiaRegistro, LibroObraPdf, RegistroLibroObra, TrabajadorRegistro
+from .pdf_render import renderizar_portada, renderizar_registro
+
+logger = logging.getLogger(__name__)
+
+LOTE = 50
+
+_coordinador = None
+
+
+def _get_coordinador():
+    # Un solo hilo: los libros se arman de a uno por proceso web
+    global _coordinador
+    if _coordinador is None:
+        _coordinador = ThreadPoolExecutor(max_workers=1, thread_name_prefix="libro-pdf")
+    return _coordinador
+
+
+def ruta_cache(registro_id, fecha_modificacion):
+    marca = int(fecha_modificacion.timestamp() * 1_000_000)
+    return os.path.join(settings.LIBRO_PDF_CACHE_DIR, str(registro_id // 1000), f"{registro_id}_{marca}.pdf")
+
+
+def _limpiar_versiones(registro_id, vigente):
+    for ruta in glob.glob(os.path.join(os.path.dirname(vigente), f"{registro_id}_*.pdf")):
+        if ruta != vigente:
+            os.remove(ruta)
+
+
+def _ruta_archivo(field_file):
+    try:
+        return field_file.path
+    except NotImplementedError:
+        return None
+
+
+def datos_registro(registro):
+    """Datos del registro en tipos simples, para enviarlos a un proceso del pool."""
+    fotos, videos = [], []
+    archivos = [registro.fotografia] if registro.fotografia else []
+    archivos += [foto.archivo for foto in registro.fotografias.all() if foto.archivo]
+    for archivo in archivos:
+        if is_image_name(archivo.name) and _ruta_archivo(archivo):
+            fotos.append(_ruta_archivo(archivo))
+        else:
+            videos.append(os.path.basename(archivo.name))
+    supervisor = registro.supervisor
+    return {
+        "id": registro.pk,
+        "fecha": registro.fecha.strftime("%d-%m-%Y"),
+        "obra": f"{registro.obra.codigo} - {registro.obra.nombre}",
+        "supervisor": supervisor.get_full_name() or supervisor.username,
+        "observaciones": registro.observaciones or "",
+        "tareas": [tarea.descripcion for tarea in registro.tareas.all()],
+        "trabajadores": [
+            (
+                t.trabajador.get_full_name() or t.trabajador.username,
+                f"{t.horas_trabajadas:.2f}",
+                f"{t.horas_extras:.2f}",
+                f"{t.horas_trabajadas + t.horas_extras:.2f}",
+            )
+            for t in registro.trabajadores.all()
+        ],
+        "fotos": fotos,
+        "videos": videos,
+    }
+
+
+def _registros(libro):
+    qs = RegistroLibroObra.objects.filter(obra_id=libro.obra_id)
+    if libro.desde:
+        qs = qs.filter(fecha__gte=libro.desde)
+    if libro.hasta:
+        qs = qs.filter(fecha__lte=libro.hasta)
+    return qs.order_by("fecha", "fecha_creacion", "id")
+
+
+def _periodo(libro):
+    if libro.desde and libro.hasta:
+        return f"{libro.desde:%d-%m-%Y} al {libro.hasta:%d-%m-%Y}"
+    if libro.desde:
+        return f"desde {libro.desde:%d-%m-%Y}"
+    if libro.hasta:
+        return f"hasta {libro.hasta:%d-%m-%Y}"
+    return "completo"
+
+
+def generar_libro(libro_id):
+    """Arma el PDF de la solicitud ``libro_id``, renderizando solo lo que no está en caché."""
+    actualizados = LibroObraPdf.objects.filter(pk=libro_id, estado=ESTADO_LIBRO_PENDIENTE).update(
+        estado=ESTADO_LIBRO_PROCESANDO, fecha_modificacion=timezone.now()
+    )
+    if not actualizados:
+        return  # otro proceso ya la tomó
+    libro = LibroObraPdf.objects.select_related("obra").get(pk=libro_id)
+    try:
+        registros = _registros(libro)
+        rutas = [(pk, ruta_cache(pk, modificado)) for pk, modificado in registros.values_list("id", "fecha_modificacion")]
+        faltantes = {pk: ruta for pk, ruta in rutas if not os.path.exists(ruta)}
+
+        if faltantes:
+            detalle = registros.select_related("obra", "supervisor").prefetch_related(
+                "tareas",
+                Prefetch("trabajadores", queryset=TrabajadorRegistro.objects.select_related("trabajador")),
+                Prefetch("fotografias", queryset=FotografiaRegistro.objects.only("id", "registro_id", "archivo")),
+            )
+            contexto = multiprocessing.get_context("spawn")
+            trabajadores = max(1, getattr(settings, "LIBRO_PDF_WORKERS", 2))
+            with ProcessPoolExecutor(max_workers=trabajadores, mp_context=contexto) as pool:
+                pendientes = list(faltantes)
+                for i in range(0, len(pendientes), LOTE):
+                    lote = detalle.filter(pk__in=pendientes[i:i + LOTE])
+                    futuros = [pool.submit(renderizar_registro, datos_registro(r), faltantes[r.pk]) for r in lote]
+                    for futuro in futuros:
+                        futuro.result()
+            for pk, ruta in faltantes.items():
+                _limpiar_versiones(pk, ruta)
+
+        with tempfile.TemporaryDirectory() as directorio:
+            portada = renderizar_portada({
+                "obra": libro.obra.nombre,
+                "codigo": libro.obra.codigo,
+                "direccion": libro.obra.direccion,
+                "periodo": _periodo(libro),
+                "registros": len(rutas),
+                "generado": timezone.localtime().strftime("%d-%m-%Y %H:%M"),
+            }, os.path.join(directorio, "portada.pdf"))
+            escritor = PdfWriter()
+            escritor.append(portada)
+            for _, ruta in rutas:
+                escritor.append(ruta)
+            salida = os.path.join(directorio, "libro.pdf")
+            with open(salida, "wb") as fh:
+                escritor.write(fh)
+            escritor.close()
+            with open(salida, "rb") as fh:
+                libro.archivo.save(f"libro_{libro.obra.codigo}_{libro.pk}.pdf", File(fh), save=False)
+
+        libro.estado = ESTADO_LIBRO_COMPLETO
+        libro.registros = len(rutas)
+        libro.paginas_reutilizadas = len(rutas) - len(faltantes)
+        libro.mensaje = ""
+        libro.save()
+    except Exception as exc:
+        logger.exception("Error generando el libro PDF %s", libro_id)
+        LibroObraPdf.objects.filter(pk=libro_id).update(
+            estado=ESTADO_LIBRO_ERROR, mensaje=str(exc)[:300], fecha_modificacion=timezone.now()
+        )
+
+
+def _generar_en_hilo(libro_id):
+    close_old_connections()
+    try:
+        generar_libro(libro_id)
+    finally:
+        connection.close()
+
+
+def programar_libro(libro):
+    """Encola la generación del libro una vez confirmada la transacción."""
+    libro_id = libro.pk
+    if getattr(settings, "LIBRO_PDF_SYNC", False):
+        transaction.on_commit(lambda: generar_libro(libro_id))
+    else:
+        transaction.on_commit(lambda: _get_coordinador().submit(_generar_en_hilo, libro_id))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from obras.resumen import conciliar
+
+
+class Command(BaseCommand):
+    help = "Recalcula los contadores de ResumenObra desde las tablas de origen y corrige los desvíos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Solo informa los desvíos, sin corregirlos.")
+
+    def handle(self, *args, **options):
+        desvios = conciliar(corregir=not options["dry_run"])
+        for obra_id, diferencias in sorted(desvios.items()):
+            detalle = ", ".join(f"{campo}: {guardado} -> {real}" for campo, (guardado, real) in diferencias.items())
+            self.stdout.write(f"Obra {obra_id}: {detalle}")
+        accion = "encontrados" if options["dry_run"] else "corregidos"
+        self.stdout.write(self.style.SUCCESS(f"Listo. Desvíos {accion} en {len(desvios)} obras."))
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.choices import ESTADO_LIBRO_PENDIENTE, ESTADO_LIBRO_PROCESANDO
+from obras.libro_pdf import generar_libro
+from obras.models import LibroObraPdf
+
+
+class Command(BaseCommand):
+    help = "Genera los libros de obra PDF pendientes (por ejemplo, los que quedaron en cola tras un reinicio)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--minutos",
+            type=int,
+            default=settings.LIBRO_PDF_TIMEOUT_MINUTES,
+            help="Un libro que lleva más que esto en proceso se da por interrumpido y vuelve a la cola.",
+        )
+
+    def handle(self, *args, **options):
+        # El hilo que lo armaba murió con el worker (reinicio, OOM): el libro queda en proceso para siempre
+        limite = timezone.now() - timedelta(minutes=options["minutos"])
+        reencolados = LibroObraPdf.objects.filter(estado=ESTADO_LIBRO_PROCESANDO, fecha_modificacion__lt=limite).update(
+            estado=ESTADO_LIBRO_PENDIENTE, fecha_modificacion=timezone.now()
+        )
+        if reencolados:
+            self.stdout.write(f"{reencolados} libros interrumpidos vuelven a la cola.")
+        pendientes = list(
+            LibroObraPdf.objects.filter(estado=ESTADO_LIBRO_PENDIENTE).order_by("fecha_creacion").values_list("pk", flat=True)
+        )
+        for libro_id in pendientes:
+            generar_libro(libro_id)
+            libro = LibroObraPdf.objects.get(pk=libro_id)
+            self.stdout.write(f"Libro {libro_id}: {libro.get_estado_display()} {libro.mensaje}".rstrip())
+        self.stdout.write(self.style.SUCCESS(f"Listo. {len(pendientes)} libros procesados."))
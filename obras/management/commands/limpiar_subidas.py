@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.choices import ESTADO_SUBIDA_ADJUNTA, ESTADO_SUBIDA_COMPLETA, ESTADO_SUBIDA_PENDIENTE
+from obras.models import SubidaFragmentada
+from obras.uploads import descartar_subida
+
+
+class Command(BaseCommand):
+    help = "Elimina subidas fragmentadas abandonadas (sin terminar o nunca adjuntadas) y sesiones ya adjuntadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horas",
+            type=int,
+            default=settings.CHUNKED_UPLOAD_EXPIRATION_HOURS,
+            help="Antigüedad mínima (desde el último fragmento) para descartar una subida.",
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(hours=options["horas"])
+        # Una completa que nadie adjuntó retiene su archivo ensamblado: al borrarla se libera
+        abandonadas = SubidaFragmentada.objects.filter(
+            estado__in=[ESTADO_SUBIDA_PENDIENTE, ESTADO_SUBIDA_COMPLETA], fecha_modificacion__lt=limite
+        )
+        total = 0
+        for subida in abandonadas.iterator():
+            descartar_subida(subida)
+            total += 1
+        # Las adjuntas ya viven en FotografiaRegistro: solo se borra la sesión
+        adjuntas, _ = SubidaFragmentada.objects.filter(
+            estado=ESTADO_SUBIDA_ADJUNTA, fecha_modificacion__lt=limite
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} subidas abandonadas y {adjuntas} sesiones adjuntas eliminadas."
+        ))
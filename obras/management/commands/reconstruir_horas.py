@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from obras.rollups import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el resumen de horas por obra, día y trabajador desde los registros del libro de obras."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--obra", type=int, help="Reconstruye solo la obra indicada (id).")
+
+    def handle(self, *args, **options):
+        dias, meses = reconstruir(options.get("obra"))
+        self.stdout.write(self.style.SUCCESS(f"Listo. {dias} filas diarias y {meses} meses recalculados."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from obras.busqueda import reindexar_todo
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de observaciones y tareas del libro de obras."
+
+    def handle(self, *args, **options):
+        total = reindexar_todo()
+        self.stdout.write(self.style.SUCCESS(f"Listo. {total} registros indexados."))
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('obras', '0002_trabajadorregistro_horas_extras'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubidaFragmentada',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=255, verbose_name='Nombre original')),
+                ('tipo_contenido', models.CharField(blank=True, max_length=100, verbose_name='Tipo de contenido')),
+                ('tamano', models.BigIntegerField(verbose_name='Tamaño (bytes)')),
+                ('recibido', models.BigIntegerField(default=0, verbose_name='Bytes recibidos')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('completa', 'Completa'), ('adjunta', 'Adjunta')], default='pendiente', max_length=10)),
+                ('archivo', models.FileField(blank=True, upload_to='libro_obras/', verbose_name='Archivo')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subidas_fragmentadas', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Subida fragmentada',
+                'verbose_name_plural': 'Subidas fragmentadas',
+                'db_table': 'libro_obras_subida',
+                'indexes': [models.Index(fields=['estado', 'fecha_modificacion'], name='libro_obras_estado_2f7c6d_idx')],
+            },
+        ),
+    ]
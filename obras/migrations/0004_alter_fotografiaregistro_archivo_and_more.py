@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:33
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obras', '0003_subidafragmentada'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fotografiaregistro',
+            name='archivo',
+            field=models.FileField(storage=core.storage.media_storage, upload_to='libro_obras/', verbose_name='Archivo'),
+        ),
+        migrations.AlterField(
+            model_name='registrolibroobra',
+            name='fotografia',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.media_storage, upload_to='libro_obras/', verbose_name='Fotografía/Video'),
+        ),
+        migrations.AlterField(
+            model_name='subidafragmentada',
+            name='archivo',
+            field=models.FileField(blank=True, storage=core.storage.media_storage, upload_to='libro_obras/', verbose_name='Archivo'),
+        ),
+    ]
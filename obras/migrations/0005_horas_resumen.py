@@ -0,0 +1,68 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('obras', '0004_alter_fotografiaregistro_archivo_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HorasDiariasTrabajador',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('horas_trabajadas', models.DecimalField(decimal_places=2, default=0, max_digits=7, verbose_name='Horas Trabajadas')),
+                ('horas_extras', models.DecimalField(decimal_places=2, default=0, max_digits=7, verbose_name='Horas Extras')),
+                ('registros', models.PositiveIntegerField(default=0, verbose_name='Registros')),
+                ('obra', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horas_diarias', to='obras.obra', verbose_name='Obra')),
+                ('trabajador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horas_diarias', to=settings.AUTH_USER_MODEL, verbose_name='Trabajador')),
+            ],
+            options={
+                'verbose_name': 'Horas diarias por trabajador',
+                'verbose_name_plural': 'Horas diarias por trabajador',
+                'db_table': 'libro_obras_horas_dia',
+            },
+        ),
+        migrations.CreateModel(
+            name='HorasMensualesObra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(verbose_name='Mes')),
+                ('horas_trabajadas', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Horas Trabajadas')),
+                ('horas_extras', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Horas Extras')),
+                ('jornadas', models.PositiveIntegerField(default=0, verbose_name='Jornadas')),
+                ('trabajadores', models.PositiveIntegerField(default=0, verbose_name='Trabajadores distintos')),
+                ('obra', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horas_mensuales', to='obras.obra', verbose_name='Obra')),
+            ],
+            options={
+                'verbose_name': 'Horas mensuales por obra',
+                'verbose_name_plural': 'Horas mensuales por obra',
+                'db_table': 'libro_obras_horas_mes',
+                'ordering': ['obra', 'mes'],
+                'indexes': [models.Index(fields=['mes'], name='libro_obras_mes_5170a7_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='horasmensualesobra',
+            constraint=models.UniqueConstraint(fields=('obra', 'mes'), name='horas_mes_unica'),
+        ),
+        migrations.AddIndex(
+            model_name='horasdiariastrabajador',
+            index=models.Index(fields=['trabajador', 'fecha'], name='libro_obras_trabaja_126232_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='horasdiariastrabajador',
+            index=models.Index(fields=['fecha'], name='libro_obras_fecha_6c8e75_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='horasdiariastrabajador',
+            constraint=models.UniqueConstraint(fields=('obra', 'fecha', 'trabajador'), name='horas_dia_unica'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('obras', '0005_horas_resumen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibroObraPdf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde', models.DateField(blank=True, null=True, verbose_name='Desde')),
+                ('hasta', models.DateField(blank=True, null=True, verbose_name='Hasta')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completo', 'Completo'), ('error', 'Error')], default='pendiente', max_length=12)),
+                ('archivo', models.FileField(blank=True, upload_to='libros_pdf/', verbose_name='Archivo')),
+                ('registros', models.PositiveIntegerField(default=0, verbose_name='Registros')),
+                ('paginas_reutilizadas', models.PositiveIntegerField(default=0, verbose_name='Registros tomados del caché')),
+                ('mensaje', models.CharField(blank=True, max_length=300, verbose_name='Mensaje')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación')),
+                ('obra', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='libros_pdf', to='obras.obra', verbose_name='Obra')),
+                ('solicitado_por', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='libros_pdf', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Libro de obra PDF',
+                'verbose_name_plural': 'Libros de obra PDF',
+                'db_table': 'libro_obras_pdf',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='libro_obras_estado_925c8b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE libro_obras_busqueda_fts USING fts5(
+        contenido, content='libro_obras_busqueda', content_rowid='registro_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER libro_obras_busqueda_ai AFTER INSERT ON libro_obras_busqueda BEGIN
+        INSERT INTO libro_obras_busqueda_fts(rowid, contenido) VALUES (new.registro_id, new.contenido);
+    END""",
+    """CREATE TRIGGER libro_obras_busqueda_ad AFTER DELETE ON libro_obras_busqueda BEGIN
+        INSERT INTO libro_obras_busqueda_fts(libro_obras_busqueda_fts, rowid, contenido)
+        VALUES ('delete', old.registro_id, old.contenido);
+    END""",
+    """CREATE TRIGGER libro_obras_busqueda_au AFTER UPDATE ON libro_obras_busqueda BEGIN
+        INSERT INTO libro_obras_busqueda_fts(libro_obras_busqueda_fts, rowid, contenido)
+        VALUES ('delete', old.registro_id, old.contenido);
+        INSERT INTO libro_obras_busqueda_fts(rowid, contenido) VALUES (new.registro_id, new.contenido);
+    END""",
+]
+SQLITE_FTS_REVERSE = [
+    "DROP TRIGGER IF EXISTS libro_obras_busqueda_au",
+    "DROP TRIGGER IF EXISTS libro_obras_busqueda_ad",
+    "DROP TRIGGER IF EXISTS libro_obras_busqueda_ai",
+    "DROP TABLE IF EXISTS libro_obras_busqueda_fts",
+]
+MYSQL_FTS = ["CREATE FULLTEXT INDEX libro_obras_busqueda_ft ON libro_obras_busqueda (contenido)"]
+MYSQL_FTS_REVERSE = ["DROP INDEX libro_obras_busqueda_ft ON libro_obras_busqueda"]
+
+
+def _ejecutar(schema_editor, por_motor):
+    for sentencia in por_motor.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sentencia)
+
+
+def crear_indice(apps, schema_editor):
+    _ejecutar(schema_editor, {"sqlite": SQLITE_FTS, "mysql": MYSQL_FTS})
+
+
+def eliminar_indice(apps, schema_editor):
+    _ejecutar(schema_editor, {"sqlite": SQLITE_FTS_REVERSE, "mysql": MYSQL_FTS_REVERSE})
+
+
+def poblar(apps, schema_editor):
+    RegistroLibroObra = apps.get_model("obras", "RegistroLibroObra")
+    TareaRealizada = apps.get_model("obras", "TareaRealizada")
+    BusquedaRegistro = apps.get_model("obras", "BusquedaRegistro")
+    registros = RegistroLibroObra.objects.order_by("id").values_list("id", "obra_id", "fecha", "observaciones")
+    lote = []
+    for registro_id, obra_id, fecha, observaciones in registros.iterator(chunk_size=1000):
+        lote.append((registro_id, obra_id, fecha, observaciones))
+        if len(lote) >= 1000:
+            _poblar_lote(lote, TareaRealizada, BusquedaRegistro)
+            lote = []
+    _poblar_lote(lote, TareaRealizada, BusquedaRegistro)
+
+
+def _poblar_lote(lote, TareaRealizada, BusquedaRegistro):
+    if not lote:
+        return
+    tareas = {}
+    for registro_id, descripcion in (
+        TareaRealizada.objects.filter(registro_id__in=[fila[0] for fila in lote])
+        .order_by("registro_id", "orden").values_list("registro_id", "descripcion")
+    ):
+        tareas.setdefault(registro_id, []).append(descripcion)
+    BusquedaRegistro.objects.bulk_create([
+        BusquedaRegistro(
+            registro_id=registro_id,
+            obra_id=obra_id,
+            fecha=fecha,
+            contenido="\n".join([observaciones or ""] + tareas.get(registro_id, [])).strip(),
+        )
+        for registro_id, obra_id, fecha, observaciones in lote
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obras', '0006_libroobrapdf'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusquedaRegistro',
+            fields=[
+                ('registro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='busqueda', serialize=False, to='obras.registrolibroobra')),
+                ('fecha', models.DateField()),
+                ('contenido', models.TextField(blank=True)),
+                ('obra', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='obras.obra')),
+            ],
+            options={
+                'verbose_name': 'Documento de búsqueda',
+                'verbose_name_plural': 'Documentos de búsqueda',
+                'db_table': 'libro_obras_busqueda',
+                'indexes': [models.Index(fields=['obra', 'fecha'], name='libro_obras_obra_id_d57e51_idx')],
+            },
+        ),
+        migrations.RunPython(crear_indice, eliminar_indice),
+        migrations.RunPython(poblar, migrations.RunPython.noop),
+    ]
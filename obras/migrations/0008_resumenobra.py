@@ -0,0 +1,64 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+
+
+def poblar(apps, schema_editor):
+    """Contadores iniciales de las obras existentes, como obras.resumen.valores_reales."""
+    Obra = apps.get_model("obras", "Obra")
+    RegistroLibroObra = apps.get_model("obras", "RegistroLibroObra")
+    FotografiaRegistro = apps.get_model("obras", "FotografiaRegistro")
+    TrabajadorRegistro = apps.get_model("obras", "TrabajadorRegistro")
+    ResumenObra = apps.get_model("obras", "ResumenObra")
+    Gasto = apps.get_model("gastos", "Gasto")
+
+    resumenes = {obra_id: ResumenObra(obra_id=obra_id) for obra_id in Obra.objects.values_list("id", flat=True)}
+    for fila in RegistroLibroObra.objects.values("obra_id").annotate(n=Count("id")).order_by():
+        resumenes[fila["obra_id"]].registros = fila["n"]
+    for fila in FotografiaRegistro.objects.values("registro__obra_id").annotate(n=Count("id")).order_by():
+        resumenes[fila["registro__obra_id"]].fotografias = fila["n"]
+    for fila in (
+        TrabajadorRegistro.objects.values("registro__obra_id")
+        .annotate(horas=Sum("horas_trabajadas"), extras=Sum("horas_extras")).order_by()
+    ):
+        resumenes[fila["registro__obra_id"]].horas_trabajadas = fila["horas"] or 0
+        resumenes[fila["registro__obra_id"]].horas_extras = fila["extras"] or 0
+    for fila in (
+        Gasto.objects.filter(estado=True, obra__isnull=False).values("obra_id")
+        .annotate(n=Count("id"), total=Sum("monto")).order_by()
+    ):
+        resumenes[fila["obra_id"]].gastos = fila["n"]
+        resumenes[fila["obra_id"]].total_gastos = fila["total"] or 0
+    ResumenObra.objects.bulk_create(resumenes.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obras', '0007_busquedaregistro'),
+        ('gastos', '0006_gasto_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenObra',
+            fields=[
+                ('obra', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='obras.obra')),
+                ('registros', models.PositiveIntegerField(default=0, verbose_name='Registros')),
+                ('fotografias', models.PositiveIntegerField(default=0, verbose_name='Fotografías/Videos')),
+                ('horas_trabajadas', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Horas Trabajadas')),
+                ('horas_extras', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Horas Extras')),
+                ('gastos', models.PositiveIntegerField(default=0, verbose_name='Gastos activos')),
+                ('total_gastos', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Total gastos')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación')),
+            ],
+            options={
+                'verbose_name': 'Resumen de obra',
+                'verbose_name_plural': 'Resúmenes de obra',
+                'db_table': 'obras_resumen',
+            },
+        ),
+        migrations.RunPython(poblar, migrations.RunPython.noop),
+    ]
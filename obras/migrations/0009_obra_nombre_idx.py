@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obras', '0008_resumenobra'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='obra',
+            index=models.Index(fields=['nombre'], name='obras_lista_nombre_55856c_idx'),
+        ),
+    ]
@@ -1,8 +1,18 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from core.models import Ciudad, Estado
-from core.choices import TIPO_ARCHIVO_CHOICES, TIPO_ARCHIVO_IMAGEN
+from core.storage import media_storage
+from core.choices import (
+    ESTADO_LIBRO_CHOICES,
+    ESTADO_LIBRO_PENDIENTE,
+    ESTADO_SUBIDA_CHOICES,
+    ESTADO_SUBIDA_PENDIENTE,
+    TIPO_ARCHIVO_CHOICES,
+    TIPO_ARCHIVO_IMAGEN,
+)
 
 class Obra(models.Model):
     nombre = models.CharField(max_length=200, verbose_name="Nombre de la Obra")
@@ -44,6 +54,7 @@ class Obra(models.Model):
         indexes = [
             models.Index(fields=["codigo"]),
             models.Index(fields=["estado"]),
+            models.Index(fields=["nombre"]),
         ]
 
     def clean(self):
@@ -77,7 +88,7 @@ class RegistroLibroObra(models.Model):
         verbose_name="Supervisor",
     )
     observaciones = models.TextField(blank=True, null=True, max_length=1000, verbose_name="Observaciones")
-    fotografia = models.ImageField(upload_to="libro_obras/", blank=True, null=True, verbose_name="Fotografía/Video")
+    fotografia = models.ImageField(upload_to="libro_obras/", storage=media_storage, blank=True, null=True, verbose_name="Fotografía/Video")
     creado_por = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -101,9 +112,18 @@ class RegistroLibroObra(models.Model):
     def __str__(self):
         return f"Registro {self.obra.codigo} - {self.fecha}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # (obra, fecha) con que se cargó: si cambian, el resumen de horas del día anterior se recalcula
+        instance._dia_original = (instance.__dict__.get("obra_id"), instance.__dict__.get("fecha"))
+        # Obra con que se cargó: si cambia, los contadores de ResumenObra pasan a la nueva
+        instance._obra_original = instance.__dict__.get("obra_id")
+        return instance
+
 class FotografiaRegistro(models.Model):
     registro = models.ForeignKey(RegistroLibroObra, on_delete=models.CASCADE, related_name="fotografias")
-    archivo = models.FileField(upload_to="libro_obras/", verbose_name="Archivo")
+    archivo = models.FileField(upload_to="libro_obras/", storage=media_storage, verbose_name="Archivo")
     tipo = models.CharField(max_length=10, choices=TIPO_ARCHIVO_CHOICES, default=TIPO_ARCHIVO_IMAGEN)
     orden = models.PositiveIntegerField(default=0)
     fecha_subida = models.DateTimeField(auto_now_add=True)
@@ -164,3 +184,174 @@ class TrabajadorRegistro(models.Model):
 
     def __str__(self):
         return f"{self.trabajador.get_full_name()} - {self.horas_trabajadas}h"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Horas con que se cargó, para sumar solo la diferencia al resumen de la obra
+        instance._horas_original = (instance.__dict__.get("horas_trabajadas"), instance.__dict__.get("horas_extras"))
+        return instance
+
+class SubidaFragmentada(models.Model):
+    """Sesión de subida por fragmentos (reanudable) de un archivo del libro de obras."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="subidas_fragmentadas",
+        verbose_name="Usuario",
+    )
+    nombre = models.CharField(max_length=255, verbose_name="Nombre original")
+    tipo_contenido = models.CharField(max_length=100, blank=True, verbose_name="Tipo de contenido")
+    tamano = models.BigIntegerField(verbose_name="Tamaño (bytes)")
+    recibido = models.BigIntegerField(default=0, verbose_name="Bytes recibidos")
+    sha256 = models.CharField(max_length=64, blank=True, verbose_name="SHA-256")
+    estado = models.CharField(max_length=10, choices=ESTADO_SUBIDA_CHOICES, default=ESTADO_SUBIDA_PENDIENTE)
+    archivo = models.FileField(upload_to="libro_obras/", storage=media_storage, blank=True, verbose_name="Archivo")
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+    fecha_modificacion = models.DateTimeField(auto_now=True, verbose_name="Fecha de Modificación")
+
+    class Meta:
+        db_table = "libro_obras_subida"
+        verbose_name = "Subida fragmentada"
+        verbose_name_plural = "Subidas fragmentadas"
+        indexes = [
+            models.Index(fields=["estado", "fecha_modificacion"]),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} ({self.recibido}/{self.tamano})"
+
+
+class HorasDiariasTrabajador(models.Model):
+    """Resumen de horas por obra, día y trabajador; lo mantiene obras.rollups."""
+    obra = models.ForeignKey(Obra, on_delete=models.CASCADE, related_name="horas_diarias", verbose_name="Obra")
+    fecha = models.DateField(verbose_name="Fecha")
+    trabajador = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="horas_diarias",
+        verbose_name="Trabajador",
+    )
+    horas_trabajadas = models.DecimalField(max_digits=7, decimal_places=2, default=0, verbose_name="Horas Trabajadas")
+    horas_extras = models.DecimalField(max_digits=7, decimal_places=2, default=0, verbose_name="Horas Extras")
+    registros = models.PositiveIntegerField(default=0, verbose_name="Registros")
+
+    class Meta:
+        db_table = "libro_obras_horas_dia"
+        verbose_name = "Horas diarias por trabajador"
+        verbose_name_plural = "Horas diarias por trabajador"
+        constraints = [
+            models.UniqueConstraint(fields=["obra", "fecha", "trabajador"], name="horas_dia_unica"),
+        ]
+        indexes = [
+            models.Index(fields=["trabajador", "fecha"]),
+            models.Index(fields=["fecha"]),
+        ]
+
+    def __str__(self):
+        return f"{self.obra_id} {self.fecha} {self.trabajador_id}: {self.horas_trabajadas}h + {self.horas_extras}h"
+
+
+class HorasMensualesObra(models.Model):
+    """Totales mensuales de horas por obra, calculados desde HorasDiariasTrabajador."""
+    obra = models.ForeignKey(Obra, on_delete=models.CASCADE, related_name="horas_mensuales", verbose_name="Obra")
+    mes = models.DateField(verbose_name="Mes")  # primer día del mes
+    horas_trabajadas = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Horas Trabajadas")
+    horas_extras = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Horas Extras")
+    jornadas = models.PositiveIntegerField(default=0, verbose_name="Jornadas")
+    trabajadores = models.PositiveIntegerField(default=0, verbose_name="Trabajadores distintos")
+
+    class Meta:
+        db_table = "libro_obras_horas_mes"
+        verbose_name = "Horas mensuales por obra"
+        verbose_name_plural = "Horas mensuales por obra"
+        ordering = ["obra", "mes"]
+        constraints = [
+            models.UniqueConstraint(fields=["obra", "mes"], name="horas_mes_unica"),
+        ]
+        indexes = [
+            models.Index(fields=["mes"]),
+        ]
+
+    def __str__(self):
+        return f"{self.obra_id} {self.mes:%Y-%m}: {self.horas_trabajadas}h + {self.horas_extras}h"
+
+
+class LibroObraPdf(models.Model):
+    """Solicitud de generación del libro de obra en PDF para una obra y un período."""
+    obra = models.ForeignKey(Obra, on_delete=models.CASCADE, related_name="libros_pdf", verbose_name="Obra")
+    desde = models.DateField(blank=True, null=True, verbose_name="Desde")
+    hasta = models.DateField(blank=True, null=True, verbose_name="Hasta")
+    estado = models.CharField(max_length=12, choices=ESTADO_LIBRO_CHOICES, default=ESTADO_LIBRO_PENDIENTE)
+    archivo = models.FileField(upload_to="libros_pdf/", blank=True, verbose_name="Archivo")
+    registros = models.PositiveIntegerField(default=0, verbose_name="Registros")
+    paginas_reutilizadas = models.PositiveIntegerField(default=0, verbose_name="Registros tomados del caché")
+    mensaje = models.CharField(max_length=300, blank=True, verbose_name="Mensaje")
+    solicitado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="libros_pdf",
+        verbose_name="Solicitado por",
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+    fecha_modificacion = models.DateTimeField(auto_now=True, verbose_name="Fecha de Modificación")
+
+    class Meta:
+        db_table = "libro_obras_pdf"
+        verbose_name = "Libro de obra PDF"
+        verbose_name_plural = "Libros de obra PDF"
+        ordering = ["-fecha_creacion"]
+        indexes = [
+            models.Index(fields=["estado", "fecha_creacion"]),
+        ]
+
+    def __str__(self):
+        return f"Libro {self.obra_id} ({self.estado})"
+
+
+class BusquedaRegistro(models.Model):
+    """
+    Documento de búsqueda de un registro: observaciones y tareas en un solo texto.
+
+    Lo mantiene obras.busqueda. En MySQL tiene un índice FULLTEXT; en SQLite
+    una tabla FTS5 externa sincronizada por triggers (ver migración).
+    """
+    registro = models.OneToOneField(
+        RegistroLibroObra, on_delete=models.CASCADE, primary_key=True, related_name="busqueda"
+    )
+    obra = models.ForeignKey(Obra, on_delete=models.CASCADE, related_name="+", db_index=False)
+    fecha = models.DateField()
+    contenido = models.TextField(blank=True)
+
+    class Meta:
+        db_table = "libro_obras_busqueda"
+        verbose_name = "Documento de búsqueda"
+        verbose_name_plural = "Documentos de búsqueda"
+        indexes = [
+            models.Index(fields=["obra", "fecha"]),
+        ]
+
+    def __str__(self):
+        return f"Búsqueda registro {self.registro_id}"
+
+
+class ResumenObra(models.Model):
+    """Contadores por obra para el dashboard; los mantiene obras.resumen en la misma transacción del cambio."""
+    obra = models.OneToOneField(Obra, on_delete=models.CASCADE, primary_key=True, related_name="resumen")
+    registros = models.PositiveIntegerField(default=0, verbose_name="Registros")
+    fotografias = models.PositiveIntegerField(default=0, verbose_name="Fotografías/Videos")
+    horas_trabajadas = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Horas Trabajadas")
+    horas_extras = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Horas Extras")
+    gastos = models.PositiveIntegerField(default=0, verbose_name="Gastos activos")
+    total_gastos = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Total gastos")
+    fecha_modificacion = models.DateTimeField(auto_now=True, verbose_name="Fecha de Modificación")
+
+    class Meta:
+        db_table = "obras_resumen"
+        verbose_name = "Resumen de obra"
+        verbose_name_plural = "Resúmenes de obra"
+
+    def __str__(self):
+        return f"Resumen {self.obra_id}"
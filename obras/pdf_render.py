@@ -0,0 +1,130 @@
+"""
+Renderizado de páginas del libro de obra con reportlab.
+
+Este módulo no importa Django: las funciones reciben datos ya leídos
+(diccionarios simples) y rutas de archivo, por lo que pueden ejecutarse
+en procesos del pool sin configurar Django ni abrir conexiones a la base.
+"""
+import os
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from PIL import Image as PILImage, ImageOps
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+MINIATURA = (480, 360)
+ANCHO_FOTO = 5.4 * cm
+FOTOS_POR_FILA = 3
+
+_estilos = getSampleStyleSheet()
+
+
+def _p(texto, estilo="BodyText"):
+    return Paragraph(escape(str(texto or "")).replace("\n", "<br/>"), _estilos[estilo])
+
+
+def _miniatura(ruta):
+    """Flowable con una copia reducida de la foto, o None si no se puede leer."""
+    try:
+        with PILImage.open(ruta) as imagen:
+            imagen = ImageOps.exif_transpose(imagen)
+            if imagen.mode not in ("RGB", "L"):
+                imagen = imagen.convert("RGB")
+            imagen.thumbnail(MINIATURA)
+            buffer = BytesIO()
+            imagen.save(buffer, "JPEG", quality=75)
+    except (OSError, ValueError):
+        return None
+    buffer.seek(0)
+    ancho, alto = ImageReader(buffer).getSize()
+    buffer.seek(0)
+    return Image(buffer, width=ANCHO_FOTO, height=ANCHO_FOTO * alto / ancho)
+
+
+def _tabla(filas, anchos, encabezado=True):
+    tabla = Table(filas, colWidths=anchos, repeatRows=1 if encabezado else 0)
+    estilo = [
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+    ]
+    if encabezado:
+        estilo += [("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e9ecef")), ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold")]
+    tabla.setStyle(TableStyle(estilo))
+    return tabla
+
+
+def _escribir(destino, story, pie):
+    def dibujar_pie(canvas, doc):
+        canvas.saveState()
+        canvas.setFont("Helvetica", 8)
+        canvas.drawString(doc.leftMargin, 1.2 * cm, pie)
+        canvas.restoreState()
+
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    doc = SimpleDocTemplate(
+        temporal, pagesize=A4, leftMargin=2 * cm, rightMargin=2 * cm, topMargin=2 * cm, bottomMargin=2 * cm
+    )
+    doc.build(story, onFirstPage=dibujar_pie, onLaterPages=dibujar_pie)
+    # El reemplazo es atómico: nunca queda en caché una página a medio escribir
+    os.replace(temporal, destino)
+    return destino
+
+
+def renderizar_registro(datos, destino):
+    """Escribe en ``destino`` las páginas de un registro y devuelve la ruta."""
+    story = [
+        _p(f"Registro N° {datos['id']} — {datos['fecha']}", "Heading2"),
+        _p(f"Obra: {datos['obra']}"),
+        _p(f"Supervisor: {datos['supervisor']}"),
+        Spacer(1, 0.4 * cm),
+        _p("Observaciones", "Heading4"),
+        _p(datos["observaciones"] or "Sin observaciones."),
+        Spacer(1, 0.3 * cm),
+        _p("Tareas realizadas", "Heading4"),
+    ]
+    if datos["tareas"]:
+        story.append(_tabla([[str(i), _p(t)] for i, t in enumerate(datos["tareas"], start=1)], [1 * cm, 16 * cm], False))
+    else:
+        story.append(_p("Sin tareas registradas."))
+
+    story += [Spacer(1, 0.3 * cm), _p("Trabajadores", "Heading4")]
+    if datos["trabajadores"]:
+        filas = [["Trabajador", "Horas", "Horas extra", "Total"]]
+        filas += [[_p(nombre), horas, extras, total] for nombre, horas, extras, total in datos["trabajadores"]]
+        story.append(_tabla(filas, [10 * cm, 2.3 * cm, 2.4 * cm, 2.3 * cm]))
+    else:
+        story.append(_p("Sin trabajadores registrados."))
+
+    if datos["fotos"] or datos["videos"]:
+        story += [Spacer(1, 0.3 * cm), _p("Registro fotográfico", "Heading4")]
+    celdas = [img for img in (_miniatura(ruta) for ruta in datos["fotos"]) if img is not None]
+    if celdas:
+        filas = [celdas[i:i + FOTOS_POR_FILA] for i in range(0, len(celdas), FOTOS_POR_FILA)]
+        filas[-1] += [""] * (FOTOS_POR_FILA - len(filas[-1]))
+        tabla = Table(filas, colWidths=[ANCHO_FOTO + 0.3 * cm] * FOTOS_POR_FILA)
+        tabla.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "TOP")]))
+        story.append(tabla)
+    for video in datos["videos"]:
+        story.append(_p(f"Video adjunto: {video}"))
+
+    return _escribir(destino, story, f"{datos['obra']} — Registro N° {datos['id']} — {datos['fecha']}")
+
+
+def renderizar_portada(datos, destino):
+    story = [
+        Spacer(1, 5 * cm),
+        _p("Libro de Obra", "Title"),
+        _p(f"{datos['codigo']} — {datos['obra']}", "Heading2"),
+        _p(f"Dirección: {datos['direccion']}"),
+        _p(f"Período: {datos['periodo']}"),
+        _p(f"Registros: {datos['registros']}"),
+        _p(f"Generado: {datos['generado']}"),
+    ]
+    return _escribir(destino, story, f"{datos['obra']} — Portada")
@@ -0,0 +1,145 @@
+"""
+Contadores por obra (``ResumenObra``) para el dashboard.
+
+Cada cambio suma o resta su diferencia con expresiones F dentro de la
+misma transacción que lo produjo: si la transacción se revierte, el
+contador también. Las señales cubren los guardados y borrados de a uno;
+los servicios que escriben en lote (bulk_create/bulk_update) llaman a
+``ajustar`` con la diferencia total. ``conciliar`` recalcula todo desde
+las tablas de origen y corrige cualquier desvío.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.utils import timezone
+
+from .models import FotografiaRegistro, Obra, RegistroLibroObra, ResumenObra, TrabajadorRegistro
+
+CAMPOS = ("registros", "fotografias", "horas_trabajadas", "horas_extras", "gastos", "total_gastos")
+
+
+def _sumar(campo, valor):
+    if valor > 0:
+        return F(campo) + valor
+    # Nunca bajo cero (fila desfasada o sin conciliar). La resta solo se evalúa si alcanza:
+    # en MySQL los PositiveIntegerField son UNSIGNED y restar de más falla con DataError
+    return Case(
+        When(**{f"{campo}__gte": -valor}, then=F(campo) + valor),
+        default=Value(0),
+        output_field=ResumenObra._meta.get_field(campo),
+    )
+
+
+def ajustar(obra_id, **deltas):
+    """Suma ``deltas`` (campo=diferencia) a los contadores de la obra; ninguno queda bajo cero."""
+    deltas = {campo: valor for campo, valor in deltas.items() if valor}
+    if obra_id is None or not deltas:
+        return
+    cambios = {campo: _sumar(campo, valor) for campo, valor in deltas.items()}
+    if ResumenObra.objects.filter(obra_id=obra_id).update(fecha_modificacion=timezone.now(), **cambios):
+        return
+    try:
+        with transaction.atomic():
+            ResumenObra.objects.create(obra_id=obra_id, **{campo: max(valor, 0) for campo, valor in deltas.items()})
+    except IntegrityError:
+        # Otra transacción creó la fila al mismo tiempo
+        ResumenObra.objects.filter(obra_id=obra_id).update(fecha_modificacion=timezone.now(), **cambios)
+
+
+def tablero(solo_activas=True):
+    """Obras con sus contadores y días restantes, leídas en una sola consulta."""
+    obras = Obra.objects.select_related("resumen").order_by("fecha_fin_estimada", "nombre")
+    if solo_activas:
+        obras = obras.filter(estado=True)
+    hoy = timezone.localdate()
+    filas, totales = [], dict.fromkeys(CAMPOS, 0)
+    for obra in obras:
+        try:
+            datos = obra.resumen
+        except ResumenObra.DoesNotExist:
+            datos = ResumenObra(obra=obra)
+        for campo in CAMPOS:
+            totales[campo] += getattr(datos, campo)
+        dias_restantes = (obra.fecha_fin_estimada - hoy).days
+        filas.append({
+            "obra": obra,
+            "resumen": datos,
+            "horas_totales": datos.horas_trabajadas + datos.horas_extras,
+            "dias_restantes": dias_restantes,
+            "dias_vencida": max(0, -dias_restantes),
+        })
+    totales["obras"] = len(filas)
+    totales["horas_totales"] = totales["horas_trabajadas"] + totales["horas_extras"]
+    return filas, totales
+
+
+def aporte_registro(registro_id):
+    """Fotografías y horas que un registro aporta al resumen de su obra."""
+    horas = TrabajadorRegistro.objects.filter(registro_id=registro_id).aggregate(
+        horas=Sum("horas_trabajadas"), extras=Sum("horas_extras")
+    )
+    return {
+        "fotografias": FotografiaRegistro.objects.filter(registro_id=registro_id).count(),
+        "horas_trabajadas": horas["horas"] or Decimal("0"),
+        "horas_extras": horas["extras"] or Decimal("0"),
+    }
+
+
+def obra_de_registro(registro_id):
+    return RegistroLibroObra.objects.filter(pk=registro_id).values_list("obra_id", flat=True).first()
+
+
+def valores_reales():
+    """{obra_id: {campo: valor}} calculado desde las tablas de origen, con una consulta agrupada por tabla."""
+    from gastos.models import Gasto
+
+    reales = {obra_id: dict.fromkeys(CAMPOS, 0) for obra_id in Obra.objects.values_list("id", flat=True)}
+    for fila in RegistroLibroObra.objects.values("obra_id").annotate(n=Count("id")).order_by():
+        reales[fila["obra_id"]]["registros"] = fila["n"]
+    for fila in FotografiaRegistro.objects.values("registro__obra_id").annotate(n=Count("id")).order_by():
+        reales[fila["registro__obra_id"]]["fotografias"] = fila["n"]
+    for fila in (
+        TrabajadorRegistro.objects.values("registro__obra_id")
+        .annotate(horas=Sum("horas_trabajadas"), extras=Sum("horas_extras")).order_by()
+    ):
+        reales[fila["registro__obra_id"]]["horas_trabajadas"] = fila["horas"] or 0
+        reales[fila["registro__obra_id"]]["horas_extras"] = fila["extras"] or 0
+    for fila in (
+        Gasto.objects.filter(estado=True).values("obra_id")
+        .annotate(n=Count("id"), total=Sum("monto")).order_by()
+    ):
+        reales[fila["obra_id"]]["gastos"] = fila["n"]
+        reales[fila["obra_id"]]["total_gastos"] = fila["total"] or 0
+    return reales
+
+
+def conciliar(corregir=True):
+    """Compara los contadores con las tablas de origen; devuelve {obra_id: {campo: (guardado, real)}}."""
+    with transaction.atomic():
+        reales = valores_reales()
+        guardados = {
+            resumen.obra_id: resumen
+            for resumen in ResumenObra.objects.select_for_update().filter(obra_id__in=list(reales))
+        }
+        desvios, nuevos, modificados = {}, [], []
+        for obra_id, valores in reales.items():
+            resumen = guardados.get(obra_id)
+            if resumen is None:
+                resumen = ResumenObra(obra_id=obra_id)
+                nuevos.append(resumen)
+            diferencias = {
+                campo: (getattr(resumen, campo), valor)
+                for campo, valor in valores.items()
+                if Decimal(getattr(resumen, campo)) != Decimal(valor)
+            }
+            if diferencias:
+                desvios[obra_id] = diferencias
+                for campo, valor in valores.items():
+                    setattr(resumen, campo, valor)
+                if resumen not in nuevos:
+                    modificados.append(resumen)
+        if corregir:
+            ResumenObra.objects.bulk_create(nuevos)
+            ResumenObra.objects.bulk_update(modificados, list(CAMPOS))
+    return desvios
@@ -0,0 +1,198 @@
+"""
+Resumen de horas del libro de obras.
+
+``HorasDiariasTrabajador`` guarda la suma de horas por (obra, fecha,
+trabajador) y ``HorasMensualesObra`` los totales por (obra, mes). Las
+señales marcan los días afectados por cada cambio y, al confirmarse la
+transacción, solo esos días (y sus meses) se recalculan desde las filas de
+``TrabajadorRegistro``. Un registro con diez trabajadores genera un único
+recálculo de su día, no diez.
+
+``reconstruir()`` vuelve a generar todo desde cero (comando
+``reconstruir_horas``).
+"""
+import datetime
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import HorasDiariasTrabajador, HorasMensualesObra, RegistroLibroObra, TrabajadorRegistro
+
+LOTE = 1000
+
+_local = threading.local()
+
+
+def _pendientes():
+    if not hasattr(_local, "dias"):
+        _local.dias = set()
+        _local.registros = set()
+    return _local
+
+
+def marcar_dia(obra_id, fecha):
+    """Programa el recálculo de (obra, fecha) para cuando se confirme la transacción."""
+    if obra_id is None or fecha is None:
+        return
+    _pendientes().dias.add((obra_id, fecha))
+    transaction.on_commit(aplicar_pendientes)
+
+
+def marcar_registro(registro_id):
+    """Como marcar_dia, pero resolviendo (obra, fecha) del registro al aplicar."""
+    _pendientes().registros.add(registro_id)
+    transaction.on_commit(aplicar_pendientes)
+
+
+def aplicar_pendientes():
+    # Cada marca encola este callback; el primero vacía el conjunto y el resto no hace nada.
+    # Si una transacción se revierte, sus marcas se recalculan en el próximo commit: recalcular
+    # un día sin cambios deja el mismo resultado.
+    pendientes = _pendientes()
+    dias, registros = pendientes.dias, pendientes.registros
+    if not dias and not registros:
+        return
+    pendientes.dias, pendientes.registros = set(), set()
+    if registros:
+        dias |= set(RegistroLibroObra.objects.filter(pk__in=registros).values_list("obra_id", "fecha"))
+    recalcular_dias(dias)
+
+
+def _mes(fecha):
+    return fecha.replace(day=1)
+
+
+def _fin_mes(mes):
+    return (mes + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _filtro_dias(dias, prefijo=""):
+    por_obra = defaultdict(set)
+    for obra_id, fecha in dias:
+        por_obra[obra_id].add(fecha)
+    filtro = Q()
+    for obra_id, fechas in por_obra.items():
+        filtro |= Q(**{f"{prefijo}obra_id": obra_id, f"{prefijo}fecha__in": fechas})
+    return filtro
+
+
+def recalcular_dias(dias):
+    """Recalcula los días indicados [(obra_id, fecha)] y los meses que los contienen."""
+    dias = set(dias)
+    if not dias:
+        return
+    with transaction.atomic():
+        filas = (
+            TrabajadorRegistro.objects
+            .filter(_filtro_dias(dias, "registro__"))
+            .values("registro__obra_id", "registro__fecha", "trabajador_id")
+            .annotate(horas=Sum("horas_trabajadas"), extras=Sum("horas_extras"), total=Count("id"))
+            .order_by()
+        )
+        nuevas = [
+            HorasDiariasTrabajador(
+                obra_id=fila["registro__obra_id"],
+                fecha=fila["registro__fecha"],
+                trabajador_id=fila["trabajador_id"],
+                horas_trabajadas=fila["horas"] or 0,
+                horas_extras=fila["extras"] or 0,
+                registros=fila["total"],
+            )
+            for fila in filas
+        ]
+        HorasDiariasTrabajador.objects.filter(_filtro_dias(dias)).delete()
+        HorasDiariasTrabajador.objects.bulk_create(nuevas, batch_size=LOTE)
+        recalcular_meses({(obra_id, _mes(fecha)) for obra_id, fecha in dias})
+
+
+def recalcular_meses(meses):
+    """Recalcula los totales [(obra_id, primer día del mes)] desde el resumen diario."""
+    filtro = Q()
+    for obra_id, mes in meses:
+        filtro |= Q(obra_id=obra_id, fecha__gte=mes, fecha__lt=_fin_mes(mes))
+    totales = {}
+    filas = (
+        HorasDiariasTrabajador.objects.filter(filtro)
+        .values("obra_id", "fecha", "trabajador_id", "horas_trabajadas", "horas_extras")
+    )
+    trabajadores = defaultdict(set)
+    for fila in filas:
+        clave = (fila["obra_id"], _mes(fila["fecha"]))
+        total = totales.setdefault(clave, HorasMensualesObra(obra_id=clave[0], mes=clave[1]))
+        total.horas_trabajadas += fila["horas_trabajadas"]
+        total.horas_extras += fila["horas_extras"]
+        total.jornadas += 1
+        trabajadores[clave].add(fila["trabajador_id"])
+    for clave, total in totales.items():
+        total.trabajadores = len(trabajadores[clave])
+
+    meses_filtro = Q()
+    for obra_id, mes in meses:
+        meses_filtro |= Q(obra_id=obra_id, mes=mes)
+    HorasMensualesObra.objects.filter(meses_filtro).delete()
+    HorasMensualesObra.objects.bulk_create(totales.values(), batch_size=LOTE)
+
+
+def reconstruir(obra_id=None):
+    """Regenera el resumen completo (o el de una obra) desde TrabajadorRegistro."""
+    with transaction.atomic():
+        diarias = HorasDiariasTrabajador.objects.all()
+        mensuales = HorasMensualesObra.objects.all()
+        filas = TrabajadorRegistro.objects.all()
+        if obra_id is not None:
+            diarias = diarias.filter(obra_id=obra_id)
+            mensuales = mensuales.filter(obra_id=obra_id)
+            filas = filas.filter(registro__obra_id=obra_id)
+        diarias.delete()
+        mensuales.delete()
+
+        filas = (
+            filas.values("registro__obra_id", "registro__fecha", "trabajador_id")
+            .annotate(horas=Sum("horas_trabajadas"), extras=Sum("horas_extras"), total=Count("id"))
+            .order_by("registro__obra_id", "registro__fecha")
+        )
+        lote, meses, total_dias = [], set(), 0
+        for fila in filas.iterator(chunk_size=LOTE):
+            lote.append(HorasDiariasTrabajador(
+                obra_id=fila["registro__obra_id"],
+                fecha=fila["registro__fecha"],
+                trabajador_id=fila["trabajador_id"],
+                horas_trabajadas=fila["horas"] or 0,
+                horas_extras=fila["extras"] or 0,
+                registros=fila["total"],
+            ))
+            meses.add((fila["registro__obra_id"], _mes(fila["registro__fecha"])))
+            if len(lote) >= LOTE:
+                HorasDiariasTrabajador.objects.bulk_create(lote)
+                total_dias += len(lote)
+                lote = []
+        HorasDiariasTrabajador.objects.bulk_create(lote)
+        total_dias += len(lote)
+
+        meses = sorted(meses)
+        for i in range(0, len(meses), 100):
+            recalcular_meses(meses[i:i + 100])
+    return total_dias, len(meses)
+
+
+def horas_por_mes(obra_id, desde=None, hasta=None):
+    """Totales mensuales de una obra, leídos del resumen."""
+    qs = HorasMensualesObra.objects.filter(obra_id=obra_id)
+    if desde:
+        qs = qs.filter(mes__gte=_mes(desde))
+    if hasta:
+        qs = qs.filter(mes__lte=hasta)
+    return qs.order_by("mes")
+
+
+def horas_por_trabajador(obra_id, desde, hasta):
+    """Horas por trabajador de una obra entre dos fechas (inclusive), leídas del resumen diario."""
+    return (
+        HorasDiariasTrabajador.objects
+        .filter(obra_id=obra_id, fecha__gte=desde, fecha__lte=hasta)
+        .values("trabajador_id", "trabajador__first_name", "trabajador__last_name", "trabajador__username")
+        .annotate(horas=Sum("horas_trabajadas"), extras=Sum("horas_extras"), dias=Count("fecha"))
+        .order_by("trabajador__last_name", "trabajador__first_name")
+    )
@@ -0,0 +1,256 @@
+"""
+Escritura de registros del libro de obras.
+
+Todo se valida antes de tocar la base de datos; luego el registro y sus
+hijos se escriben en una sola transacción, con un INSERT/UPDATE/DELETE por
+conjunto de hijos en lugar de una sentencia por fila.
+"""
+import datetime
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from core.choices import ESTADO_SUBIDA_ADJUNTA, ESTADO_SUBIDA_COMPLETA, TIPO_ARCHIVO_IMAGEN, TIPO_ARCHIVO_VIDEO
+from core.storage import liberar_archivo, sumar_referencia
+from core.thumbnails import schedule_derivatives
+from . import resumen
+from .models import (
+    FotografiaRegistro,
+    Obra,
+    RegistroLibroObra,
+    SubidaFragmentada,
+    TareaRealizada,
+    TrabajadorRegistro,
+)
+
+User = get_user_model()
+
+MAX_HORAS_TOTAL = Decimal("12.0")
+MIN_HORAS_BASE = Decimal("1")
+
+
+def _to_decimal(val):
+    try:
+        return Decimal(str(val).replace(",", "."))
+    except (InvalidOperation, ValueError):
+        return Decimal("0")
+
+
+def normaliza_horas(h_str, extra_str, min_base=Decimal("0")):
+    """Normaliza (horas, horas extra) y aplica los límites por trabajador."""
+    base = max(_to_decimal(h_str), Decimal("0"))
+    extra = max(_to_decimal(extra_str), Decimal("0"))
+
+    if base + extra > MAX_HORAS_TOTAL:
+        raise ValidationError("La suma de horas y horas extra no puede superar 12 por trabajador.")
+    if base > MAX_HORAS_TOTAL:
+        raise ValidationError("Las horas normales no pueden superar 12 por trabajador.")
+    if min_base > 0 and base < min_base:
+        raise ValidationError("Las horas normales deben ser al menos 1 por trabajador.")
+    return base.quantize(Decimal("0.01")), extra.quantize(Decimal("0.01"))
+
+
+def leer_datos_registro(post, supervisor, fecha_actual=None):
+    """
+    Lee y valida el POST del formulario de registro.
+
+    Devuelve un dict con obra_id, fecha, observaciones, tareas y
+    trabajadores [(trabajador_id, horas, extras)] o lanza ValidationError.
+    """
+    obra_id = (post.get("obra") or "").strip()
+    if not obra_id.isdigit() or not Obra.objects.filter(pk=obra_id).exists():
+        raise ValidationError("Selecciona una obra válida.")
+
+    fecha_str = (post.get("fecha") or "").strip()
+    fecha = fecha_actual
+    if fecha_str:
+        try:
+            fecha = datetime.date.fromisoformat(fecha_str)
+        except ValueError:
+            if fecha_actual is None:
+                raise ValidationError("La fecha no es válida.")
+    if fecha is None:
+        raise ValidationError("La fecha es obligatoria.")
+
+    tareas = [t.strip() for t in post.getlist("tarea[]") if t.strip()]
+
+    trabajadores = post.getlist("trabajador[]")
+    horas = post.getlist("horas[]")
+    horas_extras = post.getlist("horas_extra[]")
+
+    trabajadores_limpios = [t for t in trabajadores if t]
+    if len(trabajadores_limpios) != len(set(trabajadores_limpios)):
+        raise ValidationError("Un trabajador no puede repetirse en el mismo registro.")
+    if str(supervisor.id) in trabajadores_limpios:
+        raise ValidationError("El supervisor no puede ser seleccionado como trabajador.")
+
+    trabajadores_data = []
+    for trabajador_id, horas_val, extra_val in zip(trabajadores, horas, horas_extras):
+        if trabajador_id and (horas_val or extra_val):
+            if not trabajador_id.isdigit():
+                raise ValidationError("Trabajador inválido.")
+            base, extra = normaliza_horas(horas_val, extra_val, min_base=MIN_HORAS_BASE)
+            trabajadores_data.append((int(trabajador_id), base, extra))
+
+    ids = {tid for tid, _, _ in trabajadores_data}
+    if ids and User.objects.filter(id__in=ids, is_active=True).count() != len(ids):
+        raise ValidationError("Uno de los trabajadores no existe o no está activo.")
+
+    return {
+        "obra_id": int(obra_id),
+        "fecha": fecha,
+        "observaciones": post.get("observaciones", ""),
+        "tareas": tareas,
+        "trabajadores": trabajadores_data,
+    }
+
+
+def obtener_subidas(post, usuario):
+    """Subidas fragmentadas ya completas que el formulario pide adjuntar."""
+    ids = [i.strip() for i in post.getlist("subidas[]") if i.strip()]
+    if not ids:
+        return []
+    try:
+        ids = list(dict.fromkeys(str(uuid.UUID(i)) for i in ids))
+    except ValueError:
+        raise ValidationError("Referencia de archivo subido inválida.")
+    subidas = list(
+        SubidaFragmentada.objects
+        .filter(pk__in=ids, usuario=usuario, estado=ESTADO_SUBIDA_COMPLETA)
+        .order_by("fecha_creacion")
+    )
+    if len(subidas) != len(ids):
+        raise ValidationError("Uno de los archivos subidos no está disponible o no terminó de subir.")
+    return subidas
+
+
+def tipo_archivo(archivo):
+    content_type = getattr(archivo, "content_type", "") or ""
+    return TIPO_ARCHIVO_VIDEO if content_type.startswith("video/") else TIPO_ARCHIVO_IMAGEN
+
+
+def _agregar_archivos(registro, archivos, orden_inicial=0, subidas=()):
+    fotos = [
+        FotografiaRegistro(registro=registro, archivo=archivo, tipo=tipo_archivo(archivo), orden=orden_inicial + i)
+        for i, archivo in enumerate(archivos)
+    ]
+    # Los archivos de subidas fragmentadas ya están en el storage: solo se referencian
+    fotos += [
+        FotografiaRegistro(
+            registro=registro,
+            archivo=subida.archivo.name,
+            tipo=TIPO_ARCHIVO_IMAGEN if subida.tipo_contenido.startswith("image/") else TIPO_ARCHIVO_VIDEO,
+            orden=orden_inicial + len(fotos) + i,
+        )
+        for i, subida in enumerate(subidas)
+    ]
+    if subidas:
+        # La fotografía es una referencia más al mismo contenido que la subida
+        for subida in subidas:
+            if subida.sha256 and subida.archivo.name.startswith("cas/"):
+                sumar_referencia(subida.sha256, subida.archivo.name, subida.tamano)
+        SubidaFragmentada.objects.filter(pk__in=[s.pk for s in subidas]).update(
+            estado=ESTADO_SUBIDA_ADJUNTA, fecha_modificacion=timezone.now()
+        )
+    if fotos:
+        # bulk_create no emite post_save: los derivados se encolan aquí
+        FotografiaRegistro.objects.bulk_create(fotos)
+        resumen.ajustar(registro.obra_id, fotografias=len(fotos))
+        for foto in fotos:
+            schedule_derivatives(foto.archivo)
+    return fotos
+
+
+def _sincronizar_tareas(registro, tareas, existentes=None):
+    """Aplica solo la diferencia entre las tareas guardadas y las nuevas (por orden)."""
+    actuales = {t.orden: t for t in (existentes if existentes is not None else registro.tareas.all())}
+    nuevas, modificadas = [], []
+    for orden, descripcion in enumerate(tareas, start=1):
+        tarea = actuales.pop(orden, None)
+        if tarea is None:
+            nuevas.append(TareaRealizada(registro=registro, descripcion=descripcion, orden=orden))
+        elif tarea.descripcion != descripcion:
+            tarea.descripcion = descripcion
+            modificadas.append(tarea)
+    if actuales:
+        TareaRealizada.objects.filter(id__in=[t.id for t in actuales.values()]).delete()
+    if modificadas:
+        TareaRealizada.objects.bulk_update(modificadas, ["descripcion"])
+    if nuevas:
+        TareaRealizada.objects.bulk_create(nuevas)
+    return bool(nuevas or modificadas or actuales)
+
+
+def _sincronizar_trabajadores(registro, trabajadores, existentes=None):
+    """Aplica solo la diferencia de trabajadores (clave: trabajador_id)."""
+    actuales = {t.trabajador_id: t for t in (existentes if existentes is not None else registro.trabajadores.all())}
+    nuevos, modificados = [], []
+    # bulk_create/bulk_update no emiten señales: la diferencia de horas se suma al resumen aquí
+    delta_horas = delta_extras = Decimal("0")
+    for trabajador_id, horas, extras in trabajadores:
+        fila = actuales.pop(trabajador_id, None)
+        if fila is None:
+            delta_horas += horas
+            delta_extras += extras
+            nuevos.append(TrabajadorRegistro(
+                registro=registro,
+                trabajador_id=trabajador_id,
+                horas_trabajadas=horas,
+                horas_extras=extras,
+            ))
+        elif fila.horas_trabajadas != horas or fila.horas_extras != extras:
+            delta_horas += horas - fila.horas_trabajadas
+            delta_extras += extras - fila.horas_extras
+            fila.horas_trabajadas = horas
+            fila.horas_extras = extras
+            modificados.append(fila)
+    if actuales:
+        TrabajadorRegistro.objects.filter(id__in=[t.id for t in actuales.values()]).delete()
+    if modificados:
+        TrabajadorRegistro.objects.bulk_update(modificados, ["horas_trabajadas", "horas_extras"])
+    if nuevos:
+        TrabajadorRegistro.objects.bulk_create(nuevos)
+    resumen.ajustar(registro.obra_id, horas_trabajadas=delta_horas, horas_extras=delta_extras)
+    return bool(nuevos or modificados or actuales)
+
+
+def crear_registro(datos, usuario, fotografia=None, archivos=(), subidas=()):
+    """Crea el registro con sus tareas, trabajadores y archivos en una transacción."""
+    with transaction.atomic():
+        registro = RegistroLibroObra.objects.create(
+            obra_id=datos["obra_id"],
+            fecha=datos["fecha"],
+            supervisor=usuario,
+            observaciones=datos["observaciones"],
+            fotografia=fotografia,
+            creado_por=usuario,
+        )
+        _agregar_archivos(registro, archivos, subidas=subidas)
+        _sincronizar_tareas(registro, datos["tareas"], existentes=[])
+        _sincronizar_trabajadores(registro, datos["trabajadores"], existentes=[])
+    return registro
+
+
+def actualizar_registro(registro, datos, fotografia=None, archivos=(), eliminar_ids=(), subidas=()):
+    """Actualiza el registro aplicando solo los cambios sobre sus hijos."""
+    with transaction.atomic():
+        registro.obra_id = datos["obra_id"]
+        registro.fecha = datos["fecha"]
+        registro.observaciones = datos["observaciones"]
+        if fotografia:
+            liberar_archivo(registro.fotografia)
+            registro.fotografia = fotografia
+        registro.save()
+
+        if eliminar_ids:
+            FotografiaRegistro.objects.filter(id__in=eliminar_ids, registro=registro).delete()
+        if archivos or subidas:
+            _agregar_archivos(registro, archivos, orden_inicial=registro.fotografias.count(), subidas=subidas)
+
+        _sincronizar_tareas(registro, datos["tareas"])
+        _sincronizar_trabajadores(registro, datos["trabajadores"])
+    return registro
@@ -0,0 +1,137 @@
+from decimal import Decimal
+
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.storage import liberar_archivo
+from core.thumbnails import schedule_derivatives
+from . import busqueda, resumen, rollups
+from .models import FotografiaRegistro, RegistroLibroObra, SubidaFragmentada, TareaRealizada, TrabajadorRegistro
+
+
+@receiver(post_save, sender=FotografiaRegistro)
+def fotografia_derivados(sender, instance, **kwargs):
+    schedule_derivatives(instance.archivo)
+
+
+@receiver(post_save, sender=RegistroLibroObra)
+def registro_derivados(sender, instance, **kwargs):
+    schedule_derivatives(instance.fotografia)
+
+
+@receiver(post_delete, sender=FotografiaRegistro)
+def fotografia_liberar(sender, instance, **kwargs):
+    liberar_archivo(instance.archivo)
+    # Cambia la fecha de modificación para invalidar la página en caché del libro PDF
+    RegistroLibroObra.objects.filter(pk=instance.registro_id).update(fecha_modificacion=timezone.now())
+
+
+@receiver(post_delete, sender=RegistroLibroObra)
+def registro_liberar(sender, instance, **kwargs):
+    liberar_archivo(instance.fotografia)
+
+
+@receiver(post_delete, sender=SubidaFragmentada)
+def subida_liberar(sender, instance, **kwargs):
+    liberar_archivo(instance.archivo)
+
+
+@receiver(post_save, sender=RegistroLibroObra)
+def registro_horas(sender, instance, **kwargs):
+    original = getattr(instance, "_dia_original", None)
+    actual = (instance.obra_id, instance.fecha)
+    if original and original != actual:
+        rollups.marcar_dia(*original)
+    rollups.marcar_dia(*actual)
+    instance._dia_original = actual
+
+
+@receiver(post_delete, sender=RegistroLibroObra)
+def registro_horas_eliminar(sender, instance, **kwargs):
+    rollups.marcar_dia(instance.obra_id, instance.fecha)
+
+
+@receiver(post_save, sender=TrabajadorRegistro)
+@receiver(post_delete, sender=TrabajadorRegistro)
+def trabajador_horas(sender, instance, **kwargs):
+    # Al borrar un registro en cascada el día ya quedó marcado por registro_horas_eliminar
+    rollups.marcar_registro(instance.registro_id)
+
+
+@receiver(post_save, sender=RegistroLibroObra)
+def registro_busqueda(sender, instance, **kwargs):
+    # Las tareas se escriben en lote junto con el registro, que siempre se guarda: basta marcarlo aquí
+    busqueda.marcar_registro(instance.pk)
+
+
+@receiver(post_save, sender=TareaRealizada)
+@receiver(post_delete, sender=TareaRealizada)
+def tarea_busqueda(sender, instance, **kwargs):
+    busqueda.marcar_registro(instance.registro_id)
+
+
+def _borrado_por_registro(origin):
+    """True si el borrado viene en cascada desde un registro: su pre_delete ya descontó todo."""
+    if isinstance(origin, QuerySet):
+        return origin.model is RegistroLibroObra
+    return isinstance(origin, RegistroLibroObra)
+
+
+def _restar(aporte):
+    return {campo: -valor for campo, valor in aporte.items()}
+
+
+@receiver(post_save, sender=RegistroLibroObra)
+def registro_resumen(sender, instance, created, **kwargs):
+    if created:
+        resumen.ajustar(instance.obra_id, registros=1)
+    else:
+        original = getattr(instance, "_obra_original", instance.obra_id)
+        if original != instance.obra_id:
+            # El registro cambió de obra: sus fotografías y horas se van con él
+            aporte = resumen.aporte_registro(instance.pk)
+            resumen.ajustar(original, registros=-1, **_restar(aporte))
+            resumen.ajustar(instance.obra_id, registros=1, **aporte)
+    instance._obra_original = instance.obra_id
+
+
+@receiver(pre_delete, sender=RegistroLibroObra)
+def registro_resumen_eliminar(sender, instance, **kwargs):
+    aporte = resumen.aporte_registro(instance.pk)
+    resumen.ajustar(instance.obra_id, registros=-1, **_restar(aporte))
+
+
+@receiver(post_save, sender=FotografiaRegistro)
+def fotografia_resumen(sender, instance, created, **kwargs):
+    if created:
+        resumen.ajustar(resumen.obra_de_registro(instance.registro_id), fotografias=1)
+
+
+@receiver(post_delete, sender=FotografiaRegistro)
+def fotografia_resumen_eliminar(sender, instance, origin=None, **kwargs):
+    if not _borrado_por_registro(origin):
+        resumen.ajustar(resumen.obra_de_registro(instance.registro_id), fotografias=-1)
+
+
+@receiver(post_save, sender=TrabajadorRegistro)
+def trabajador_resumen(sender, instance, created, **kwargs):
+    horas, extras = Decimal(str(instance.horas_trabajadas)), Decimal(str(instance.horas_extras or 0))
+    anterior_horas, anterior_extras = (0, 0) if created else getattr(instance, "_horas_original", (0, 0))
+    resumen.ajustar(
+        resumen.obra_de_registro(instance.registro_id),
+        horas_trabajadas=horas - (anterior_horas or 0),
+        horas_extras=extras - (anterior_extras or 0),
+    )
+    instance._horas_original = (horas, extras)
+
+
+@receiver(post_delete, sender=TrabajadorRegistro)
+def trabajador_resumen_eliminar(sender, instance, origin=None, **kwargs):
+    if not _borrado_por_registro(origin):
+        resumen.ajustar(
+            resumen.obra_de_registro(instance.registro_id),
+            horas_trabajadas=-instance.horas_trabajadas,
+            horas_extras=-instance.horas_extras,
+        )
@@ -0,0 +1,475 @@
+import datetime
+import hashlib
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from core.choices import ESTADO_LIBRO_COMPLETO, ESTADO_LIBRO_PROCESANDO, ESTADO_SUBIDA_COMPLETA
+from core.models import ArchivoContenido
+from core.pruebas import crear_obra
+from core.storage import media_storage
+from core.uploadhandlers import limitar_subidas
+from obras import busqueda, resumen, services
+from obras.models import (
+    BusquedaRegistro, FotografiaRegistro, HorasDiariasTrabajador, HorasMensualesObra, LibroObraPdf, RegistroLibroObra,
+    ResumenObra, SubidaFragmentada, TareaRealizada, TrabajadorRegistro,
+)
+from obras.rollups import reconstruir
+
+
+class HorasObraTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("supervisor", password="x")
+        cls.trabajador = User.objects.create_user("trabajador", first_name="Juan", last_name="Pérez")
+        cls.obra = crear_obra()
+        cls.otra = crear_obra("OB-2", "Casa Sur")
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def registrar(self, fecha, horas, extras=0, obra=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            registro = RegistroLibroObra.objects.create(obra=obra or self.obra, fecha=fecha, supervisor=self.usuario)
+            TrabajadorRegistro.objects.create(
+                registro=registro, trabajador=self.trabajador,
+                horas_trabajadas=Decimal(horas), horas_extras=Decimal(extras),
+            )
+        return registro
+
+    def meses(self, obra):
+        return {
+            fila.mes.strftime("%Y-%m"): (fila.horas_trabajadas, fila.horas_extras, fila.jornadas)
+            for fila in HorasMensualesObra.objects.filter(obra=obra)
+        }
+
+    def test_resumen_sigue_registros_y_cambios_de_obra(self):
+        self.registrar(datetime.date(2025, 3, 3), "8", "1")
+        self.registrar(datetime.date(2025, 3, 3), "2")
+        registro = self.registrar(datetime.date(2025, 4, 1), "6")
+        self.assertEqual(self.meses(self.obra), {
+            "2025-03": (Decimal("10"), Decimal("1"), 1),
+            "2025-04": (Decimal("6"), Decimal("0"), 1),
+        })
+
+        registro = RegistroLibroObra.objects.get(pk=registro.pk)
+        registro.obra = self.otra
+        with self.captureOnCommitCallbacks(execute=True):
+            registro.save()
+        self.assertNotIn("2025-04", self.meses(self.obra))
+        self.assertEqual(self.meses(self.otra), {"2025-04": (Decimal("6"), Decimal("0"), 1)})
+
+        antes = set(HorasDiariasTrabajador.objects.values_list("obra_id", "fecha", "horas_trabajadas"))
+        self.assertEqual(reconstruir(), (2, 2))
+        self.assertEqual(set(HorasDiariasTrabajador.objects.values_list("obra_id", "fecha", "horas_trabajadas")), antes)
+
+    def test_horas_data_por_mes_y_trabajador(self):
+        self.registrar(datetime.date(2025, 3, 3), "8", "1")
+        url = reverse("obra_horas_data", args=[self.obra.pk])
+        datos = self.client.get(url, {"mes": "2025-03"}).json()
+        self.assertEqual(datos["meses"], [{"mes": "2025-03", "horas": 8.0, "horas_extras": 1.0, "jornadas": 1, "trabajadores": 1}])
+        self.assertEqual(datos["trabajadores"][0]["nombre"], "Juan Pérez")
+        self.assertEqual(self.client.get(url, {"mes": "marzo"}).status_code, 400)
+
+    def test_feed_del_libro_pagina_por_cursor(self):
+        for dia in (3, 4, 5):
+            self.registrar(datetime.date(2025, 3, dia), "8")
+        url = reverse("registro_libro_data")
+        primera = self.client.get(url, {"length": 2}).json()
+        self.assertEqual(primera["recordsTotal"], 3)
+        self.assertEqual([f["fecha"] for f in primera["data"]], ["2025-03-05", "2025-03-04"])
+
+        segunda = self.client.get(url, {"length": 2, "cursor": primera["next_cursor"]}).json()
+        self.assertEqual([f["fecha"] for f in segunda["data"]], ["2025-03-03"])
+        self.assertIsNone(segunda["recordsTotal"])
+        self.assertIsNone(segunda["next_cursor"])
+        self.assertEqual(self.client.get(url, {"cursor": "no-es-un-cursor"}).status_code, 400)
+
+    def test_listado_filtra_obra_por_autocompletar(self):
+        html = self.client.get(reverse("registro_libro_list")).content.decode()
+        self.assertIn(reverse("obra_autocompletar"), html)
+        self.assertNotIn("Casa Sur", html)
+
+    def test_exportar_horas_en_csv(self):
+        self.registrar(datetime.date(2025, 3, 3), "8", "1")
+        self.registrar(datetime.date(2025, 3, 4), "6", obra=self.otra)
+        respuesta = self.client.get(reverse("horas_export"), {"desde": "2025-03-01", "hasta": "2025-03-31", "obra": self.obra.pk})
+        contenido = b"".join(respuesta.streaming_content).decode()
+        self.assertTrue(contenido.startswith("\ufeffTrabajador;"))
+        filas = contenido.splitlines()
+        self.assertEqual(len(filas), 3)
+        self.assertTrue(filas[-1].startswith("Total Juan Pérez;trabajador;"))
+        self.assertNotIn("Casa Sur", contenido)
+
+        invalido = self.client.get(reverse("horas_export"), {"desde": "2025-03-31", "hasta": "2025-03-01"})
+        self.assertRedirects(invalido, reverse("registro_libro_list"), fetch_redirect_response=False)
+
+    def test_toggle_estado_solo_acepta_post(self):
+        url = reverse("obra_toggle_estado", args=[self.otra.pk])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(url).json()["estado"], False)
+
+    def test_formulario_libro_busca_la_obra_por_autocompletar(self):
+        formulario = self.client.get(reverse("registro_libro_create")).content.decode()
+        self.assertIn(reverse("obra_autocompletar"), formulario)
+        self.assertNotIn("Casa Sur", formulario)
+
+        resultados = self.client.get(reverse("obra_autocompletar"), {"q": "casa"}).json()["results"]
+        self.assertEqual(resultados, [{"id": self.otra.pk, "text": "OB-2 - Casa Sur", "inicio": "2025-01-01", "fin": "2026-01-01"}])
+
+        registro = self.registrar(datetime.date(2025, 3, 3), "8", obra=self.otra)
+        edicion = self.client.get(reverse("registro_libro_update", args=[registro.pk])).content.decode()
+        self.assertIn("OB-2 - Casa Sur", edicion)
+        self.assertNotIn("Edificio Norte", edicion)
+
+
+class BusquedaRegistroTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("supervisor", password="x")
+        cls.obra = crear_obra()
+
+    def test_reindexar_el_mismo_registro_actualiza_el_documento(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            registro = RegistroLibroObra.objects.create(
+                obra=self.obra, fecha=datetime.date(2025, 3, 3), supervisor=self.usuario, observaciones="Hormigonado losa",
+            )
+        busqueda.indexar([registro.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            TareaRealizada.objects.create(registro=registro, descripcion="Moldaje de pilares")
+        busqueda.indexar([registro.pk])
+
+        self.assertEqual(BusquedaRegistro.objects.count(), 1)
+        self.assertIn("Moldaje de pilares", BusquedaRegistro.objects.get().contenido)
+        self.assertEqual([d.registro_id for d in busqueda.buscar("moldaje")], [registro.pk])
+        self.assertEqual(busqueda.reindexar_todo(), 1)
+
+    def test_endpoint_de_busqueda(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            registro = RegistroLibroObra.objects.create(
+                obra=self.obra, fecha=datetime.date(2025, 3, 3), supervisor=self.usuario, observaciones="Hormigonado losa",
+            )
+        self.client.force_login(self.usuario)
+        url = reverse("registro_libro_buscar")
+        resultados = self.client.get(url, {"q": "hormig"}).json()["resultados"]
+        self.assertEqual([(r["id"], r["obra"]) for r in resultados], [(registro.pk, "OB-1 - Edificio Norte")])
+        self.assertEqual(self.client.get(url, {"q": "hormig", "desde": "2025-04-01"}).json()["resultados"], [])
+        self.assertEqual(self.client.get(url, {"q": " "}).status_code, 400)
+
+
+class ResumenObraTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("supervisor", password="x")
+        cls.trabajador = User.objects.create_user("trabajador")
+        cls.obra = crear_obra()
+
+    def contadores(self):
+        return ResumenObra.objects.values("registros", "fotografias", "horas_trabajadas").get(obra=self.obra)
+
+    def crear_registro(self):
+        registro = RegistroLibroObra.objects.create(obra=self.obra, fecha=datetime.date(2025, 3, 3), supervisor=self.usuario)
+        FotografiaRegistro.objects.create(registro=registro, archivo="libro_obras/a.jpg")
+        TrabajadorRegistro.objects.create(registro=registro, trabajador=self.trabajador, horas_trabajadas=Decimal("8"))
+        return registro
+
+    def test_contadores_siguen_altas_y_bajas(self):
+        registro = self.crear_registro()
+        self.assertEqual(self.contadores(), {"registros": 1, "fotografias": 1, "horas_trabajadas": Decimal("8")})
+        registro.fotografias.get().delete()
+        self.assertEqual(self.contadores()["fotografias"], 0)
+        registro.delete()
+        self.assertEqual(self.contadores(), {"registros": 0, "fotografias": 0, "horas_trabajadas": Decimal("0")})
+        self.assertEqual(resumen.conciliar(), {})
+
+    def test_fila_desfasada_no_queda_bajo_cero(self):
+        registro = self.crear_registro()
+        ResumenObra.objects.filter(obra=self.obra).update(registros=0, fotografias=0, horas_trabajadas=Decimal("2"))
+        registro.delete()
+        self.assertEqual(self.contadores(), {"registros": 0, "fotografias": 0, "horas_trabajadas": Decimal("0")})
+
+    def test_sin_fila_una_resta_no_crea_contadores_negativos(self):
+        resumen.ajustar(self.obra.pk, registros=-1, horas_trabajadas=Decimal("-3"))
+        self.assertEqual(self.contadores(), {"registros": 0, "fotografias": 0, "horas_trabajadas": Decimal("0")})
+
+
+class ServiciosRegistroTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("supervisor", password="x")
+        cls.ana = User.objects.create_user("ana")
+        cls.luis = User.objects.create_user("luis")
+        cls.obra = crear_obra()
+
+    def datos(self, tareas, trabajadores):
+        return {
+            "obra_id": self.obra.pk, "fecha": datetime.date(2025, 3, 3), "observaciones": "",
+            "tareas": tareas, "trabajadores": [(t.pk, Decimal(h), Decimal("0")) for t, h in trabajadores],
+        }
+
+    def crear(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return services.crear_registro(
+                self.datos(["Excavación", "Moldaje"], [(self.ana, "8"), (self.luis, "6")]), self.usuario,
+            )
+
+    def resumen_obra(self):
+        return list(ResumenObra.objects.filter(obra=self.obra).values("registros", "horas_trabajadas"))
+
+    def test_fallo_a_mitad_de_la_creacion_no_deja_nada(self):
+        antes = self.resumen_obra()
+        with mock.patch.object(TrabajadorRegistro.objects, "bulk_create", side_effect=RuntimeError("caída")):
+            with self.assertRaises(RuntimeError):
+                self.crear()
+        self.assertFalse(RegistroLibroObra.objects.exists())
+        self.assertFalse(TareaRealizada.objects.exists())
+        self.assertEqual(self.resumen_obra(), antes)
+
+    def test_actualizar_solo_escribe_lo_que_cambia(self):
+        registro = self.crear()
+        datos = self.datos(["Excavación", "Moldaje de muros"], [(self.ana, "8"), (self.luis, "7")])
+        with CaptureQueriesContext(connection) as ctx:
+            services.actualizar_registro(registro, datos)
+        hijos = [
+            q["sql"].split()[0] for q in ctx.captured_queries
+            if "libro_obras_tarea" in q["sql"].split("WHERE")[0] or "libro_obras_trabajador" in q["sql"].split("WHERE")[0]
+        ]
+        # Sin borrar ni reinsertar: un SELECT y un UPDATE por tabla hija
+        self.assertEqual(sorted(hijos), ["SELECT", "SELECT", "UPDATE", "UPDATE"])
+        self.assertEqual(list(registro.tareas.values_list("descripcion", flat=True)), ["Excavación", "Moldaje de muros"])
+        self.assertEqual(resumen.conciliar(corregir=False), {})
+
+    def test_quitar_un_trabajador_borra_solo_su_fila(self):
+        registro = self.crear()
+        ana = registro.trabajadores.get(trabajador=self.ana)
+        with self.captureOnCommitCallbacks(execute=True):
+            services.actualizar_registro(registro, self.datos(["Excavación", "Moldaje"], [(self.ana, "8")]))
+        self.assertEqual(list(registro.trabajadores.values_list("id", flat=True)), [ana.pk])
+        self.assertEqual(resumen.conciliar(), {})
+        self.assertEqual(self.resumen_obra(), [{"registros": 1, "horas_trabajadas": Decimal("8")}])
+
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 28
+
+
+@limitar_subidas(2, 100, {".jpg", ".png"})
+def vista_con_archivos(request):
+    return JsonResponse({"tipos": [archivo.content_type for archivo in request.FILES.getlist("archivo")]})
+
+
+class LimiteSubidaTest(TestCase):
+    def enviar(self, *archivos, csrf=False):
+        request = RequestFactory().post("/", {"archivo": list(archivos)}, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        request._dont_enforce_csrf_checks = not csrf
+        return vista_con_archivos(request)
+
+    def rechazo(self, respuesta):
+        return respuesta.status_code, json.loads(respuesta.content)["message"]
+
+    def test_acepta_y_usa_el_tipo_detectado(self):
+        respuesta = self.enviar(SimpleUploadedFile("a.jpg", JPEG, content_type="text/html"))
+        self.assertEqual(json.loads(respuesta.content), {"tipos": ["image/jpeg"]})
+
+    def test_rechazos(self):
+        casos = [
+            ([SimpleUploadedFile("a.jpg", JPEG + b"\x00" * 100)], 413, "excede"),
+            ([SimpleUploadedFile(f"{n}.jpg", JPEG) for n in "abc"], 400, "Solo se permiten 2"),
+            ([SimpleUploadedFile("a.exe", b"MZ\x90\x00")], 400, "no tiene un formato permitido"),
+            ([SimpleUploadedFile("a.jpg", b"\x89PNG\r\n\x1a\n" + b"\x00" * 24)], 400, "no corresponde a su formato"),
+        ]
+        for archivos, status, mensaje in casos:
+            with self.subTest(mensaje):
+                codigo, texto = self.rechazo(self.enviar(*archivos))
+                self.assertEqual(codigo, status)
+                self.assertIn(mensaje, texto)
+
+    def test_content_length_excesivo_se_rechaza_sin_leer_el_cuerpo(self):
+        request = RequestFactory().post("/", {"archivo": SimpleUploadedFile("a.jpg", JPEG)}, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        request.META["CONTENT_LENGTH"] = str(50 * 1024 * 1024)
+        request._stream = mock.Mock(read=mock.Mock(side_effect=AssertionError("se leyó el cuerpo")))
+        self.assertEqual(vista_con_archivos(request).status_code, 413)
+
+    def test_envio_aceptado_sigue_exigiendo_csrf(self):
+        self.assertEqual(self.enviar(SimpleUploadedFile("a.jpg", JPEG), csrf=True).status_code, 403)
+
+    def test_formulario_del_libro_rechaza_ejecutables_sin_crear_registro(self):
+        usuario = User.objects.create_user("supervisor", password="x")
+        self.client.force_login(usuario)
+        url = reverse("registro_libro_create")
+        respuesta = self.client.post(url, {"obra": crear_obra().pk, "archivos[]": SimpleUploadedFile("virus.exe", b"MZ\x90\x00")})
+        self.assertRedirects(respuesta, url, fetch_redirect_response=False)
+        self.assertIn("no tiene un formato permitido", str(list(get_messages(respuesta.wsgi_request))[0]))
+        self.assertFalse(RegistroLibroObra.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ArchivoContenidoTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("supervisor", password="x")
+        cls.registro = RegistroLibroObra.objects.create(
+            obra=crear_obra(), fecha=datetime.date(2025, 3, 3), supervisor=cls.usuario,
+        )
+
+    def subir(self, contenido):
+        with self.captureOnCommitCallbacks(execute=True):
+            return FotografiaRegistro.objects.create(registro=self.registro, archivo=ContentFile(contenido, name="plano.pdf"))
+
+    def borrar(self, objeto):
+        with self.captureOnCommitCallbacks(execute=True):
+            objeto.delete()
+
+    def existe(self, nombre):
+        return os.path.exists(media_storage().path(nombre))
+
+    def test_mismo_contenido_se_guarda_una_vez(self):
+        primera, segunda = self.subir(b"plano"), self.subir(b"plano")
+        self.assertEqual(primera.archivo.name, segunda.archivo.name)
+        self.assertEqual(ArchivoContenido.objects.get().referencias, 2)
+
+        self.borrar(primera)
+        self.assertTrue(self.existe(segunda.archivo.name))
+        self.assertEqual(ArchivoContenido.objects.get().referencias, 1)
+
+        self.borrar(segunda)
+        self.assertFalse(self.existe(segunda.archivo.name))
+        self.assertFalse(ArchivoContenido.objects.exists())
+
+    def test_volver_a_subir_un_contenido_recien_liberado(self):
+        nombre = self.subir(b"acta").archivo.name
+        self.borrar(FotografiaRegistro.objects.get())
+        self.assertFalse(self.existe(nombre))
+        self.subir(b"acta")
+        self.assertTrue(self.existe(nombre))
+        self.assertEqual(ArchivoContenido.objects.get().referencias, 1)
+
+    @override_settings(THUMBNAIL_SYNC=True)
+    def test_visor_entrega_webp_a_quien_lo_acepta(self):
+        caches["derivados"].clear()
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8), "red").save(buffer, "JPEG")
+        with self.captureOnCommitCallbacks(execute=True):
+            FotografiaRegistro.objects.create(registro=self.registro, archivo=ContentFile(buffer.getvalue(), name="losa.jpg"))
+        self.client.force_login(self.usuario)
+        url = reverse("registro_libro_fotos", args=[self.registro.pk])
+        self.assertTrue(self.client.get(url).json()["fotos"][0]["url"].endswith("_medium.jpg"))
+        respuesta = self.client.get(url, HTTP_ACCEPT="application/json, image/webp")
+        self.assertTrue(respuesta.json()["fotos"][0]["url"].endswith("_webp.webp"))
+        self.assertIn("Accept", respuesta["Vary"])
+
+
+@override_settings(LIBRO_PDF_SYNC=True, LIBRO_PDF_WORKERS=1, MEDIA_ROOT=tempfile.mkdtemp())
+class LibroPdfTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("supervisor", password="x")
+        cls.obra = crear_obra()
+        cls.registros = [
+            RegistroLibroObra.objects.create(
+                obra=cls.obra, fecha=datetime.date(2025, 3, dia), supervisor=cls.usuario, observaciones=f"Día {dia}",
+            )
+            for dia in range(1, 6)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        # Caché de páginas vacío en cada test: los registros de setUpTestData no cambian entre tests
+        self.enterContext(self.settings(LIBRO_PDF_CACHE_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+
+    def solicitar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            estado_url = self.client.post(reverse("libro_pdf_solicitar", args=[self.obra.pk])).json()["estado_url"]
+        return self.client.get(estado_url).json()
+
+    def test_reutiliza_las_paginas_de_registros_sin_cambios(self):
+        primero = self.solicitar()
+        self.assertEqual((primero["estado"], primero["registros"], primero["reutilizados"]), (ESTADO_LIBRO_COMPLETO, 5, 0))
+        self.assertEqual(self.solicitar()["reutilizados"], 5)
+
+        registro = self.registros[2]
+        registro.observaciones = "Día 3, corregido"
+        registro.save()
+        self.assertEqual(self.solicitar()["reutilizados"], 4)
+
+    def test_comando_reencola_libros_interrumpidos(self):
+        colgado = LibroObraPdf.objects.create(obra=self.obra, estado=ESTADO_LIBRO_PROCESANDO)
+        en_curso = LibroObraPdf.objects.create(obra=self.obra, estado=ESTADO_LIBRO_PROCESANDO)
+        LibroObraPdf.objects.filter(pk=colgado.pk).update(fecha_modificacion=timezone.now() - datetime.timedelta(hours=2))
+
+        call_command("generar_libros_pdf", stdout=open(os.devnull, "w"))
+        self.assertEqual(LibroObraPdf.objects.get(pk=colgado.pk).estado, ESTADO_LIBRO_COMPLETO)
+        self.assertEqual(LibroObraPdf.objects.get(pk=en_curso.pk).estado, ESTADO_LIBRO_PROCESANDO)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), CHUNKED_UPLOAD_DIR=tempfile.mkdtemp())
+class SubidaFragmentadaTest(TestCase):
+    VIDEO = b"0123456789" * 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("supervisor", password="x")
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def iniciar(self):
+        respuesta = self.client.post(
+            reverse("subida_iniciar"), {"nombre": "avance.mp4", "tamano": len(self.VIDEO),
+                                        "sha256": hashlib.sha256(self.VIDEO).hexdigest()},
+            content_type="application/json",
+        )
+        return respuesta.json()["id"]
+
+    def fragmento(self, pk, offset, datos, **cabeceras):
+        return self.client.post(
+            reverse("subida_fragmento", args=[pk]), datos, content_type="application/octet-stream",
+            HTTP_X_UPLOAD_OFFSET=str(offset), **cabeceras,
+        )
+
+    def test_subida_reanudable_hasta_finalizar(self):
+        pk = self.iniciar()
+        self.assertEqual(self.fragmento(pk, 0, self.VIDEO[:60]).json()["recibido"], 60)
+        # Reintento de un tramo ya recibido: 409 con el offset para continuar
+        repetido = self.fragmento(pk, 0, self.VIDEO[:60])
+        self.assertEqual((repetido.status_code, repetido.json()["recibido"]), (409, 60))
+        corrupto = self.fragmento(pk, 60, self.VIDEO[60:], HTTP_X_CHUNK_SHA256="0" * 64)
+        self.assertEqual(corrupto.status_code, 400)
+        self.assertEqual(SubidaFragmentada.objects.get(pk=pk).recibido, 60)
+
+        self.assertEqual(self.fragmento(pk, 60, self.VIDEO[60:]).json()["recibido"], 100)
+        # Los temporales de cada fragmento no quedan en disco
+        self.assertEqual([n for n in os.listdir(settings.CHUNKED_UPLOAD_DIR) if n.startswith(pk)], [f"{pk}.part"])
+        finalizada = self.client.post(reverse("subida_finalizar", args=[pk]))
+        self.assertEqual(finalizada.json()["estado"], ESTADO_SUBIDA_COMPLETA)
+        with SubidaFragmentada.objects.get(pk=pk).archivo.open("rb") as fh:
+            self.assertEqual(fh.read(), self.VIDEO)
+
+    def test_limpiar_libera_completas_nunca_adjuntadas(self):
+        pk = self.iniciar()
+        self.fragmento(pk, 0, self.VIDEO)
+        self.client.post(reverse("subida_finalizar", args=[pk]))
+        nombre = SubidaFragmentada.objects.get(pk=pk).archivo.name
+        SubidaFragmentada.objects.filter(pk=pk).update(fecha_modificacion=timezone.now() - datetime.timedelta(days=3))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("limpiar_subidas", stdout=open(os.devnull, "w"))
+        self.assertFalse(SubidaFragmentada.objects.exists())
+        self.assertFalse(os.path.exists(media_storage().path(nombre)))
@@ -0,0 +1,170 @@
+"""
+Subida reanudable por fragmentos para videos del libro de obras.
+
+Protocolo:
+    1. init      -> crea la sesión (nombre, tamaño, sha256 opcional)
+    2. append    -> escribe un fragmento en el offset indicado
+    3. finalize  -> verifica tamaño y checksum y mueve el archivo al storage
+
+Cada fragmento se lee a un temporal en disco y, ya verificado, se copia al
+archivo parcial bajo el bloqueo de la sesión; nunca se arma el archivo
+completo en memoria. Si la conexión se corta, el cliente consulta
+``recibido`` y continúa desde ese offset.
+"""
+import hashlib
+import os
+import shutil
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+
+from core.choices import ESTADO_SUBIDA_COMPLETA, ESTADO_SUBIDA_PENDIENTE
+from .models import SubidaFragmentada
+
+FRAGMENTO_LECTURA = 64 * 1024
+
+
+class ArchivoEnDisco(File):
+    """File con ruta temporal: FileSystemStorage lo mueve en vez de copiarlo."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def ruta_parcial(subida):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f"{subida.pk}.part")
+
+
+def iniciar_subida(usuario, nombre, tamano, tipo_contenido="", sha256=""):
+    nombre = os.path.basename(nombre or "").strip()
+    extension = os.path.splitext(nombre)[1].lower()
+    if not nombre or extension not in settings.CHUNKED_UPLOAD_EXTENSIONS:
+        raise ValidationError("Formato de archivo no permitido.")
+    try:
+        tamano = int(tamano)
+    except (TypeError, ValueError):
+        raise ValidationError("Tamaño de archivo inválido.")
+    if tamano <= 0 or tamano > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        limite = settings.CHUNKED_UPLOAD_MAX_SIZE // (1024 * 1024)
+        raise ValidationError(f"El archivo debe pesar entre 1 byte y {limite}MB.")
+    sha256 = (sha256 or "").strip().lower()
+    if sha256 and (len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256)):
+        raise ValidationError("Checksum SHA-256 inválido.")
+
+    subida = SubidaFragmentada.objects.create(
+        usuario=usuario,
+        nombre=nombre,
+        tamano=tamano,
+        tipo_contenido=(tipo_contenido or "")[:100],
+        sha256=sha256,
+    )
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(ruta_parcial(subida), "wb").close()
+    return subida
+
+
+def _validar_fragmento(subida, offset, longitud):
+    if subida.estado != ESTADO_SUBIDA_PENDIENTE:
+        raise ValidationError("La subida ya fue finalizada.")
+    if offset + longitud > subida.tamano:
+        raise ValidationError("El fragmento excede el tamaño declarado.")
+
+
+def agregar_fragmento(subida_id, usuario, offset, stream, longitud, sha256_fragmento=""):
+    """
+    Escribe ``longitud`` bytes de ``stream`` en ``offset``.
+
+    Si el offset no coincide con lo ya recibido se devuelve la sesión sin
+    escribir para que el cliente reanude desde ``recibido``.
+    """
+    if longitud <= 0 or longitud > settings.CHUNKED_UPLOAD_CHUNK_MAX:
+        raise ValidationError("Tamaño de fragmento inválido.")
+
+    subida = SubidaFragmentada.objects.get(pk=subida_id, usuario=usuario)
+    _validar_fragmento(subida, offset, longitud)
+    if offset != subida.recibido:
+        return subida, False
+
+    # El cuerpo se lee a un temporal sin bloqueo: un cliente lento no retiene la fila
+    temporal = f"{ruta_parcial(subida)}.{uuid.uuid4().hex}"
+    try:
+        digest = hashlib.sha256()
+        escritos = 0
+        with open(temporal, "wb") as destino:
+            while escritos < longitud:
+                bloque = stream.read(min(FRAGMENTO_LECTURA, longitud - escritos))
+                if not bloque:
+                    break
+                destino.write(bloque)
+                digest.update(bloque)
+                escritos += len(bloque)
+        if escritos != longitud or (sha256_fragmento and digest.hexdigest() != sha256_fragmento.lower()):
+            raise ValidationError("El fragmento llegó incompleto o con checksum distinto.")
+
+        with transaction.atomic():
+            # El bloqueo evita que dos fragmentos concurrentes escriban el mismo tramo
+            subida = SubidaFragmentada.objects.select_for_update().get(pk=subida_id, usuario=usuario)
+            _validar_fragmento(subida, offset, longitud)
+            if offset != subida.recibido:
+                return subida, False
+            with open(temporal, "rb") as origen, open(ruta_parcial(subida), "r+b") as destino:
+                destino.seek(offset)
+                shutil.copyfileobj(origen, destino, FRAGMENTO_LECTURA)
+                destino.truncate()
+            subida.recibido = offset + escritos
+            subida.save(update_fields=["recibido", "fecha_modificacion"])
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return subida, True
+
+
+def finalizar_subida(subida_id, usuario):
+    """Verifica el archivo ensamblado y lo guarda en el storage de medios."""
+    with transaction.atomic():
+        subida = SubidaFragmentada.objects.select_for_update().get(pk=subida_id, usuario=usuario)
+        if subida.estado != ESTADO_SUBIDA_PENDIENTE:
+            return subida
+        if subida.recibido != subida.tamano:
+            raise ValidationError("Faltan fragmentos por subir.")
+
+        ruta = ruta_parcial(subida)
+        digest = hashlib.sha256()
+        with open(ruta, "rb") as fh:
+            for bloque in iter(lambda: fh.read(1024 * 1024), b""):
+                digest.update(bloque)
+        checksum = digest.hexdigest()
+        if subida.sha256 and checksum != subida.sha256:
+            raise ValidationError("El checksum del archivo no coincide.")
+
+        with open(ruta, "rb") as fh:
+            archivo = ArchivoEnDisco(fh, name=ruta)
+            archivo.sha256 = checksum  # el storage no vuelve a leer el archivo
+            subida.archivo.save(subida.nombre, archivo, save=False)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        subida.sha256 = checksum
+        subida.estado = ESTADO_SUBIDA_COMPLETA
+        subida.save(update_fields=["archivo", "sha256", "estado", "fecha_modificacion"])
+    return subida
+
+
+def descartar_subida(subida):
+    ruta = ruta_parcial(subida)
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    subida.delete()
+
+
+def estado_subida(subida):
+    return {
+        "id": str(subida.pk),
+        "nombre": subida.nombre,
+        "tamano": subida.tamano,
+        "recibido": subida.recibido,
+        "estado": subida.estado,
+        "fragmento_max": settings.CHUNKED_UPLOAD_CHUNK_MAX,
+    }
@@ -8,11 +8,27 @@ urlpatterns = [
     path('obras/editar/<int:pk>/', views.obra_update, name='obra_update'),
     path('obras/eliminar/<int:pk>/', views.obra_delete, name='obra_delete'),
     path('obras/toggle/<int:pk>/', views.obra_toggle_estado, name='obra_toggle_estado'),
+    path('obras/autocompletar/', views.obra_autocompletar, name='obra_autocompletar'),
+    path('obras/<int:pk>/horas/', views.obra_horas_data, name='obra_horas_data'),
+    path('obras/<int:pk>/libro-pdf/', views.libro_pdf_solicitar, name='libro_pdf_solicitar'),
+    path('obras/libro-pdf/<int:pk>/', views.libro_pdf_estado, name='libro_pdf_estado'),
+    path('obras/libro-pdf/<int:pk>/descargar/', views.libro_pdf_descargar, name='libro_pdf_descargar'),
 
     # Libro de Obras
     path('libro-obras/', views.registro_libro_list, name='registro_libro_list'),
+    path('libro-obras/trabajadores/autocompletar/', views.trabajador_autocompletar, name='trabajador_autocompletar'),
+    path('libro-obras/datos/', views.registro_libro_data, name='registro_libro_data'),
+    path('libro-obras/buscar/', views.registro_libro_buscar, name='registro_libro_buscar'),
+    path('libro-obras/horas/exportar/', views.horas_export, name='horas_export'),
+    path('libro-obras/<int:pk>/fotografias/', views.registro_libro_fotos, name='registro_libro_fotos'),
     path('libro-obras/crear/', views.registro_libro_create, name='registro_libro_create'),
     path('libro-obras/editar/<int:pk>/', views.registro_libro_update, name='registro_libro_update'),
     path('libro-obras/eliminar/<int:pk>/', views.registro_libro_delete, name='registro_libro_delete'),
     path('libro-obras/fotografia/eliminar/<int:pk>/', views.fotografia_delete, name='fotografia_delete'),
+
+    # Subida fragmentada de videos
+    path('libro-obras/subidas/', views.subida_iniciar, name='subida_iniciar'),
+    path('libro-obras/subidas/<uuid:pk>/', views.subida_estado, name='subida_estado'),
+    path('libro-obras/subidas/<uuid:pk>/fragmento/', views.subida_fragmento, name='subida_fragmento'),
+    path('libro-obras/subidas/<uuid:pk>/finalizar/', views.subida_finalizar, name='subida_finalizar'),
 ]
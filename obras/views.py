@@ -2,17 +2,39 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse
 from django.db import transaction
 from django.core.exceptions import ValidationError
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
+from django.urls import reverse
 from decimal import Decimal, InvalidOperation
-from django.db.models import Q, ProtectedError, Prefetch
+from django.db.models import Q, ProtectedError, OuterRef, Subquery
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from asgiref.sync import sync_to_async
 import json
-from core.models import Pais, Ciudad, Estado
+from core import catalogs
+from core.asincrono import login_requerido, obtener_o_404, solo_metodos
+from core.autocomplete import aresponder, ids_excluidos, termino
+from core.choices import ESTADO_LIBRO_COMPLETO
 from obras.models import ( Obra, RegistroLibroObra, TareaRealizada, TrabajadorRegistro, FotografiaRegistro)
+from core.pagination import CursorInvalido, KeysetPaginator
+from core.thumbnails import accepts_webp, derivative_url, existing_derivatives
+from core.uploadhandlers import limitar_subidas
 from .forms import ObraForm, RegistroLibroObraForm
+from .services import (
+    MAX_HORAS_TOTAL,
+    actualizar_registro,
+    crear_registro,
+    leer_datos_registro,
+    obtener_subidas,
+)
+from .libro_pdf import programar_libro
+from .models import LibroObraPdf, SubidaFragmentada
+from .busqueda import buscar, documentos_coincidentes, fragmento, terminos
+from .exports import filas_planilla, respuesta_csv, respuesta_xlsx
+from .rollups import horas_por_mes, horas_por_trabajador
+from .uploads import agregar_fragmento, estado_subida, finalizar_subida, iniciar_subida
 import datetime
 import os
 import logging
@@ -21,7 +43,10 @@ logger = logging.getLogger(__name__)
 MAX_ARCHIVOS_POR_REGISTRO = 20
 MAX_FILE_SIZE = 10 * 1024 * 1024
 EXTENSIONES_PERMITIDAS = {'.jpg', '.jpeg', '.png', '.gif', '.mp4', '.mov', '.avi', '.mkv', '.webp'}
-MAX_HORAS_TOTAL = Decimal("12.0")
+REGISTROS_POR_PAGINA = 25
+REGISTROS_MAX_POR_PAGINA = 100
+# Orden estable del libro: el índice (obra, fecha) resuelve el filtro por obra
+REGISTRO_KEYSET = ('fecha', 'fecha_creacion', 'id')
 
 # VISTAS OBRA
 @login_required
@@ -42,8 +67,8 @@ def obra_list(request):
 def obra_create(request):
     """Crear obra."""
     form = ObraForm(request.POST or None)
-    ciudades = Ciudad.objects.filter(estado=True).select_related('pais').order_by('nombre')
-    estados = Estado.objects.filter(estado=True).order_by('nombre')
+    ciudades = catalogs.ciudades()
+    estados = catalogs.estados()
 
     if request.method == 'POST':
         if form.is_valid():
@@ -59,10 +84,10 @@ def obra_create(request):
             if 'codigo' not in form.errors:
                 messages.error(request, 'Revisa los errores del formulario.')
 
-    if not ciudades.exists():
+    if not ciudades:
         messages.warning(request, 'No hay ciudades activas. Debe crear al menos una ciudad antes de crear una obra.')
 
-    if not estados.exists():
+    if not estados:
         messages.warning(request, 'No hay estados activos. Debe crear al menos un estado antes de crear una obra.')
 
     context = {
@@ -81,8 +106,8 @@ def obra_update(request, pk):
     obra = get_object_or_404(Obra, pk=pk)
     form = ObraForm(request.POST or None, instance=obra)
     original_estado = obra.estado
-    ciudades = Ciudad.objects.filter(estado=True).select_related('pais').order_by('nombre')
-    estados = Estado.objects.filter(estado=True).order_by('nombre')
+    ciudades = catalogs.ciudades()
+    estados = catalogs.estados()
     context = {
         'obra': obra,
         'form': form,
@@ -114,10 +139,10 @@ def obra_update(request, pk):
             if 'codigo' not in form.errors:
                 messages.error(request, 'Revisa los errores del formulario.')
 
-    if not ciudades.exists():
+    if not ciudades:
         messages.warning(request, 'No hay ciudades activas disponibles.')
 
-    if not estados.exists():
+    if not estados:
         messages.warning(request, 'No hay estados activos disponibles.')
 
     try:
@@ -187,254 +212,376 @@ def obra_toggle_estado(request, pk):
     
     return JsonResponse({'success': False, 'message': 'Método no permitido.'}, status=405)
 
-# VISTAS LIBRO DE OBRAS
 @login_required
-def registro_libro_list(request):
-    """Listar registros del libro de obras."""
-    registros = list(
-        RegistroLibroObra.objects
-        .select_related('obra', 'supervisor')
-        .prefetch_related(
-            'tareas',
-            'trabajadores__trabajador',
-            Prefetch('fotografias', queryset=FotografiaRegistro.objects.order_by('orden'))
-        )
-        .all()
-    )
+@require_POST
+def libro_pdf_solicitar(request, pk):
+    """Encola la generación del libro de obra en PDF (?desde/?hasta opcionales)."""
+    obra = get_object_or_404(Obra.objects.only('id'), pk=pk)
+    try:
+        desde = datetime.date.fromisoformat(request.POST['desde']) if request.POST.get('desde') else None
+        hasta = datetime.date.fromisoformat(request.POST['hasta']) if request.POST.get('hasta') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Las fechas no son válidas.'}, status=400)
+    if desde and hasta and desde > hasta:
+        return JsonResponse({'success': False, 'message': 'La fecha desde no puede ser posterior a la fecha hasta.'}, status=400)
+
+    with transaction.atomic():
+        libro = LibroObraPdf.objects.create(obra=obra, desde=desde, hasta=hasta, solicitado_por=request.user)
+        programar_libro(libro)
+    return JsonResponse({
+        'success': True,
+        'message': 'El libro se está generando.',
+        'estado_url': reverse('libro_pdf_estado', args=[libro.pk]),
+    })
 
-    for registro in registros:
-        fotos = []
+@login_requerido
+@solo_metodos('GET')
+async def libro_pdf_estado(request, pk):
+    """Estado de una solicitud de libro PDF."""
+    libro = await obtener_o_404(LibroObraPdf, pk=pk)
+    return JsonResponse({
+        'estado': libro.estado,
+        'mensaje': libro.mensaje,
+        'registros': libro.registros,
+        'reutilizados': libro.paginas_reutilizadas,
+        'descargar_url': reverse('libro_pdf_descargar', args=[libro.pk]) if libro.estado == ESTADO_LIBRO_COMPLETO else None,
+    })
 
-        # Incluimos la foto principal (campo fotografia) si existe
-        if getattr(registro, "fotografia", None):
-            try:
-                fotos.append({
-                    "url": registro.fotografia.url,
-                    "name": registro.fotografia.name or "",
-                })
-            except Exception:
-                pass
+@login_requerido
+@solo_metodos('GET')
+async def libro_pdf_descargar(request, pk):
+    libro = await obtener_o_404(LibroObraPdf, pk=pk, estado=ESTADO_LIBRO_COMPLETO)
+    archivo = await sync_to_async(libro.archivo.open)('rb')
+    return FileResponse(archivo, as_attachment=True, filename=os.path.basename(libro.archivo.name))
 
-        # Incluimos todas las fotografías/vídeos asociados (ordenadas)
-        for foto in registro.fotografias.all():
-            if not foto.archivo:
-                continue
-            try:
-                fotos.append({
-                    "url": foto.archivo.url,
-                    "name": foto.archivo.name or "",
-                })
-            except Exception:
-                continue
+@login_required
+@require_GET
+def obra_horas_data(request, pk):
+    """Horas y horas extra de la obra por mes; con ?mes=AAAA-MM, desglose por trabajador."""
+    obra = get_object_or_404(Obra.objects.only('id', 'nombre'), pk=pk)
+    meses = [
+        {
+            'mes': total.mes.strftime('%Y-%m'),
+            'horas': float(total.horas_trabajadas),
+            'horas_extras': float(total.horas_extras),
+            'jornadas': total.jornadas,
+            'trabajadores': total.trabajadores,
+        }
+        for total in horas_por_mes(obra.pk)
+    ]
+    respuesta = {'obra': obra.nombre, 'meses': meses}
 
-        registro.photos_data = fotos
-        registro.photos_data_json = json.dumps(fotos, ensure_ascii=False)
+    mes_str = request.GET.get('mes')
+    if mes_str:
+        try:
+            mes = datetime.datetime.strptime(mes_str, '%Y-%m').date()
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Mes inválido.'}, status=400)
+        fin = (mes + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+        respuesta['trabajadores'] = [
+            {
+                'id': fila['trabajador_id'],
+                'nombre': f"{fila['trabajador__first_name']} {fila['trabajador__last_name']}".strip()
+                          or fila['trabajador__username'],
+                'horas': float(fila['horas']),
+                'horas_extras': float(fila['extras']),
+                'dias': fila['dias'],
+            }
+            for fila in horas_por_trabajador(obra.pk, mes, fin)
+        ]
+    return JsonResponse(respuesta)
+
+@login_requerido
+@solo_metodos('GET')
+async def obra_autocompletar(request):
+    """Obras cuyo código o nombre empieza con ?q (?activas=1 solo las activas), con sus fechas."""
+    q = termino(request)
+    obras = Obra.objects.all()
+    if request.GET.get('activas') == '1':
+        obras = obras.filter(estado=True)
+    if q:
+        obras = obras.filter(Q(codigo__istartswith=q) | Q(nombre__istartswith=q))
+    obras = obras.order_by('codigo').values('id', 'codigo', 'nombre', 'fecha_inicio', 'fecha_fin_estimada')
+    # El formulario del libro valida la fecha del registro contra el rango de la obra elegida
+    return await aresponder(
+        request, obras, lambda o: f"{o['codigo']} - {o['nombre']}",
+        lambda o: {'inicio': o['fecha_inicio'].isoformat(), 'fin': o['fecha_fin_estimada'].isoformat()},
+    )
+
+# VISTAS LIBRO DE OBRAS
+@login_requerido
+@solo_metodos('GET')
+async def trabajador_autocompletar(request):
+    """Usuarios activos (sin el supervisor) cuyo nombre, apellido o usuario empieza con ?q; ?excluir=1,2 omite ids."""
+    usuarios = User.objects.filter(is_active=True).exclude(id__in=[request.user.id] + ids_excluidos(request))
+    # Cada palabra debe ser prefijo de alguno de los campos: "ana pe" encuentra a Ana Pérez
+    for palabra in termino(request).split():
+        usuarios = usuarios.filter(
+            Q(first_name__istartswith=palabra) | Q(last_name__istartswith=palabra) | Q(username__istartswith=palabra)
+        )
+    usuarios = usuarios.order_by('first_name', 'last_name', 'username').values('id', 'first_name', 'last_name', 'username')
+    return await aresponder(request, usuarios, lambda u: f"{u['first_name']} {u['last_name']}".strip() or u['username'])
 
+@login_required
+def registro_libro_list(request):
+    """Listar registros del libro de obras (las filas llegan por registro_libro_data)."""
+    # El filtro de obra usa obra_autocompletar: la página no lista todas las obras
     context = {
-        'registros': registros,
         'title': 'Registros Libro de Obras'
     }
     return render(request, 'obras/registro_libro_list.html', context)
 
+def _filtrar_registros(request, queryset):
+    """Aplica los filtros de obra, supervisor, rango de fechas y búsqueda."""
+    obra_id = request.GET.get('obra', '').strip()
+    if obra_id.isdigit():
+        queryset = queryset.filter(obra_id=obra_id)
+
+    supervisor_id = request.GET.get('supervisor', '').strip()
+    if supervisor_id.isdigit():
+        queryset = queryset.filter(supervisor_id=supervisor_id)
+
+    for param, lookup in (('desde', 'fecha__gte'), ('hasta', 'fecha__lte')):
+        valor = request.GET.get(param, '').strip()
+        if valor:
+            try:
+                queryset = queryset.filter(**{lookup: datetime.date.fromisoformat(valor)})
+            except ValueError:
+                raise ValidationError(f'Fecha inválida en "{param}".')
+
+    busqueda = (request.GET.get('q') or request.GET.get('search[value]') or '').strip()
+    if busqueda:
+        queryset = queryset.filter(
+            Q(obra__nombre__icontains=busqueda)
+            | Q(obra__codigo__icontains=busqueda)
+            | Q(supervisor__username__icontains=busqueda)
+            | Q(supervisor__first_name__icontains=busqueda)
+            | Q(supervisor__last_name__icontains=busqueda)
+            | Q(id__in=documentos_coincidentes(busqueda).values('registro_id'))
+        )
+    return queryset
+
+@login_required
+@require_GET
+def registro_libro_buscar(request):
+    """Búsqueda de texto completo en observaciones y tareas (?q, ?obra, ?desde, ?hasta)."""
+    texto = (request.GET.get('q') or '').strip()
+    if not terminos(texto):
+        return JsonResponse({'success': False, 'message': 'Ingresa al menos una palabra para buscar.'}, status=400)
+    try:
+        desde = datetime.date.fromisoformat(request.GET['desde']) if request.GET.get('desde') else None
+        hasta = datetime.date.fromisoformat(request.GET['hasta']) if request.GET.get('hasta') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Las fechas no son válidas.'}, status=400)
+    obra_id = request.GET.get('obra', '').strip()
+    try:
+        limite = max(1, min(int(request.GET.get('limite', 25)), REGISTROS_MAX_POR_PAGINA))
+    except ValueError:
+        limite = 25
+
+    resultados = [
+        {
+            'id': doc.registro_id,
+            'obra': f'{doc.obra_codigo} - {doc.obra_nombre}',
+            'fecha': doc.fecha.isoformat(),
+            'supervisor': f'{doc.supervisor_nombre} {doc.supervisor_apellido}'.strip() or doc.supervisor_usuario,
+            'fragmento': fragmento(doc.contenido, texto),
+            'relevancia': doc.relevancia,
+            'editar_url': reverse('registro_libro_update', args=[doc.registro_id]),
+        }
+        for doc in buscar(texto, obra_id if obra_id.isdigit() else None, desde, hasta, limite)
+    ]
+    return JsonResponse({'success': True, 'resultados': resultados})
+
 @login_required
+@require_GET
+def registro_libro_data(request):
+    """Feed JSON para DataTables en modo server-side, paginado por cursor."""
+    try:
+        length = int(request.GET.get('length', REGISTROS_POR_PAGINA))
+    except (TypeError, ValueError):
+        length = REGISTROS_POR_PAGINA
+    length = max(1, min(length, REGISTROS_MAX_POR_PAGINA))
+
+    try:
+        registros = _filtrar_registros(request, RegistroLibroObra.objects.all())
+    except ValidationError as e:
+        return JsonResponse({'error': e.messages[0]}, status=400)
+
+    cursor = request.GET.get('cursor') or None
+    # El total solo se calcula en la primera página; el cliente lo conserva
+    total = None if cursor else registros.count()
+
+    primera_foto = (
+        FotografiaRegistro.objects
+        .filter(registro=OuterRef('pk'))
+        .order_by('orden', 'fecha_subida')
+        .values('archivo')[:1]
+    )
+    registros = registros.annotate(primer_archivo=Subquery(primera_foto))
+    paginator = KeysetPaginator(registros, REGISTRO_KEYSET, length)
+    try:
+        filas, next_cursor = paginator.page(cursor, fields=(
+            'obra__nombre',
+            'supervisor__username',
+            'supervisor__first_name',
+            'supervisor__last_name',
+            'fotografia',
+            'primer_archivo',
+        ))
+    except CursorInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    storage_principal = RegistroLibroObra._meta.get_field('fotografia').storage
+    storage_archivos = FotografiaRegistro._meta.get_field('archivo').storage
+    existentes = existing_derivatives(f['fotografia'] or f['primer_archivo'] for f in filas)
+    data = []
+    for fila in filas:
+        nombre_supervisor = f"{fila['supervisor__first_name']} {fila['supervisor__last_name']}".strip()
+        foto = None
+        if fila['fotografia']:
+            foto = {'url': derivative_url(fila['fotografia'], 'thumb', storage_principal, existentes), 'name': fila['fotografia']}
+        elif fila['primer_archivo']:
+            foto = {'url': derivative_url(fila['primer_archivo'], 'thumb', storage_archivos, existentes), 'name': fila['primer_archivo']}
+        data.append({
+            'id': fila['id'],
+            'supervisor': nombre_supervisor or fila['supervisor__username'],
+            'obra': fila['obra__nombre'],
+            'fecha': fila['fecha'].isoformat(),
+            'fecha_display': fila['fecha'].strftime('%d/%m/%Y'),
+            'foto': foto,
+            'fotos_url': reverse('registro_libro_fotos', args=[fila['id']]) if foto else None,
+            'editar_url': reverse('registro_libro_update', args=[fila['id']]),
+        })
+
+    return JsonResponse({
+        'draw': request.GET.get('draw'),
+        'recordsTotal': total,
+        'recordsFiltered': total,
+        'next_cursor': next_cursor,
+        'data': data,
+    })
+
+@login_required
+@require_GET
+def horas_export(request):
+    """Planilla de horas por trabajador en un período (?desde, ?hasta, ?obra, ?formato=csv|xlsx, ?resumen=1)."""
+    try:
+        desde = datetime.date.fromisoformat(request.GET.get('desde', ''))
+        hasta = datetime.date.fromisoformat(request.GET.get('hasta', ''))
+    except ValueError:
+        messages.error(request, 'Indica un período válido (desde y hasta) para exportar las horas.')
+        return redirect('registro_libro_list')
+    if desde > hasta:
+        messages.error(request, 'La fecha desde no puede ser posterior a la fecha hasta.')
+        return redirect('registro_libro_list')
+
+    obra_id = request.GET.get('obra') or None
+    if obra_id and not obra_id.isdigit():
+        obra_id = None
+    detalle = request.GET.get('resumen') != '1'
+    filas = filas_planilla(desde, hasta, obra_id, detalle)
+    nombre = f"horas_{desde:%Y%m%d}_{hasta:%Y%m%d}"
+    if request.GET.get('formato') == 'xlsx':
+        return respuesta_xlsx(filas, f"{nombre}.xlsx")
+    return respuesta_csv(filas, f"{nombre}.csv")
+
+def _urls_fotos(archivos, variante):
+    # La caché (y el storage, si no conoce el archivo) se consultan en un hilo desde la vista async
+    existentes = existing_derivatives(archivo.name for archivo in archivos)
+    return [
+        {
+            'url': derivative_url(archivo.name, variante, archivo.storage, existentes),
+            'original_url': archivo.url,
+            'name': archivo.name or '',
+        }
+        for archivo in archivos
+    ]
+
+@login_requerido
+@solo_metodos('GET')
+async def registro_libro_fotos(request, pk):
+    """Lista de fotografías/videos de un registro, para el visor de la tabla."""
+    registro = await obtener_o_404(RegistroLibroObra.objects.only('id', 'fotografia'), pk=pk)
+    archivos = [registro.fotografia] if registro.fotografia else []
+    archivos += [
+        foto.archivo
+        async for foto in registro.fotografias.order_by('orden', 'fecha_subida').only('archivo', 'registro_id')
+        if foto.archivo
+    ]
+    # El visor muestra la variante WebP a los clientes que la aceptan
+    variante = 'webp' if accepts_webp(request) else 'medium'
+    respuesta = JsonResponse({'fotos': await sync_to_async(_urls_fotos)(archivos, variante)})
+    patch_vary_headers(respuesta, ['Accept'])
+    return respuesta
+
+@login_required
+@limitar_subidas(MAX_ARCHIVOS_POR_REGISTRO, MAX_FILE_SIZE, EXTENSIONES_PERMITIDAS)
 def registro_libro_create(request):
     """Crear registro del libro de obras."""
     if request.method == 'POST':
         try:
-            obra_id = request.POST.get('obra')
-            fecha = request.POST.get('fecha')
-            observaciones = request.POST.get('observaciones', '')
-            
-            registro = RegistroLibroObra.objects.create(
-                obra_id=obra_id,
-                fecha=fecha,
-                supervisor=request.user,
-                observaciones=observaciones,
-                creado_por=request.user
+            datos = leer_datos_registro(request.POST, request.user)
+            subidas = obtener_subidas(request.POST, request.user)
+            crear_registro(
+                datos,
+                request.user,
+                fotografia=request.FILES.get('fotografia'),
+                archivos=request.FILES.getlist('archivos[]'),
+                subidas=subidas,
             )
-            
-            if 'fotografia' in request.FILES:
-                registro.fotografia = request.FILES['fotografia']
-                registro.save()
-            
-            archivos = request.FILES.getlist('archivos[]')
-            for i, archivo in enumerate(archivos):
-                tipo = 'video' if archivo.content_type.startswith('video/') else 'imagen'
-                FotografiaRegistro.objects.create(
-                    registro=registro,
-                    archivo=archivo,
-                    tipo=tipo,
-                    orden=i
-                )
-            
-            tareas = request.POST.getlist('tarea[]')
-            for i, tarea_desc in enumerate(tareas):
-                if tarea_desc.strip():
-                    TareaRealizada.objects.create(
-                        registro=registro,
-                        descripcion=tarea_desc,
-                        orden=i+1
-                    )
-            
-            trabajadores = request.POST.getlist('trabajador[]')
-            horas = request.POST.getlist('horas[]')
-            horas_extras = request.POST.getlist('horas_extra[]')
-
-            # Validar duplicados
-            trabajadores_limpios = [t for t in trabajadores if t]
-            if len(trabajadores_limpios) != len(set(trabajadores_limpios)):
-                raise ValidationError("Un trabajador no puede repetirse en el mismo registro.")
-            if str(request.user.id) in trabajadores_limpios:
-                raise ValidationError("El supervisor no puede ser seleccionado como trabajador.")
-
-            def normaliza_par(h_str, extra_str, min_base=Decimal("0")):
-                def to_decimal(val):
-                    try:
-                        return Decimal(str(val).replace(',', '.'))
-                    except Exception:
-                        return Decimal("0")
-
-                base = to_decimal(h_str)
-                extra = to_decimal(extra_str)
-                if base < 0:
-                    base = Decimal("0")
-                if extra < 0:
-                    extra = Decimal("0")
-
-                total = base + extra
-                if total > MAX_HORAS_TOTAL:
-                    raise ValidationError("La suma de horas y horas extra no puede superar 12 por trabajador.")
-                if base > MAX_HORAS_TOTAL:
-                    raise ValidationError("Las horas normales no pueden superar 12 por trabajador.")
-                if min_base > 0 and base < min_base:
-                    raise ValidationError("Las horas normales deben ser al menos 1 por trabajador.")
-                return (base.quantize(Decimal("0.01")), extra.quantize(Decimal("0.01")))
-
-            for trabajador_id, horas_val, extra_val in zip(trabajadores, horas, horas_extras):
-                if trabajador_id and (horas_val or extra_val):
-                    h_norm, extra_norm = normaliza_par(horas_val, extra_val, min_base=Decimal("1"))
-                    TrabajadorRegistro.objects.create(
-                        registro=registro,
-                        trabajador_id=trabajador_id,
-                        horas_trabajadas=h_norm,
-                        horas_extras=extra_norm
-                    )
-            
             messages.success(request, 'Registro guardado exitosamente')
             return redirect('registro_libro_list')
-            
+
+        except ValidationError as e:
+            messages.error(request, f'Error al guardar: {" ".join(e.messages)}')
         except Exception as e:
             messages.error(request, f'Error al guardar: {str(e)}')
     
-    obras = Obra.objects.filter(estado=True)
-    trabajadores = User.objects.exclude(id=request.user.id).filter(is_active=True)
     today = datetime.date.today()
     
+    # La obra se busca con obra_autocompletar: el formulario no lista todas
     return render(request, 'obras/registro_libro_form.html', {
         'title': 'Ingresar Registro',
-        'obras': obras,
-        'trabajadores': trabajadores,
         'registro': None,
         'registro_trabajadores': [],
         'today': today
     })
 
 @login_required
+@limitar_subidas(MAX_ARCHIVOS_POR_REGISTRO, MAX_FILE_SIZE, EXTENSIONES_PERMITIDAS)
 def registro_libro_update(request, pk):
     """Actualizar registro del libro de obras."""
-    registro = get_object_or_404(RegistroLibroObra, pk=pk)
-    originales = {
-        "obra": str(registro.obra_id),
-        "fecha": registro.fecha.isoformat() if registro.fecha else "",
-        "observaciones": registro.observaciones or "",
-        "tareas": list(registro.tareas.values_list("descripcion", flat=True)),
-        "trabajadores": list(
-            registro.trabajadores.values_list("trabajador_id", "horas_trabajadas", "horas_extras")
-        ),
-    }
+    registro = get_object_or_404(RegistroLibroObra.objects.select_related('obra'), pk=pk)
     
     if request.method == 'POST':
         try:
-            registro.obra_id = request.POST.get('obra')
-            new_fecha_str = request.POST.get('fecha') or ''
-            new_fecha = None
-            if new_fecha_str:
-                try:
-                    new_fecha = datetime.date.fromisoformat(new_fecha_str)
-                except ValueError:
-                    new_fecha = registro.fecha
-            registro.fecha = new_fecha
-            registro.observaciones = request.POST.get('observaciones', '')
+            datos = leer_datos_registro(request.POST, request.user, fecha_actual=registro.fecha)
 
             nuevos_archivos = request.FILES.getlist('archivos[]')
+            subidas = obtener_subidas(request.POST, request.user)
             nueva_foto = request.FILES.get('fotografia')
-            deleted_ids = request.POST.get('deleted_ids', '')
-
-            tareas = [t.strip() for t in request.POST.getlist('tarea[]') if t.strip()]
-            trabajadores = request.POST.getlist('trabajador[]')
-            horas = request.POST.getlist('horas[]')
-            horas_extras = request.POST.getlist('horas_extra[]')
-            trabajadores_data = []
-
-            trabajadores_limpios = [t for t in trabajadores if t]
-            if len(trabajadores_limpios) != len(set(trabajadores_limpios)):
-                raise ValidationError("Un trabajador no puede repetirse en el mismo registro.")
-            if str(request.user.id) in trabajadores_limpios:
-                raise ValidationError("El supervisor no puede ser seleccionado como trabajador.")
-
-            def normaliza_par(h_str, extra_str, min_base=Decimal("0")):
-                def to_decimal(val):
-                    try:
-                        return Decimal(str(val).replace(',', '.'))
-                    except Exception:
-                        return Decimal("0")
-
-                base = to_decimal(h_str)
-                extra = to_decimal(extra_str)
-                if base < 0:
-                    base = Decimal("0")
-                if extra < 0:
-                    extra = Decimal("0")
-
-                total = base + extra
-                if total > MAX_HORAS_TOTAL:
-                    raise ValidationError("La suma de horas y horas extra no puede superar 12 por trabajador.")
-                if base > MAX_HORAS_TOTAL:
-                    raise ValidationError("Las horas normales no pueden superar 12 por trabajador.")
-                if min_base > 0 and base < min_base:
-                    raise ValidationError("Las horas normales deben ser al menos 1 por trabajador.")
-                return (base.quantize(Decimal("0.01")), extra.quantize(Decimal("0.01")))
-
-            for trabajador_id, horas_val, extra_val in zip(trabajadores, horas, horas_extras):
-                if trabajador_id and (horas_val or extra_val):
-                    base, extra = normaliza_par(horas_val, extra_val, min_base=Decimal("1"))
-                    trabajadores_data.append((trabajador_id, base, extra))
+            deleted_ids = [
+                int(x) for x in request.POST.get('deleted_ids', '').split(',') if x.strip().isdigit()
+            ]
 
             def normalize_trab_list(raw_data):
-                norm = []
-                for tid, horas_raw, extra_raw in raw_data:
-                    try:
-                        horas_float = float(horas_raw)
-                    except Exception:
-                        horas_float = 0.0
-                    try:
-                        extra_float = float(extra_raw)
-                    except Exception:
-                        extra_float = 0.0
-                    norm.append((str(tid), round(horas_float, 3), round(extra_float, 3)))
-                norm.sort(key=lambda x: x[0])
-                return norm
-
-            originales_trabajadores = normalize_trab_list(originales["trabajadores"])
-            nuevos_trabajadores = normalize_trab_list(trabajadores_data)
+                return sorted(
+                    (int(tid), Decimal(horas).quantize(Decimal("0.01")), Decimal(extra).quantize(Decimal("0.01")))
+                    for tid, horas, extra in raw_data
+                )
 
+            originales_trabajadores = normalize_trab_list(
+                registro.trabajadores.values_list("trabajador_id", "horas_trabajadas", "horas_extras")
+            )
             sin_cambios = (
-                originales["obra"] == str(registro.obra_id or "")
-                and originales["fecha"] == (new_fecha.isoformat() if new_fecha else "")
-                and originales["observaciones"] == (registro.observaciones or "")
-                and originales["tareas"] == tareas
-                and originales_trabajadores == nuevos_trabajadores
+                registro.obra_id == datos['obra_id']
+                and registro.fecha == datos['fecha']
+                and (registro.observaciones or "") == (datos['observaciones'] or "")
+                and list(registro.tareas.values_list("descripcion", flat=True)) == datos['tareas']
+                and originales_trabajadores == normalize_trab_list(datos['trabajadores'])
                 and not nuevos_archivos
+                and not subidas
                 and not nueva_foto
                 and not deleted_ids
             )
@@ -443,64 +590,100 @@ def registro_libro_update(request, pk):
                 messages.info(request, 'No se realizaron cambios.')
                 return redirect('registro_libro_list')
 
-            if nueva_foto:
-                registro.fotografia = nueva_foto
-            registro.save()
-
-            # Procesar eliminaciones diferidas
-            deleted_ids = request.POST.get('deleted_ids', '')
-            if deleted_ids:
-                ids_to_delete = [int(x) for x in deleted_ids.split(',') if x.strip().isdigit()]
-                if ids_to_delete:
-                    FotografiaRegistro.objects.filter(id__in=ids_to_delete, registro=registro).delete()
-
-            orden_inicial = registro.fotografias.count()
-            for i, archivo in enumerate(nuevos_archivos):
-                tipo = 'video' if archivo.content_type.startswith('video/') else 'imagen'
-                FotografiaRegistro.objects.create(
-                    registro=registro,
-                    archivo=archivo,
-                    tipo=tipo,
-                    orden=orden_inicial + i
-                )
-
-            registro.tareas.all().delete()
-            for i, tarea_desc in enumerate(tareas):
-                TareaRealizada.objects.create(
-                    registro=registro,
-                    descripcion=tarea_desc,
-                    orden=i+1
-                )
-
-            registro.trabajadores.all().delete()
-            for trabajador_id, horas_num, extra_num in trabajadores_data:
-                TrabajadorRegistro.objects.create(
-                    registro=registro,
-                    trabajador_id=trabajador_id,
-                    horas_trabajadas=horas_num,
-                    horas_extras=extra_num
-                )
-
+            actualizar_registro(
+                registro,
+                datos,
+                fotografia=nueva_foto,
+                archivos=nuevos_archivos,
+                eliminar_ids=deleted_ids,
+                subidas=subidas,
+            )
             messages.success(request, 'Registro actualizado correctamente.')
             return redirect('registro_libro_list')
 
+        except ValidationError as e:
+            messages.error(request, f'Error al actualizar: {" ".join(e.messages)}')
         except Exception as e:
             messages.error(request, f'Error al actualizar: {str(e)}')
+        registro.refresh_from_db()
     
-    obras = Obra.objects.filter(estado=True)
-    trabajadores = User.objects.exclude(id=request.user.id).filter(is_active=True)
     today = datetime.date.today()
     registro_trabajadores = registro.trabajadores.select_related('trabajador').all()
     
     return render(request, 'obras/registro_libro_form.html', {
         'title': 'Editar Registro',
-        'obras': obras,
-        'trabajadores': trabajadores,
         'registro': registro,
         'registro_trabajadores': registro_trabajadores,
         'today': today
     })
 
+# SUBIDA FRAGMENTADA DE VIDEOS
+# Vistas async: bajo ASGI el fragmento ya llegó completo cuando la vista corre;
+# la escritura y el bloqueo de la sesión (select_for_update) van en un hilo
+@login_requerido
+@solo_metodos('POST')
+async def subida_iniciar(request):
+    """Crea una sesión de subida reanudable."""
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'JSON inválido.'}, status=400)
+    try:
+        subida = await sync_to_async(iniciar_subida)(
+            request.user,
+            payload.get('nombre'),
+            payload.get('tamano'),
+            tipo_contenido=payload.get('tipo', ''),
+            sha256=payload.get('sha256', ''),
+        )
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'message': e.messages[0]}, status=400)
+    return JsonResponse({'success': True, **estado_subida(subida)}, status=201)
+
+@login_requerido
+@solo_metodos('GET')
+async def subida_estado(request, pk):
+    """Bytes recibidos hasta ahora, para reanudar."""
+    subida = await obtener_o_404(SubidaFragmentada, pk=pk, usuario=request.user)
+    return JsonResponse({'success': True, **estado_subida(subida)})
+
+@login_requerido
+@solo_metodos('POST')
+async def subida_fragmento(request, pk):
+    """Recibe un fragmento en el offset de la cabecera X-Upload-Offset."""
+    try:
+        offset = int(request.headers.get('X-Upload-Offset', ''))
+        longitud = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Offset inválido.'}, status=400)
+    try:
+        subida, aceptado = await sync_to_async(agregar_fragmento)(
+            pk,
+            request.user,
+            offset,
+            request,
+            longitud,
+            sha256_fragmento=request.headers.get('X-Chunk-Sha256', ''),
+        )
+    except SubidaFragmentada.DoesNotExist:
+        return JsonResponse({'success': False, 'message': 'Subida no encontrada.'}, status=404)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'message': e.messages[0]}, status=400)
+    # 409: el cliente debe continuar desde "recibido"
+    return JsonResponse({'success': aceptado, **estado_subida(subida)}, status=200 if aceptado else 409)
+
+@login_requerido
+@solo_metodos('POST')
+async def subida_finalizar(request, pk):
+    """Verifica el checksum y deja el archivo listo para adjuntar a un registro."""
+    try:
+        subida = await sync_to_async(finalizar_subida)(pk, request.user)
+    except SubidaFragmentada.DoesNotExist:
+        return JsonResponse({'success': False, 'message': 'Subida no encontrada.'}, status=404)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'message': e.messages[0]}, status=400)
+    return JsonResponse({'success': True, 'sha256': subida.sha256, **estado_subida(subida)})
+
 @login_required
 def fotografia_delete(request, pk):
     """Eliminar fotografía del registro."""
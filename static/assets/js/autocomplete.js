@@ -0,0 +1,72 @@
+(function () {
+  'use strict';
+
+  // Selects con data-autocomplete-url: solo traen la opción elegida y
+  // buscan el resto en el servidor mientras se escribe (requiere Choices.js).
+  const ESPERA_MS = 250;
+
+  function iniciarAutocompletar(select, opciones) {
+    if (!select || select.dataset.autocompleteListo || typeof Choices === 'undefined') return null;
+    opciones = opciones || {};
+    const url = select.dataset.autocompleteUrl;
+    const choices = new Choices(select, {
+      searchChoices: false,
+      shouldSort: false,
+      itemSelectText: '',
+      allowHTML: false,
+      placeholder: true,
+      placeholderValue: select.dataset.placeholder || 'Escribe para buscar...',
+      searchPlaceholderValue: select.dataset.placeholder || 'Escribe para buscar...',
+      noResultsText: 'Sin resultados',
+      noChoicesText: 'Escribe para buscar',
+      ...(opciones.choices || {}),
+    });
+    select.dataset.autocompleteListo = '1';
+
+    let temporizador = null;
+    let controlador = null;
+
+    const buscar = (texto) => {
+      const params = new URLSearchParams({ q: texto || '' });
+      const excluir = typeof opciones.excluir === 'function' ? opciones.excluir() : [];
+      if (excluir.length) params.set('excluir', excluir.join(','));
+      Object.entries(opciones.params || {}).forEach(([clave, valor]) => params.set(clave, valor));
+
+      if (controlador) controlador.abort();
+      controlador = new AbortController();
+      fetch(`${url}?${params.toString()}`, {
+        headers: { 'X-Requested-With': 'XMLHttpRequest' },
+        signal: controlador.signal,
+      })
+        .then((r) => (r.ok ? r.json() : { results: [] }))
+        .then((datos) => {
+          choices.setChoices(
+            datos.results.map((r) => ({ value: String(r.id), label: r.text, customProperties: r })),
+            'value',
+            'label',
+            true
+          );
+        })
+        .catch((err) => {
+          if (err.name !== 'AbortError') console.error(err);
+        });
+    };
+
+    select.addEventListener('search', (e) => {
+      clearTimeout(temporizador);
+      temporizador = setTimeout(() => buscar(e.detail.value), ESPERA_MS);
+    });
+    // Al abrir sin escribir se muestra la primera página
+    select.addEventListener('showDropdown', () => buscar(''));
+
+    return choices;
+  }
+
+  window.iniciarAutocompletar = iniciarAutocompletar;
+
+  document.addEventListener('DOMContentLoaded', () => {
+    document
+      .querySelectorAll('select[data-autocomplete-url]:not([data-autocomplete-manual])')
+      .forEach((select) => iniciarAutocompletar(select));
+  });
+})();
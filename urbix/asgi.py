@@ -2,6 +2,7 @@
 ASGI config for urbix project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+En producción lo sirve deploy/gunicorn-asgi.sh (workers de uvicorn).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -14,3 +15,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'urbix.settings')
 
 application = get_asgi_application()
+
+# Después de get_asgi_application(): necesitan la configuración cargada
+from django.conf import settings  # noqa: E402
+from core.asincrono import limitar_cuerpo  # noqa: E402
+
+application = limitar_cuerpo(application, settings.ASGI_MAX_CUERPO)
@@ -0,0 +1,124 @@
+"""
+Memoria del worker: RSS y snapshots de tracemalloc alrededor de una vista.
+
+``medir()`` lo usa el perfilador en modo ``memoria`` (``?perfilar=memoria``
+como staff): toma un snapshot antes y otro después de la vista y reporta
+el pico de memoria de Python durante la solicitud, lo que quedó retenido
+al terminar y los sitios (archivo:línea) que más asignaron. tracemalloc
+se enciende solo para esa solicitud: el resto no paga su costo.
+
+``rss_actual()`` y ``rss_pico()`` los usa ``urbix.metricas`` para
+publicar el RSS de cada worker y cuánto hizo crecer su pico cada vista.
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MARCOS = 12
+SITIOS = 25
+PILAS = 5
+# Asignaciones del propio tracemalloc y del import de módulos
+FILTROS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_actual():
+    """RSS del proceso en bytes (Linux); None si no se puede leer."""
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * _PAGINA
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def rss_pico():
+    """RSS máximo que alcanzó el proceso, en bytes (0 si no hay ``resource``)."""
+    if resource is None:
+        return 0
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KiB; macOS, en bytes
+    return pico if sys.platform == "darwin" else pico * 1024
+
+
+class Reporte:
+    """Resultado de ``medir()``: tamaños en bytes y las diferencias entre snapshots."""
+
+    __slots__ = ("pico", "retenido", "rss_antes", "rss_despues", "sitios", "pilas")
+
+    def __init__(self, pico, retenido, rss_antes, rss_despues, sitios, pilas):
+        self.pico = pico
+        self.retenido = retenido
+        self.rss_antes = rss_antes
+        self.rss_despues = rss_despues
+        self.sitios = sitios
+        self.pilas = pilas
+
+    def texto(self, titulo, ruta=str):
+        """Reporte legible; ``ruta`` acorta los nombres de archivo."""
+        def lugar(marco):
+            return f"{ruta(marco.filename)}:{marco.lineno}"
+
+        lineas = [
+            titulo,
+            f"Pico de memoria Python durante la solicitud: {_tamano(self.pico)}",
+            f"Retenido al terminar: {_tamano(self.retenido)}",
+            f"RSS del worker: {_tamano(self.rss_antes)} antes, {_tamano(self.rss_despues)} después",
+            "",
+            f"Sitios que más memoria dejaron asignada (top {SITIOS}):",
+        ]
+        lineas += [f"  {_tamano(d.size_diff, signo=True):>12} {d.count_diff:+8d} bloques  {lugar(d.traceback[0])}" for d in self.sitios]
+        for diferencia in self.pilas:
+            lineas += ["", f"Pila de {_tamano(diferencia.size_diff, signo=True)} ({diferencia.count_diff:+d} bloques):"]
+            lineas += [f"  {lugar(marco)}" for marco in diferencia.traceback]
+        return "\n".join(lineas) + "\n"
+
+
+def _tamano(valor, signo=False):
+    if valor is None:
+        return "?"
+    prefijo = "+" if signo and valor > 0 else ""
+    if abs(valor) < 1024:
+        return f"{prefijo}{valor} B"
+    if abs(valor) < 1024 ** 2:
+        return f"{prefijo}{valor / 1024:.1f} KiB"
+    return f"{prefijo}{valor / 1024 ** 2:.1f} MiB"
+
+
+def medir(llamar):
+    """
+    (resultado de ``llamar()``, Reporte) con tracemalloc activo solo durante la llamada.
+
+    La primera solicitud de un worker incluye cachés que se llenan una sola
+    vez (URLs, plantillas compiladas): conviene medir la segunda.
+    """
+    propio = not tracemalloc.is_tracing()
+    if propio:
+        tracemalloc.start(MARCOS)
+    try:
+        gc.collect()
+        antes = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        rss_antes = rss_actual()
+        resultado = llamar()
+        actual, pico = tracemalloc.get_traced_memory()
+        rss_despues = rss_actual()
+        despues = tracemalloc.take_snapshot()
+    finally:
+        if propio:
+            tracemalloc.stop()
+    antes, despues = antes.filter_traces(FILTROS), despues.filter_traces(FILTROS)
+    sitios = [d for d in despues.compare_to(antes, "lineno") if d.size_diff > 0][:SITIOS]
+    pilas = [d for d in despues.compare_to(antes, "traceback") if d.size_diff > 0][:PILAS]
+    return resultado, Reporte(pico - base, actual - base, rss_antes, rss_despues, sitios, pilas)
@@ -0,0 +1,350 @@
+"""
+Métricas de rendimiento por vista en formato Prometheus.
+
+``MetricasMiddleware`` mide cada solicitud y la acumula en memoria por
+nombre de ruta (``resolver_match.view_name``), método y estado:
+
+- duración total de la solicitud,
+- número y tiempo de consultas SQL,
+- tiempo de render de plantillas (solo la plantilla exterior: los
+  ``include`` y ``extends`` quedan dentro de ella),
+- tamaño de la respuesta,
+- cuánto creció el RSS máximo del worker (``ru_maxrss``) durante la
+  solicitud: un contador por vista que señala cuáles inflan los workers.
+  Con solicitudes concurrentes en un worker (hilos o ASGI) el crecimiento
+  se atribuye a la solicitud que lo vio, no necesariamente a la que lo
+  causó.
+
+Además cada worker publica su RSS actual y máximo
+(``urbix_worker_rss_bytes``), para seguir en Prometheus cómo crece cada
+uno con el tiempo.
+
+Cada valor va a un histograma de buckets fijos; registrar una solicitud
+es una búsqueda binaria y unas sumas bajo un lock. Las consultas se
+cuentan con un ``execute_wrapper`` que queda instalado en cada conexión y
+solo trabaja si hay una medición en curso.
+
+Cada worker de gunicorn vuelca sus acumulados a ``METRICAS_DIR/<pid>-<id>.json``
+cada ``METRICAS_INTERVALO`` segundos; ``exportar()`` suma los archivos de
+todos los workers. Los contadores de un worker que terminó siguen en su
+archivo para que los totales no retrocedan; ``deploy/gunicorn.sh`` limpia
+el directorio al arrancar. El RSS de un worker se publica mientras su
+archivo se haya actualizado en los últimos ``VIGENCIA_WORKER`` segundos.
+"""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+from . import memoria
+
+SIN_RUTA = "sin_ruta"
+METODOS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+BUCKETS = {
+    "urbix_solicitud_segundos": (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    "urbix_consultas_db": (0, 1, 2, 5, 10, 20, 50, 100, 200),
+    "urbix_consultas_db_segundos": (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    "urbix_plantillas_segundos": (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    "urbix_respuesta_bytes": (1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+}
+AYUDA = {
+    "urbix_solicitudes_total": "Solicitudes atendidas por vista, método y estado.",
+    "urbix_solicitud_segundos": "Duración total de la solicitud.",
+    "urbix_consultas_db": "Consultas SQL por solicitud.",
+    "urbix_consultas_db_segundos": "Tiempo en consultas SQL por solicitud.",
+    "urbix_plantillas_segundos": "Tiempo de render de plantillas por solicitud.",
+    "urbix_respuesta_bytes": "Tamaño del cuerpo de la respuesta.",
+    "urbix_rss_pico_crecimiento_bytes_total": "Crecimiento del RSS máximo del worker durante solicitudes de la vista.",
+    "urbix_worker_rss_bytes": "RSS del worker en su último volcado.",
+    "urbix_worker_rss_pico_bytes": "RSS máximo que alcanzó el worker.",
+}
+VIGENCIA_WORKER = 300
+
+_medicion = contextvars.ContextVar("urbix_medicion", default=None)
+_lock = threading.Lock()
+_lock_volcado = threading.Lock()
+_solicitudes = defaultdict(int)
+_crecimiento = defaultdict(int)
+# (métrica, vista, método) -> [conteo por bucket..., conteo sobre el último bucket, suma]
+_histogramas = {}
+_estado = {"archivo": None, "proximo_volcado": 0.0}
+
+
+class Medicion:
+    __slots__ = ("consultas", "db", "plantillas", "en_plantilla")
+
+    def __init__(self):
+        self.consultas = 0
+        self.db = 0.0
+        self.plantillas = 0.0
+        self.en_plantilla = False
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.consultas += 1
+        medicion.db += time.perf_counter() - inicio
+
+
+def _instalar_en_conexion(connection, **kwargs):
+    # Al inicio de la lista: los execute_wrapper() temporales se apilan y desapilan al final
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _medir_consulta)
+
+
+_render_original = Template.render
+
+
+def _render_medido(self, context):
+    medicion = _medicion.get()
+    if medicion is None or medicion.en_plantilla:
+        return _render_original(self, context)
+    medicion.en_plantilla = True
+    inicio = time.perf_counter()
+    try:
+        return _render_original(self, context)
+    finally:
+        medicion.plantillas += time.perf_counter() - inicio
+        medicion.en_plantilla = False
+
+
+def instalar():
+    """Engancha el conteo de consultas y el tiempo de plantillas (una vez por proceso)."""
+    if Template.render is not _render_medido:
+        Template.render = _render_medido
+        connection_created.connect(_instalar_en_conexion, dispatch_uid="urbix_metricas")
+    for conexion in connections.all(initialized_only=True):
+        _instalar_en_conexion(conexion)
+
+
+def _observar(metrica, vista, metodo, valor):
+    limites = BUCKETS[metrica]
+    fila = _histogramas.get((metrica, vista, metodo))
+    if fila is None:
+        fila = _histogramas[(metrica, vista, metodo)] = [0] * (len(limites) + 1) + [0.0]
+    fila[bisect.bisect_left(limites, valor)] += 1
+    fila[-1] += valor
+
+
+def registrar(vista, metodo, estado, segundos, consultas, db, plantillas, tamano, crecimiento=0):
+    with _lock:
+        _solicitudes[(vista, metodo, str(estado))] += 1
+        if crecimiento > 0:
+            _crecimiento[(vista, metodo)] += crecimiento
+        _observar("urbix_solicitud_segundos", vista, metodo, segundos)
+        _observar("urbix_consultas_db", vista, metodo, consultas)
+        _observar("urbix_consultas_db_segundos", vista, metodo, db)
+        _observar("urbix_plantillas_segundos", vista, metodo, plantillas)
+        _observar("urbix_respuesta_bytes", vista, metodo, tamano)
+
+
+def _foto():
+    with _lock:
+        return {
+            "solicitudes": [[*clave, n] for clave, n in _solicitudes.items()],
+            "histogramas": [[*clave, list(fila)] for clave, fila in _histogramas.items()],
+            "crecimiento": [[*clave, n] for clave, n in _crecimiento.items()],
+            "worker": {
+                "pid": os.getpid(),
+                "rss": memoria.rss_actual(),
+                "pico": memoria.rss_pico(),
+                "actualizado": time.time(),
+            },
+        }
+
+
+def _directorio():
+    return getattr(settings, "METRICAS_DIR", None)
+
+
+def volcar():
+    """Escribe los acumulados de este proceso en METRICAS_DIR (reemplazo atómico)."""
+    directorio = _directorio()
+    if not directorio or not _lock_volcado.acquire(blocking=False):
+        return
+    try:
+        if _estado["archivo"] is None or _estado["archivo"][0] != os.getpid():
+            # pid + id: un worker nuevo nunca pisa el archivo de uno anterior con el mismo pid
+            _estado["archivo"] = (os.getpid(), os.path.join(directorio, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"))
+        ruta = _estado["archivo"][1]
+        os.makedirs(directorio, exist_ok=True)
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "w") as fh:
+            json.dump(_foto(), fh)
+        os.replace(temporal, ruta)
+    finally:
+        _lock_volcado.release()
+
+
+def _volcar_si_toca():
+    ahora = time.monotonic()
+    if ahora >= _estado["proximo_volcado"]:
+        _estado["proximo_volcado"] = ahora + getattr(settings, "METRICAS_INTERVALO", 5)
+        volcar()
+
+
+def _sumar(solicitudes, histogramas, crecimiento, datos):
+    for *clave, n in datos.get("solicitudes", []):
+        solicitudes[tuple(clave)] += n
+    for *clave, n in datos.get("crecimiento", []):
+        crecimiento[tuple(clave)] += n
+    for *clave, fila in datos.get("histogramas", []):
+        clave = tuple(clave)
+        if clave[0] not in BUCKETS or len(fila) != len(BUCKETS[clave[0]]) + 2:
+            continue  # archivo de una versión con otros buckets
+        actual = histogramas.setdefault(clave, [0] * len(fila))
+        for i, valor in enumerate(fila):
+            actual[i] += valor
+
+
+def combinar():
+    """(solicitudes, histogramas, crecimiento) sumados entre todos los workers, y la lista de workers vigentes."""
+    volcar()
+    solicitudes, histogramas, crecimiento, workers = defaultdict(int), {}, defaultdict(int), []
+    vigencia = time.time() - max(VIGENCIA_WORKER, 3 * getattr(settings, "METRICAS_INTERVALO", 5))
+    directorio = _directorio()
+    archivos = []
+    if directorio and os.path.isdir(directorio):
+        archivos = [os.path.join(directorio, n) for n in os.listdir(directorio) if n.endswith(".json")]
+    fotos = [] if archivos else [_foto()]
+    for ruta in archivos:
+        try:
+            with open(ruta) as fh:
+                fotos.append(json.load(fh))
+        except (OSError, ValueError):
+            continue  # el worker lo está reemplazando o lo borraron
+    for datos in fotos:
+        _sumar(solicitudes, histogramas, crecimiento, datos)
+        worker = datos.get("worker")
+        if worker and worker.get("actualizado", 0) >= vigencia:
+            workers.append(worker)
+    workers.sort(key=lambda w: w["pid"])
+    return solicitudes, histogramas, crecimiento, workers
+
+
+def workers():
+    """Workers vigentes con su RSS (bytes) y la fecha de su último volcado."""
+    return combinar()[3]
+
+
+def _etiquetas(**valores):
+    partes = []
+    for clave, valor in valores.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{clave}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exportar():
+    """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+    solicitudes, histogramas, crecimiento, vigentes = combinar()
+    lineas = [
+        f"# HELP urbix_solicitudes_total {AYUDA['urbix_solicitudes_total']}",
+        "# TYPE urbix_solicitudes_total counter",
+    ]
+    for (vista, metodo, estado), n in sorted(solicitudes.items()):
+        lineas.append(f"urbix_solicitudes_total{_etiquetas(vista=vista, metodo=metodo, estado=estado)} {n}")
+    for metrica, limites in BUCKETS.items():
+        lineas += [f"# HELP {metrica} {AYUDA[metrica]}", f"# TYPE {metrica} histogram"]
+        for (nombre, vista, metodo), fila in sorted(histogramas.items()):
+            if nombre != metrica:
+                continue
+            acumulado = 0
+            for limite, conteo in zip((*limites, "+Inf"), fila[:-1]):
+                acumulado += conteo
+                le = limite if limite == "+Inf" else _numero(limite)
+                lineas.append(f"{metrica}_bucket{_etiquetas(vista=vista, metodo=metodo, le=le)} {acumulado}")
+            lineas.append(f"{metrica}_sum{_etiquetas(vista=vista, metodo=metodo)} {_numero(fila[-1])}")
+            lineas.append(f"{metrica}_count{_etiquetas(vista=vista, metodo=metodo)} {acumulado}")
+    metrica = "urbix_rss_pico_crecimiento_bytes_total"
+    lineas += [f"# HELP {metrica} {AYUDA[metrica]}", f"# TYPE {metrica} counter"]
+    for (vista, metodo), n in sorted(crecimiento.items()):
+        lineas.append(f"{metrica}{_etiquetas(vista=vista, metodo=metodo)} {n}")
+    for metrica, clave in (("urbix_worker_rss_bytes", "rss"), ("urbix_worker_rss_pico_bytes", "pico")):
+        lineas += [f"# HELP {metrica} {AYUDA[metrica]}", f"# TYPE {metrica} gauge"]
+        for worker in vigentes:
+            if worker.get(clave) is not None:
+                lineas.append(f"{metrica}{_etiquetas(worker=worker['pid'])} {worker[clave]}")
+    return "\n".join(lineas) + "\n"
+
+
+def _tamano(response):
+    if response.streaming:
+        return int(response.get("Content-Length") or 0)
+    return len(response.content)
+
+
+class MetricasMiddleware:
+    """Mide cada solicitud; va primero en MIDDLEWARE para incluir a los demás middlewares."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICAS_ACTIVAS", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+        instalar()
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self._acall(request)
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        pico = memoria.rss_pico()
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        self._registrar(request, response, medicion, time.perf_counter() - inicio, pico)
+        return response
+
+    async def _acall(self, request):
+        # sync_to_async copia el contexto: las consultas en hilos suman a la misma medición
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        pico = memoria.rss_pico()
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        self._registrar(request, response, medicion, time.perf_counter() - inicio, pico)
+        return response
+
+    def _registrar(self, request, response, medicion, duracion, pico):
+        # Solo rutas resueltas: las URL de un 404 no abren series nuevas
+        match = getattr(request, "resolver_match", None)
+        registrar(
+            match.view_name if match else SIN_RUTA,
+            request.method if request.method in METODOS else "OTRO",
+            response.status_code, duracion,
+            medicion.consultas, medicion.db, medicion.plantillas, _tamano(response),
+            memoria.rss_pico() - pico,
+        )
+        _volcar_si_toca()
@@ -0,0 +1,261 @@
+"""
+Perfilado bajo demanda de una solicitud de staff.
+
+Un usuario staff agrega ``?perfilar=1`` (o ``cprofile``, ``memoria``) a la
+URL, o envía ``X-Perfilar: <firma>`` con una firma sacada de la página de
+perfiles. ``PerfiladorMiddleware`` va al final de MIDDLEWARE y perfila
+solo la vista y su render; la respuesta lleva ``X-Perfil`` con el nombre
+del perfil guardado en ``PERFILADOR_DIR``:
+
+- ``muestreo`` (por defecto): un hilo toma la pila del hilo de la
+  solicitud cada ``PERFILADOR_INTERVALO_MS`` y la guarda en formato
+  "folded" (``marco;marco;marco N``), que abren flamegraph.pl, speedscope
+  e inferno. El costo no depende de cuántas funciones se llamen.
+- ``cprofile``: cProfile determinista; el ``.prof`` se abre con pstats,
+  snakeviz o flameprof.
+- ``memoria``: snapshots de tracemalloc antes y después de la vista; el
+  ``.txt`` lista el pico, lo retenido y los sitios que más asignaron
+  (ver ``urbix.memoria``).
+
+Sin el parámetro ni el encabezado, el middleware solo mira dos claves de
+diccionario y no toca la sesión.
+
+Bajo ASGI el resto de la cadena corre, mientras se perfila, desde un hilo
+con ``async_to_sync``: el trabajo sync de la vista (ORM, render) ocurre en
+ese hilo y queda en el perfil; lo que la vista espera en el event loop
+solo aparece como tiempo de espera.
+"""
+import cProfile
+import datetime
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+
+from . import memoria
+
+PARAMETRO = "perfilar"
+ENCABEZADO = "HTTP_X_PERFILAR"
+SAL_FIRMA = "urbix.perfilador"
+MODOS = {"1": "muestreo", "muestreo": "muestreo", "cprofile": "cprofile", "memoria": "memoria"}
+EXTENSIONES = {"muestreo": ".folded", "cprofile": ".prof", "memoria": ".txt"}
+NOMBRE_VALIDO = re.compile(r"^[\w.-]+\.(folded|prof|txt)$")
+
+
+def directorio():
+    return getattr(settings, "PERFILADOR_DIR", os.path.join(settings.BASE_DIR, "tmp", "perfiles"))
+
+
+def firmar(usuario):
+    """Valor de ``X-Perfilar`` para ``usuario``; vence a los ``PERFILADOR_FIRMA_SEGUNDOS``."""
+    return signing.TimestampSigner(salt=SAL_FIRMA).sign(str(usuario.pk))
+
+
+def _firma_valida(valor, usuario):
+    try:
+        pk = signing.TimestampSigner(salt=SAL_FIRMA).unsign(
+            valor, max_age=getattr(settings, "PERFILADOR_FIRMA_SEGUNDOS", 3600)
+        )
+    except signing.BadSignature:
+        return False
+    return pk == str(usuario.pk)
+
+
+def _marcada(request):
+    return PARAMETRO in request.META.get("QUERY_STRING", "") or ENCABEZADO in request.META
+
+
+def modo_solicitado(request):
+    """Modo de perfilado pedido por un staff, o None. Sin marca no se lee request.user."""
+    if not _marcada(request):
+        return None
+    parametro = request.GET.get(PARAMETRO) if PARAMETRO in request.META.get("QUERY_STRING", "") else None
+    encabezado = request.META.get(ENCABEZADO)
+    if parametro is None and encabezado is None:
+        return None
+    usuario = getattr(request, "user", None)
+    if usuario is None or not usuario.is_authenticated or not usuario.is_staff:
+        return None
+    if parametro is not None:
+        return MODOS.get(parametro)
+    # "<firma>" o "<modo>:<firma>"; la firma también lleva ":" adentro
+    modo = "muestreo"
+    for prefijo in ("cprofile:", "memoria:", "muestreo:"):
+        if encabezado.startswith(prefijo):
+            modo, encabezado = prefijo[:-1], encabezado[len(prefijo):]
+    return modo if _firma_valida(encabezado, usuario) else None
+
+
+class Muestreador:
+    """Toma la pila de un hilo a intervalos fijos y cuenta las pilas iguales."""
+
+    def __init__(self, hilo, intervalo):
+        self.hilo = hilo
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self.muestras = 0
+        self._parar = threading.Event()
+        self._sondeo = threading.Thread(target=self._correr, name="perfilador", daemon=True)
+
+    def __enter__(self):
+        self._sondeo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._sondeo.join()
+        return False
+
+    def _correr(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo)
+            marcos = []
+            while frame is not None:
+                codigo = frame.f_code
+                marcos.append(f"{codigo.co_name} ({_ruta_corta(codigo.co_filename)}:{codigo.co_firstlineno})")
+                frame = frame.f_back
+            self.pilas[";".join(reversed(marcos))] += 1
+            self.muestras += 1
+
+    def folded(self):
+        return "".join(f"{pila} {n}\n" for pila, n in self.pilas.most_common())
+
+
+def _ruta_corta(ruta):
+    base = str(settings.BASE_DIR)
+    if ruta.startswith(base):
+        return os.path.relpath(ruta, base)
+    partes = ruta.replace("\\", "/").split("/site-packages/")
+    return partes[-1]
+
+
+def _guardar(request, response, modo, duracion, escribir, muestras=None, **extra):
+    destino = directorio()
+    os.makedirs(destino, exist_ok=True)
+    match = getattr(request, "resolver_match", None)
+    vista = match.view_name if match else "sin_ruta"
+    fecha = datetime.datetime.now()
+    segura = re.sub(r"[^\w-]", "_", vista)
+    nombre = f"{fecha:%Y%m%d-%H%M%S-%f}-{segura}-{uuid.uuid4().hex[:6]}{EXTENSIONES[modo]}"
+    escribir(os.path.join(destino, nombre))
+    meta = {
+        "nombre": nombre,
+        "modo": modo,
+        "fecha": fecha.isoformat(timespec="seconds"),
+        "vista": vista,
+        "metodo": request.method,
+        "ruta": request.get_full_path(),
+        "estado": response.status_code,
+        "duracion_ms": round(duracion * 1000, 1),
+        "usuario": request.user.get_username(),
+        "muestras": muestras,
+        **extra,
+    }
+    with open(os.path.join(destino, f"{nombre}.json"), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, ensure_ascii=False)
+    _podar(destino)
+    return nombre
+
+
+def _podar(destino):
+    """Deja solo los ``PERFILADOR_MAX`` perfiles más recientes."""
+    metas = sorted(n for n in os.listdir(destino) if n.endswith(".json"))
+    for meta in metas[:-getattr(settings, "PERFILADOR_MAX", 50) or None]:
+        for ruta in (meta, meta[: -len(".json")]):
+            try:
+                os.remove(os.path.join(destino, ruta))
+            except FileNotFoundError:
+                pass
+
+
+def recientes():
+    """Metadatos de los perfiles guardados, del más nuevo al más antiguo."""
+    destino = directorio()
+    if not os.path.isdir(destino):
+        return []
+    perfiles = []
+    for nombre in sorted((n for n in os.listdir(destino) if n.endswith(".json")), reverse=True):
+        try:
+            with open(os.path.join(destino, nombre), encoding="utf-8") as fh:
+                perfiles.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return perfiles
+
+
+def ruta_de(nombre):
+    """Ruta del archivo de un perfil, o None si el nombre no es de un perfil existente."""
+    if not NOMBRE_VALIDO.match(nombre or ""):
+        return None
+    ruta = os.path.join(directorio(), nombre)
+    return ruta if os.path.isfile(ruta) else None
+
+
+class PerfiladorMiddleware:
+    """Perfila la vista cuando un staff lo pide; va al final de MIDDLEWARE."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self._acall(request)
+        modo = modo_solicitado(request)
+        if modo is None:
+            return self.get_response(request)
+        return self.perfilar(request, modo, self.get_response)
+
+    async def _acall(self, request):
+        modo = await sync_to_async(modo_solicitado)(request) if _marcada(request) else None
+        if modo is None:
+            return await self.get_response(request)
+        return await sync_to_async(self.perfilar)(request, modo, async_to_sync(self.get_response))
+
+    def perfilar(self, request, modo, get_response):
+        inicio = time.perf_counter()
+        if modo == "cprofile":
+            perfil = cProfile.Profile()
+            perfil.enable()
+            try:
+                response = get_response(request)
+            finally:
+                perfil.disable()
+            nombre = _guardar(request, response, modo, time.perf_counter() - inicio, perfil.dump_stats)
+        elif modo == "memoria":
+            response, reporte = memoria.medir(lambda: get_response(request))
+            duracion = time.perf_counter() - inicio
+
+            def escribir(ruta):
+                with open(ruta, "w", encoding="utf-8") as fh:
+                    fh.write(reporte.texto(f"{request.method} {request.get_full_path()} -> {response.status_code}", _ruta_corta))
+
+            nombre = _guardar(
+                request, response, modo, duracion, escribir,
+                pico_kb=round(reporte.pico / 1024, 1), retenido_kb=round(reporte.retenido / 1024, 1),
+            )
+        else:
+            intervalo = getattr(settings, "PERFILADOR_INTERVALO_MS", 1) / 1000
+            with Muestreador(threading.get_ident(), intervalo) as muestreador:
+                response = get_response(request)
+
+            def escribir(ruta):
+                with open(ruta, "w", encoding="utf-8") as fh:
+                    fh.write(muestreador.folded())
+
+            nombre = _guardar(request, response, modo, time.perf_counter() - inicio, escribir, muestreador.muestras)
+        response["X-Perfil"] = nombre
+        return response
@@ -2,4 +2,5 @@ from .settings import *
 ALLOWED_HOSTS = ["acceso.houseconstruccion.cl", "houseconstruccion.cl", "www.houseconstruccion.cl"]
 DEBUG = True
 CSRF_TRUSTED_ORIGINS = ["https://acceso.houseconstruccion.cl", "https://houseconstruccion.cl", "https://www.houseconstruccion.cl","http://localhost","http://127.0.0.1"]
-
+# El detector de consultas audita cada consulta: solo en desarrollo y pruebas
+DETECTOR_CONSULTAS = env('DETECTOR_CONSULTAS', default='')
@@ -36,6 +36,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero: su medición incluye a todos los demás middlewares
+    'urbix.metricas.MetricasMiddleware',
+    'urbix.sqlaudit.DetectorConsultasMiddleware',
+    # Bajo ASGI envía por bloques las respuestas streaming sync (FileResponse, CSV)
+    'core.asincrono.StreamingAsincronoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -44,6 +49,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Último: perfila solo la vista (y solo si un staff lo pide)
+    'urbix.perfilador.PerfiladorMiddleware',
 ]
 
 ROOT_URLCONF = 'urbix.urls'
@@ -65,6 +72,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'urbix.wsgi.application'
+ASGI_APPLICATION = 'urbix.asgi.application'
 
 # Database (SQLite for dev)
 DATABASES = {
@@ -134,3 +142,85 @@ LOGOUT_REDIRECT_URL = 'signin'
 SESSION_COOKIE_AGE = 1209600  # 2 semanas en segundos
 SESSION_SAVE_EVERY_REQUEST = False
 SESSION_COOKIE_HTTPONLY = True
+
+# ===== DERIVADOS DE IMÁGENES =====
+# Hilos por worker que generan miniaturas/WebP después de cada subida
+THUMBNAIL_WORKERS = env.int('THUMBNAIL_WORKERS', default=2)
+
+# ===== SUBIDA FRAGMENTADA (videos del libro de obras) =====
+CHUNKED_UPLOAD_DIR = env('CHUNKED_UPLOAD_DIR', default=os.path.join(BASE_DIR, 'tmp', 'subidas'))
+CHUNKED_UPLOAD_MAX_SIZE = env.int('CHUNKED_UPLOAD_MAX_SIZE', default=500 * 1024 * 1024)
+CHUNKED_UPLOAD_CHUNK_MAX = 8 * 1024 * 1024
+CHUNKED_UPLOAD_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv'}
+# Sesiones sin terminar más antiguas que esto se eliminan con limpiar_subidas
+CHUNKED_UPLOAD_EXPIRATION_HOURS = 48
+
+# ===== LIBRO DE OBRA EN PDF =====
+# Procesos que renderizan páginas de registros en paralelo; el caché guarda una página por registro
+LIBRO_PDF_WORKERS = env.int('LIBRO_PDF_WORKERS', default=2)
+LIBRO_PDF_CACHE_DIR = env('LIBRO_PDF_CACHE_DIR', default=os.path.join(BASE_DIR, 'tmp', 'libro_pdf'))
+# generar_libros_pdf devuelve a la cola los que llevan más que esto "procesando" (worker caído)
+LIBRO_PDF_TIMEOUT_MINUTES = env.int('LIBRO_PDF_TIMEOUT_MINUTES', default=30)
+
+# ===== CACHÉ =====
+# De archivos: la comparten los workers de gunicorn del servidor. Con varios
+# servidores, apuntar CACHE_DIR a un disco común. Al pasar MAX_ENTRIES el backend
+# borra al azar 1/CULL_FREQUENCY de los archivos, así que cada uso va en su directorio:
+# - default: claves pocas y sin vencimiento (la versión de los catálogos, core.catalogs)
+# - derivados: una clave por imagen subida (core.thumbnails), crece con el volumen de fotos
+CACHE_DIR = env('CACHE_DIR', default=os.path.join(BASE_DIR, 'tmp', 'cache'))
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'default'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'derivados': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'derivados'),
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('CACHE_DERIVADOS_MAX_ENTRIES', default=1_000_000),
+            'CULL_FREQUENCY': 10,
+        },
+    },
+}
+
+# ===== CATÁLOGOS =====
+# Segundos que cada proceso conserva países, ciudades y estados sin releerlos
+CATALOGOS_TTL = env.int('CATALOGOS_TTL', default=300)
+
+# ===== IMPORTACIÓN DE GASTOS =====
+# Reportes CSV con las filas rechazadas en cada importación
+GASTOS_IMPORT_DIR = env('GASTOS_IMPORT_DIR', default=os.path.join(BASE_DIR, 'tmp', 'importaciones'))
+GASTOS_IMPORT_MAX_SIZE = env.int('GASTOS_IMPORT_MAX_SIZE', default=50 * 1024 * 1024)
+
+# ===== MÉTRICAS =====
+# Tiempos, consultas y tamaño por vista en /metrics/ (Prometheus). Cada worker
+# vuelca sus acumulados en METRICAS_DIR cada METRICAS_INTERVALO segundos
+METRICAS_ACTIVAS = env.bool('METRICAS_ACTIVAS', default=True)
+METRICAS_DIR = env('METRICAS_DIR', default=os.path.join(BASE_DIR, 'tmp', 'metricas'))
+METRICAS_INTERVALO = env.int('METRICAS_INTERVALO', default=5)
+# Token para que Prometheus lea /metrics/ sin sesión (Authorization: Bearer <token>)
+METRICAS_TOKEN = env('METRICAS_TOKEN', default='')
+
+# ===== DETECTOR DE CONSULTAS (desarrollo y pruebas) =====
+# "log": registra N+1 y consultas lentas por solicitud; "error": la solicitud falla
+# (lo usa el runner de pruebas); vacío: apagado
+DETECTOR_CONSULTAS = env('DETECTOR_CONSULTAS', default='log' if DEBUG else '')
+# Misma consulta desde la misma línea de código o plantilla, en una solicitud
+DETECTOR_REPETICIONES = env.int('DETECTOR_REPETICIONES', default=3)
+DETECTOR_LENTA_MS = env.int('DETECTOR_LENTA_MS', default=200)
+TEST_RUNNER = 'urbix.testrunner.DetectorTestRunner'
+
+# ===== PERFILADOR (solicitudes de staff) =====
+# ?perfilar=1 (muestreo) o ?perfilar=cprofile; los perfiles se listan en /perfiles/
+PERFILADOR_DIR = env('PERFILADOR_DIR', default=os.path.join(BASE_DIR, 'tmp', 'perfiles'))
+PERFILADOR_MAX = env.int('PERFILADOR_MAX', default=50)
+PERFILADOR_INTERVALO_MS = env.int('PERFILADOR_INTERVALO_MS', default=1)
+# Vigencia de la firma para el encabezado X-Perfilar
+PERFILADOR_FIRMA_SEGUNDOS = env.int('PERFILADOR_FIRMA_SEGUNDOS', default=3600)
+
+# ===== ASGI (deploy/gunicorn-asgi.sh) =====
+# Cuerpo máximo que acepta el servidor ASGI; uno mayor se corta antes de que
+# Django lo guarde (20 fotos de 10MB de un registro caben con holgura)
+ASGI_MAX_CUERPO = env.int('ASGI_MAX_CUERPO', default=256 * 1024 * 1024)
@@ -0,0 +1,197 @@
+"""
+Auditoría de las consultas SQL ejecutadas en un bloque de código.
+
+``Auditoria`` se engancha a todas las conexiones con ``execute_wrapper`` y
+guarda cada consulta junto con su origen: las líneas del proyecto que la
+dispararon (vista, servicio, formulario...) y, si ocurrió al renderizar,
+la plantilla y línea en curso. Las consultas se agrupan por su SQL sin
+parámetros: la misma sentencia ejecutada muchas veces con distintos ids
+es la huella de un N+1.
+
+    with Auditoria() as auditoria:
+        client.get(url)
+    auditoria.total              # número de consultas
+    print(auditoria.reporte())   # repetidas, con su origen
+
+``DetectorConsultasMiddleware`` aplica lo mismo a cada solicitud en
+desarrollo y en las pruebas: la misma sentencia ejecutada
+``DETECTOR_REPETICIONES`` veces o más desde la misma línea (de código o
+de plantilla) es un N+1, y cualquier consulta sobre ``DETECTOR_LENTA_MS``
+es lenta. Con ``DETECTOR_CONSULTAS = "log"`` los hallazgos se registran
+en el logger ``urbix.sqlaudit``; con ``"error"`` (lo que usa el runner de
+pruebas) la solicitud falla con ``ConsultasSospechosas`` y el test cae.
+"""
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+RAIZ = os.path.join(str(settings.BASE_DIR), "")
+# Rutas bajo BASE_DIR que no son código de la aplicación (dependencias, arranque, instrumentación y pruebas)
+IGNORADAS = (
+    "site-packages", "dist-packages", f"{os.sep}.venv", f"{os.sep}venv", os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "metricas.py"),
+)
+ARCHIVOS_IGNORADOS = ("manage.py", "tests.py")
+MAX_LINEAS_ORIGEN = 6
+
+
+class ConsultasSospechosas(Exception):
+    """Una solicitud repitió una consulta por fila (N+1) o ejecutó una consulta lenta."""
+
+
+class Consulta:
+    __slots__ = ("sql", "params", "origen", "plantilla", "duracion")
+
+    def __init__(self, sql, params, origen, plantilla, duracion=0.0):
+        self.sql = sql
+        self.params = params
+        self.origen = origen
+        self.plantilla = plantilla
+        self.duracion = duracion
+
+
+def _es_del_proyecto(ruta):
+    return (
+        ruta.startswith(RAIZ)
+        and not any(parte in ruta for parte in IGNORADAS)
+        and os.path.basename(ruta) not in ARCHIVOS_IGNORADOS
+    )
+
+
+def origen_actual(saltar=2):
+    """(líneas del proyecto de la más interna a la externa, "plantilla:línea" o None)."""
+    lineas, plantilla = [], None
+    frame = sys._getframe(saltar)
+    while frame is not None:
+        codigo = frame.f_code
+        if plantilla is None and codigo.co_name == "render_annotated":
+            # Node.render_annotated de django.template.base: el nodo sabe su plantilla y línea
+            nodo = frame.f_locals.get("self")
+            origin = getattr(nodo, "origin", None)
+            token = getattr(nodo, "token", None)
+            if origin is not None and token is not None:
+                plantilla = f"{origin.template_name or origin.name}:{token.lineno}"
+        elif len(lineas) < MAX_LINEAS_ORIGEN and _es_del_proyecto(codigo.co_filename):
+            ruta = os.path.relpath(codigo.co_filename, RAIZ)
+            lineas.append(f"{ruta}:{frame.f_lineno} en {codigo.co_name}")
+        frame = frame.f_back
+    return lineas, plantilla
+
+
+class Auditoria:
+    """Registra las consultas de todas las conexiones mientras el bloque ``with`` está activo."""
+
+    def __init__(self):
+        self.consultas = []
+        self._pila = None
+
+    def __enter__(self):
+        self._pila = ExitStack()
+        for conexion in connections.all():
+            self._pila.enter_context(conexion.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc):
+        self._pila.close()
+        return False
+
+    def __call__(self, execute, sql, params, many, context):
+        origen, plantilla = origen_actual()
+        consulta = Consulta(sql, params, origen, plantilla)
+        self.consultas.append(consulta)
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            consulta.duracion = time.perf_counter() - inicio
+
+    @property
+    def total(self):
+        return len(self.consultas)
+
+    def repetidas(self, minimo=2):
+        """{sql: [Consulta, ...]} de las sentencias ejecutadas ``minimo`` veces o más."""
+        grupos = defaultdict(list)
+        for consulta in self.consultas:
+            grupos[consulta.sql].append(consulta)
+        return {sql: lista for sql, lista in grupos.items() if len(lista) >= minimo}
+
+    def n_mas_uno(self, minimo):
+        """[(sql, plantilla, origen, [Consulta, ...])] de sentencias repetidas ``minimo`` veces desde el mismo lugar."""
+        grupos = defaultdict(list)
+        for consulta in self.consultas:
+            grupos[(consulta.sql, consulta.plantilla, tuple(consulta.origen))].append(consulta)
+        return [(*clave, lista) for clave, lista in grupos.items() if len(lista) >= minimo]
+
+    def lentas(self, segundos):
+        return [consulta for consulta in self.consultas if consulta.duracion >= segundos]
+
+    def reporte(self, minimo=2):
+        """Texto con cada sentencia repetida, cuántas veces y desde dónde se ejecutó."""
+        partes = []
+        repetidas = sorted(self.repetidas(minimo).items(), key=lambda item: -len(item[1]))
+        for sql, lista in repetidas:
+            partes.append(f"{len(lista)}x {sql}")
+            origenes = defaultdict(int)
+            for consulta in lista:
+                origenes[(consulta.plantilla, tuple(consulta.origen))] += 1
+            for (plantilla, origen), veces in origenes.items():
+                if plantilla:
+                    partes.append(f"    plantilla {plantilla}")
+                for linea in origen or ("(sin líneas del proyecto en la pila)",):
+                    partes.append(f"    {linea}")
+                partes.append(f"    ({veces} {'vez' if veces == 1 else 'veces'} desde aquí)")
+        return "\n".join(partes) if partes else "Sin consultas repetidas."
+
+
+def _lugar(plantilla, origen):
+    lineas = [f"    plantilla {plantilla}"] if plantilla else []
+    lineas += [f"    {linea}" for linea in origen or ("(sin líneas del proyecto en la pila)",)]
+    return lineas
+
+
+def hallazgos(auditoria, repeticiones, lenta_ms):
+    """Textos con cada N+1 y cada consulta lenta de la auditoría, con su origen."""
+    textos = []
+    for sql, plantilla, origen, lista in auditoria.n_mas_uno(repeticiones):
+        textos.append("\n".join([f"N+1: {len(lista)} veces la misma consulta", f"    {sql}", *_lugar(plantilla, origen)]))
+    for consulta in auditoria.lentas(lenta_ms / 1000):
+        textos.append("\n".join([
+            f"Consulta lenta: {consulta.duracion * 1000:.0f} ms", f"    {consulta.sql}",
+            *_lugar(consulta.plantilla, consulta.origen),
+        ]))
+    return textos
+
+
+class DetectorConsultasMiddleware:
+    """Audita cada solicitud y registra (o hace fallar) los N+1 y las consultas lentas."""
+
+    def __init__(self, get_response):
+        self.modo = getattr(settings, "DETECTOR_CONSULTAS", "")
+        if self.modo not in ("log", "error"):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.repeticiones = getattr(settings, "DETECTOR_REPETICIONES", 3)
+        self.lenta_ms = getattr(settings, "DETECTOR_LENTA_MS", 200)
+
+    def __call__(self, request):
+        with Auditoria() as auditoria:
+            response = self.get_response(request)
+        encontrados = hallazgos(auditoria, self.repeticiones, self.lenta_ms)
+        if encontrados:
+            match = getattr(request, "resolver_match", None)
+            titulo = f"{request.method} {request.path} ({match.view_name if match else 'sin ruta'})"
+            texto = "\n".join([titulo, *encontrados])
+            if self.modo == "error":
+                raise ConsultasSospechosas(texto)
+            logger.warning(texto)
+        return response
@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class DetectorTestRunner(DiscoverRunner):
+    """Corre las pruebas con el detector de consultas en modo "error": un N+1 nuevo hace fallar el test."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # DETECTOR_CONSULTAS=log (o vacío) en el entorno permite correrlas sin cortar en el primer hallazgo
+        self._detector = override_settings(DETECTOR_CONSULTAS=os.environ.get("DETECTOR_CONSULTAS", "error"))
+        self._detector.enable()
+        # Las métricas de las solicitudes de prueba no se vuelcan en el tmp/ del proyecto
+        self._metricas_dir = tempfile.mkdtemp(prefix="metricas-")
+        self._metricas = override_settings(METRICAS_DIR=self._metricas_dir)
+        self._metricas.enable()
+        # Ni la caché compartida del proyecto: las anotaciones de un run no deben valer en el siguiente
+        self._cache_dir = tempfile.mkdtemp(prefix="cache-")
+        self._cache = override_settings(CACHES={
+            alias: {**opciones, "LOCATION": os.path.join(self._cache_dir, alias)}
+            for alias, opciones in settings.CACHES.items()
+        })
+        self._cache.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache.disable()
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
+        self._metricas.disable()
+        shutil.rmtree(self._metricas_dir, ignore_errors=True)
+        self._detector.disable()
+        super().teardown_test_environment(**kwargs)
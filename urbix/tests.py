@@ -0,0 +1,387 @@
+import datetime
+import json
+import os
+import pstats
+import re
+import tempfile
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from core.asincrono import limitar_cuerpo
+from core.models import Ciudad, Estado, Pais
+from core.pruebas import crear_obra
+from gastos.models import Categoria, Gasto, Proveedor, TipoDocumento
+from gastos.rollups import reconstruir
+from obras.models import (
+    FotografiaRegistro, LibroObraPdf, Obra, RegistroLibroObra, SubidaFragmentada, TareaRealizada,
+    TrabajadorRegistro,
+)
+from urbix import metricas, perfilador
+from urbix.sqlaudit import Auditoria, ConsultasSospechosas, DetectorConsultasMiddleware
+
+TOKEN_REPORTE = "0" * 32
+# Consultas máximas por ruta (sesión y usuario incluidos); las rutas sin entrada usan TECHO_DEFECTO
+TECHO_DEFECTO = 10
+TECHOS = {}
+# Rutas del proyecto que no se auditan con GET, con el motivo
+EXCLUIDAS = {
+    "signout/": "cierra la sesión del cliente de prueba",
+    "<str:page>": "plantillas estáticas del tema, sin consultas propias",
+    "paises/<int:pk>/eliminar/": "elimina con GET",
+    "ciudades/<int:pk>/eliminar/": "elimina con GET",
+    "estados/<int:pk>/eliminar/": "elimina con GET",
+    "obras/libro-obras/eliminar/<int:pk>/": "elimina con GET",
+    "obras/libro-obras/fotografia/eliminar/<int:pk>/": "elimina con GET",
+}
+PREFIJOS_AJENOS = ("admin/", "^media/", "favicon.ico")
+# Modelo cuyo primer registro se usa como <pk> en cada ruta
+OBJETOS = {
+    "administrador/gastos/proveedores/": Proveedor,
+    "administrador/gastos/categorias/": Categoria,
+    "administrador/gastos/tipo-documento/": TipoDocumento,
+    "administrador/gastos/rendicion/": Gasto,
+    "administrador/usuario/": User,
+    "obras/obras/libro-pdf/": LibroObraPdf,
+    "obras/obras/": Obra,
+    "obras/libro-obras/subidas/": SubidaFragmentada,
+    "obras/libro-obras/": RegistroLibroObra,
+    "paises/": Pais,
+    "ciudades/": Ciudad,
+    "estados/": Estado,
+}
+
+
+def rutas_del_proyecto(patrones=None, prefijo=""):
+    """Rutas de urbix.urls con los prefijos de include() ya unidos, sin el admin ni media."""
+    rutas = []
+    for patron in patrones if patrones is not None else get_resolver().url_patterns:
+        ruta = prefijo + str(patron.pattern)
+        if isinstance(patron, URLResolver):
+            rutas.extend(rutas_del_proyecto(patron.url_patterns, ruta))
+        elif isinstance(patron, URLPattern) and not ruta.startswith(PREFIJOS_AJENOS):
+            rutas.append(ruta)
+    return rutas
+
+
+def _url(ruta, valores):
+    ruta = re.sub(r"<(?:\w+:)?(\w+)>", lambda m: str(valores[m.group(1)]), ruta)
+    ruta = re.sub(r"\(\?P<(\w+)>[^)]*\)", lambda m: str(valores[m.group(1)]), ruta)
+    return "/" + ruta.lstrip("^").rstrip("$")
+
+
+@override_settings(GASTOS_IMPORT_DIR=tempfile.mkdtemp())
+class PresupuestoConsultasTest(TestCase):
+    """
+    Recorre todas las rutas con GET como usuario autenticado, con pocos y con
+    muchos datos: el número de consultas no debe crecer con los datos ni
+    superar el techo de cada vista. Un fallo muestra el SQL repetido y la
+    línea de vista o plantilla que lo ejecutó.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("auditor", password="x", first_name="Ana", last_name="Rojas")
+        cls.grupos = [Group.objects.get_or_create(name=n)[0] for n in ("Administrador", "Supervisor", "Trabajador")]
+        cls.usuario.groups.add(cls.grupos[0])
+        cls.sembrar(1)
+
+    @classmethod
+    def sembrar(cls, cantidad):
+        hoy = datetime.date(2025, 6, 2)
+        inicio = Obra.objects.count()
+        for i in range(inicio, inicio + cantidad):
+            pais = Pais.objects.create(nombre=f"País {i}", estado=1)
+            ciudad = Ciudad.objects.create(nombre=f"Ciudad {i}", pais=pais, estado=1, creado_por=cls.usuario)
+            estado = Estado.objects.create(nombre=f"Estado {i}", estado=1, creado_por=cls.usuario)
+            trabajador = User.objects.create_user(f"trabajador{i}", first_name="Trabajador", last_name=str(i))
+            trabajador.groups.add(cls.grupos[i % 3])
+            obra = Obra.objects.create(
+                nombre=f"Obra {i}", codigo=f"OB-{i}", direccion="Calle 1", ciudad=ciudad,
+                fecha_inicio=datetime.date(2025, 1, 1), fecha_fin_estimada=datetime.date(2026, 1, 1),
+                estado_obra=estado, creado_por=cls.usuario,
+            )
+            registro = RegistroLibroObra.objects.create(
+                obra=obra, fecha=hoy, supervisor=cls.usuario, creado_por=cls.usuario, observaciones=f"Avance {i}",
+            )
+            TareaRealizada.objects.create(registro=registro, descripcion=f"Tarea {i}")
+            TrabajadorRegistro.objects.create(registro=registro, trabajador=trabajador, horas_trabajadas=Decimal("8"))
+            FotografiaRegistro.objects.create(registro=registro, archivo=f"libro_obras/foto{i}.jpg")
+            LibroObraPdf.objects.create(obra=obra, solicitado_por=cls.usuario)
+            SubidaFragmentada.objects.create(usuario=cls.usuario, nombre=f"video{i}.mp4", tamano=10)
+            proveedor = Proveedor.objects.create(
+                nombre=f"Proveedor {i}", rut=f"{i + 1}-9", direccion="x", telefono="1", fecha_creacion=hoy,
+            )
+            categoria = Categoria.objects.create(nombre=f"Categoría {i}", fecha_creacion=hoy)
+            tipo = TipoDocumento.objects.create(nombre=f"Documento {i}", fecha_creacion=hoy)
+            Gasto.objects.create(
+                obra=obra, categoria=categoria, proveedor=proveedor, tipo_documento=tipo,
+                monto=Decimal(1000 + i), fecha=hoy, fecha_creacion=hoy, creado_por=cls.usuario,
+            )
+        reconstruir()
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        with open(os.path.join(settings.GASTOS_IMPORT_DIR, f"errores_{TOKEN_REPORTE}.csv"), "w") as fh:
+            fh.write("fila;error\n")
+
+    def valores(self, ruta):
+        valores = {"token": TOKEN_REPORTE, "nombre": "perfil.folded"}
+        if "<int:pk>" in ruta or "<uuid:pk>" in ruta:
+            prefijo = next(p for p in sorted(OBJETOS, key=len, reverse=True) if ruta.startswith(p))
+            valores["pk"] = OBJETOS[prefijo].objects.order_by("pk").values_list("pk", flat=True)[0]
+        return valores
+
+    def medir(self):
+        mediciones = {}
+        for ruta in rutas_del_proyecto():
+            if ruta in EXCLUIDAS:
+                continue
+            url = _url(ruta, self.valores(ruta))
+            # Sin cachés entre mediciones: se compara el camino completo de cada vista
+            cache.clear()
+            with Auditoria() as auditoria:
+                respuesta = self.client.get(url)
+            self.assertLess(respuesta.status_code, 500, url)
+            mediciones[ruta] = (url, auditoria)
+        return mediciones
+
+    def test_consultas_no_crecen_con_los_datos(self):
+        pocos = self.medir()
+        self.sembrar(15)
+        muchos = self.medir()
+
+        fallas = []
+        for ruta, (url, auditoria) in muchos.items():
+            base = pocos[ruta][1].total
+            techo = TECHOS.get(ruta, TECHO_DEFECTO)
+            if auditoria.total > base:
+                fallas.append(f"{url}: {base} consultas con pocos datos y {auditoria.total} con muchos.")
+            elif auditoria.total > techo:
+                fallas.append(f"{url}: {auditoria.total} consultas, techo {techo}.")
+            else:
+                continue
+            fallas.append(auditoria.reporte())
+        if fallas:
+            self.fail("\n\n".join(fallas))
+
+    def test_todas_las_rutas_estan_clasificadas(self):
+        rutas = rutas_del_proyecto()
+        self.assertFalse(set(EXCLUIDAS) - set(rutas), "Exclusiones de rutas que ya no existen.")
+        for ruta in rutas:
+            if ruta not in EXCLUIDAS and ("<int:pk>" in ruta or "<uuid:pk>" in ruta):
+                self.assertTrue(any(ruta.startswith(p) for p in OBJETOS), f"Sin objeto de prueba para {ruta}")
+
+
+@override_settings(METRICAS_DIR=tempfile.mkdtemp(), METRICAS_TOKEN="secreto")
+class MetricasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("staff", password="x", is_staff=True)
+        cls.usuario = User.objects.create_user("usuario", password="x")
+
+    def test_mide_la_vista_y_la_expone_solo_a_staff(self):
+        self.client.force_login(self.staff)
+        self.client.get("/obras/obras/")
+        texto = self.client.get("/metrics/").content.decode()
+        self.assertIn('urbix_solicitudes_total{vista="obra_list",metodo="GET",estado="200"}', texto)
+        self.assertIn('urbix_consultas_db_count{vista="obra_list",metodo="GET"}', texto)
+        self.assertIn('urbix_plantillas_segundos_bucket{vista="obra_list",metodo="GET",le="+Inf"}', texto)
+
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer secreto").status_code, 200)
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer otro").status_code, 403)
+
+    def test_suma_los_archivos_de_otros_workers(self):
+        limites = metricas.BUCKETS["urbix_consultas_db"]
+        fila = [0] * (len(limites) + 1) + [21.0]
+        fila[limites.index(5)] = 3
+        with open(os.path.join(settings.METRICAS_DIR, "1-otro.json"), "w") as fh:
+            json.dump({
+                "solicitudes": [["gastos_worker", "GET", "200", 3]],
+                "histogramas": [["urbix_consultas_db", "gastos_worker", "GET", fila]],
+            }, fh)
+        texto = metricas.exportar()
+        self.assertIn('urbix_solicitudes_total{vista="gastos_worker",metodo="GET",estado="200"} 3', texto)
+        self.assertIn('urbix_consultas_db_bucket{vista="gastos_worker",metodo="GET",le="2"} 0', texto)
+        self.assertIn('urbix_consultas_db_bucket{vista="gastos_worker",metodo="GET",le="5"} 3', texto)
+        self.assertIn('urbix_consultas_db_sum{vista="gastos_worker",metodo="GET"} 21.0', texto)
+
+    def test_publica_rss_de_workers_vigentes(self):
+        ahora = time.time()
+        for pid, actualizado in ((11, ahora), (12, ahora - 3600)):
+            with open(os.path.join(settings.METRICAS_DIR, f"{pid}-otro.json"), "w") as fh:
+                json.dump({
+                    "crecimiento": [["registro_libro_list", "GET", 4096]],
+                    "worker": {"pid": pid, "rss": 1000, "pico": 2000, "actualizado": actualizado},
+                }, fh)
+        texto = metricas.exportar()
+        self.assertIn('urbix_rss_pico_crecimiento_bytes_total{vista="registro_libro_list",metodo="GET"} 8192', texto)
+        self.assertIn('urbix_worker_rss_bytes{worker="11"} 1000', texto)
+        self.assertIn('urbix_worker_rss_pico_bytes{worker="11"} 2000', texto)
+        self.assertNotIn('worker="12"', texto)
+
+
+class DetectorConsultasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        pais = Pais.objects.create(nombre="Chile", estado=1)
+        for nombre in ("Arica", "Temuco", "Osorno"):
+            Ciudad.objects.create(nombre=nombre, pais=pais, estado=1)
+
+    def detector(self, vista):
+        return DetectorConsultasMiddleware(vista)
+
+    @override_settings(DETECTOR_CONSULTAS="error")
+    def test_n_mas_uno_en_plantilla_falla_con_su_linea(self):
+        def vista(request):
+            plantilla = Template("{% for c in ciudades %}\n{{ c.pais }}\n{% endfor %}")
+            return HttpResponse(plantilla.render(Context({"ciudades": Ciudad.objects.all()})))
+
+        with self.assertRaises(ConsultasSospechosas) as error:
+            self.detector(vista)(RequestFactory().get("/ciudades/"))
+        self.assertIn("N+1: 3 veces la misma consulta", str(error.exception))
+        self.assertIn(":2", str(error.exception))  # línea de {{ c.pais }}
+
+    @override_settings(DETECTOR_CONSULTAS="error")
+    def test_sin_hallazgos_con_select_related(self):
+        def vista(request):
+            plantilla = Template("{% for c in ciudades %}{{ c.pais }}{% endfor %}")
+            return HttpResponse(plantilla.render(Context({"ciudades": Ciudad.objects.select_related("pais")})))
+
+        self.assertEqual(self.detector(vista)(RequestFactory().get("/ciudades/")).status_code, 200)
+
+    @override_settings(DETECTOR_CONSULTAS="log", DETECTOR_LENTA_MS=0)
+    def test_modo_log_registra_consultas_lentas(self):
+        def vista(request):
+            return HttpResponse(str(Pais.objects.count()))
+
+        with self.assertLogs("urbix.sqlaudit", "WARNING") as registro:
+            self.assertEqual(self.detector(vista)(RequestFactory().get("/")).status_code, 200)
+        self.assertIn("Consulta lenta", registro.output[0])
+
+
+@override_settings(PERFILADOR_DIR=tempfile.mkdtemp(), PERFILADOR_MAX=3)
+class PerfiladorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("staff", password="x", is_staff=True)
+        cls.usuario = User.objects.create_user("usuario", password="x")
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def test_muestreo_guarda_un_perfil_folded_y_lo_lista(self):
+        respuesta = self.client.get("/obras/obras/?perfilar=1")
+        nombre = respuesta["X-Perfil"]
+        self.assertTrue(nombre.endswith(".folded"))
+        with open(os.path.join(settings.PERFILADOR_DIR, f"{nombre}.json")) as fh:
+            self.assertEqual(json.load(fh)["vista"], "obra_list")
+
+        lista = self.client.get("/perfiles/")
+        self.assertContains(lista, nombre)
+        descarga = self.client.get(f"/perfiles/{nombre}/")
+        self.assertEqual(descarga.status_code, 200)
+        self.assertEqual(self.client.get("/perfiles/..%2Fsecreto.folded/").status_code, 404)
+
+    def test_cprofile_guarda_un_prof_legible(self):
+        nombre = self.client.get("/obras/obras/?perfilar=cprofile")["X-Perfil"]
+        estadisticas = pstats.Stats(os.path.join(settings.PERFILADOR_DIR, nombre))
+        self.assertTrue(any(funcion[2] == "obra_list" for funcion in estadisticas.stats))
+
+    def test_memoria_reporta_pico_y_sitios(self):
+        nombre = self.client.get("/obras/obras/?perfilar=memoria")["X-Perfil"]
+        self.assertTrue(nombre.endswith(".txt"))
+        with open(os.path.join(settings.PERFILADOR_DIR, nombre), encoding="utf-8") as fh:
+            reporte = fh.read()
+        self.assertIn("GET /obras/obras/?perfilar=memoria -> 200", reporte)
+        self.assertIn("Pico de memoria Python", reporte)
+        with open(os.path.join(settings.PERFILADOR_DIR, f"{nombre}.json")) as fh:
+            self.assertGreater(json.load(fh)["pico_kb"], 0)
+        self.assertContains(self.client.get("/perfiles/"), "Memoria por worker")
+
+    def test_solo_staff_y_firma_del_mismo_usuario(self):
+        self.assertNotIn("X-Perfil", self.client.get("/obras/obras/"))
+        firma = perfilador.firmar(self.staff)
+        self.assertIn("X-Perfil", self.client.get("/obras/obras/", HTTP_X_PERFILAR=firma))
+        self.assertNotIn("X-Perfil", self.client.get("/obras/obras/", HTTP_X_PERFILAR=perfilador.firmar(self.usuario)))
+
+        self.client.force_login(self.usuario)
+        self.assertNotIn("X-Perfil", self.client.get("/obras/obras/?perfilar=1"))
+        self.assertEqual(self.client.get("/perfiles/").status_code, 403)
+
+    def test_conserva_solo_los_mas_recientes(self):
+        for _ in range(5):
+            self.client.get("/obras/obras/?perfilar=1")
+        self.assertEqual(len(perfilador.recientes()), 3)
+
+
+class AsgiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user("usuario", password="x", first_name="Ana")
+        crear_obra(creado_por=cls.usuario)
+
+    def setUp(self):
+        self.async_client.force_login(self.usuario)
+
+    async def test_vistas_async_con_orm_async(self):
+        datos = (await self.async_client.get("/obras/obras/autocompletar/", {"q": "ob"})).json()
+        self.assertEqual([r["text"] for r in datos["results"]], ["OB-1 - Edificio Norte"])
+        self.assertEqual((await self.async_client.post("/obras/obras/autocompletar/")).status_code, 405)
+
+        anonimo = await AsyncClient().get("/obras/obras/autocompletar/")
+        self.assertEqual(anonimo.status_code, 302)
+        self.assertTrue(anonimo["Location"].startswith("/signin/"))
+
+    async def test_editar_perfil_async(self):
+        respuesta = await self.async_client.post("/mi-perfil/editar/", {"first_name": "Ana María", "last_name": "Pérez"})
+        self.assertEqual(respuesta.status_code, 302)
+        usuario = await User.objects.aget(pk=self.usuario.pk)
+        self.assertEqual((usuario.first_name, usuario.last_name), ("Ana María", "Pérez"))
+
+    async def test_streaming_sync_se_envia_por_bloques(self):
+        respuesta = await self.async_client.get(
+            "/obras/libro-obras/horas/exportar/", {"desde": "2024-01-01", "hasta": "2024-01-31"}
+        )
+        self.assertTrue(respuesta.is_async)
+        contenido = b"".join([parte async for parte in respuesta.streaming_content])
+        self.assertTrue(contenido.startswith("﻿".encode()))
+
+    async def test_limitar_cuerpo(self):
+        llamadas = []
+
+        async def aplicacion(scope, receive, send):
+            llamadas.append(await receive())
+
+        def receptor(*mensajes):
+            pendientes = list(mensajes)
+
+            async def receive():
+                return pendientes.pop(0)
+
+            return receive
+
+        enviados = []
+
+        async def send(mensaje):
+            enviados.append(mensaje)
+
+        limitada = limitar_cuerpo(aplicacion, 10)
+        scope = {"type": "http", "headers": [(b"content-length", b"11")]}
+        await limitada(scope, receptor(), send)
+        self.assertEqual((enviados[0]["status"], llamadas), (413, []))
+
+        # Sin Content-Length: se corta al pasar el máximo
+        scope = {"type": "http", "headers": []}
+        await limitada(scope, receptor({"type": "http.request", "body": b"x" * 11, "more_body": True}), send)
+        self.assertEqual(llamadas, [{"type": "http.disconnect"}])
@@ -4,6 +4,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView, RedirectView
 from administrador import views as admin_views
+from urbix import views as urbix_views
 
 urlpatterns = [
     path('favicon.ico', RedirectView.as_view(url='/static/assets/images/favicon.png', permanent=True)),
@@ -17,6 +18,11 @@ urlpatterns = [
     path('obras/', include('obras.urls')),
     # Core (Paises, Ciudades, Estados)
     path('', include('core.urls')),
+    # Métricas de rendimiento (Prometheus)
+    path('metrics/', urbix_views.metricas_view, name='metricas'),
+    # Perfiles de solicitudes (?perfilar=1 como staff)
+    path('perfiles/', urbix_views.perfiles_view, name='perfiles'),
+    path('perfiles/<str:nombre>/', urbix_views.perfil_descargar_view, name='perfil_descargar'),
     # Admin Django
     path('admin/', admin.site.urls),
 ]
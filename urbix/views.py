@@ -4,8 +4,14 @@ from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.template import TemplateDoesNotExist
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from django.conf import settings
+import datetime
+import hmac
+
+from . import metricas, perfilador
 
 
 def home_view(request):
@@ -164,3 +170,52 @@ def dynamic_view(request, page):
         except TemplateDoesNotExist as e2:
             print(f"404 template not found: {e2}")
             return HttpResponse("Page not found", status=404)
+
+
+@require_GET
+def metricas_view(request):
+    """Métricas por vista en formato Prometheus: staff con sesión o ``Authorization: Bearer METRICAS_TOKEN``."""
+    autorizado = request.user.is_authenticated and request.user.is_staff
+    token = getattr(settings, "METRICAS_TOKEN", "")
+    if not autorizado and token:
+        autorizado = hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not autorizado:
+        return HttpResponseForbidden("Solo para staff.")
+    return HttpResponse(metricas.exportar(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _solo_staff(request):
+    return request.user.is_authenticated and request.user.is_staff
+
+
+@login_required(login_url='signin')
+@require_GET
+def perfiles_view(request):
+    """Perfiles de solicitudes guardados por PerfiladorMiddleware."""
+    if not _solo_staff(request):
+        return HttpResponseForbidden("Solo para staff.")
+    return render(request, "perfiles/perfiles_list.html", {
+        "perfiles": perfilador.recientes(),
+        "firma": perfilador.firmar(request.user),
+        "vigencia_minutos": getattr(settings, "PERFILADOR_FIRMA_SEGUNDOS", 3600) // 60,
+        "workers": [
+            {
+                "pid": w["pid"],
+                "rss_mb": w["rss"] / 2 ** 20 if w.get("rss") is not None else None,
+                "pico_mb": w["pico"] / 2 ** 20,
+                "actualizado": datetime.datetime.fromtimestamp(w["actualizado"]),
+            }
+            for w in metricas.workers()
+        ],
+    })
+
+
+@login_required(login_url='signin')
+@require_GET
+def perfil_descargar_view(request, nombre):
+    if not _solo_staff(request):
+        return HttpResponseForbidden("Solo para staff.")
+    ruta = perfilador.ruta_de(nombre)
+    if ruta is None:
+        raise Http404("Perfil no encontrado.")
+    return FileResponse(open(ruta, "rb"), as_attachment=True, filename=nombre)